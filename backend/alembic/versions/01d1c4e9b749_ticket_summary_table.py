@@ -0,0 +1,40 @@
+"""ticket summary table
+
+Revision ID: 01d1c4e9b749
+Revises: 644cf66dd7ec
+Create Date: 2026-10-19 09:48:03.271954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '01d1c4e9b749'
+down_revision: Union[str, None] = '644cf66dd7ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ticket_summary',
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('priority', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.Integer(), nullable=False),
+        sa.Column('ticket_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('status', 'priority', 'agent_id'),
+    )
+    # Counts are only adjusted from here on, so start from the existing tickets
+    # (agent 0 is ticket_summary.UNASSIGNED)
+    op.execute(
+        "INSERT INTO ticket_summary (status, priority, agent_id, ticket_count) "
+        "SELECT status, priority, coalesce(assigned_agent_id, 0), count(*) FROM tickets "
+        "GROUP BY status, priority, coalesce(assigned_agent_id, 0)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ticket_summary')
@@ -0,0 +1,38 @@
+"""ticket topic and agent profiles
+
+Revision ID: 1a12385a41cd
+Revises: 3a864c326777
+Create Date: 2026-10-19 11:24:09.530662
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a12385a41cd'
+down_revision: Union[str, None] = '3a864c326777'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.add_column(sa.Column('topic', sa.String(), nullable=True))
+    op.create_table(
+        'agent_profiles',
+        sa.Column('agent_id', sa.Integer(), nullable=False),
+        sa.Column('skills', sa.Text(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['agent_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('agent_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('agent_profiles')
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_column('topic')
@@ -0,0 +1,53 @@
+"""chat sessions
+
+Revision ID: 3a864c326777
+Revises: 5c64775a91ec
+Create Date: 2026-10-19 11:02:17.604381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a864c326777'
+down_revision: Union[str, None] = '5c64775a91ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('summarized_through', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_chat_sessions_user_id', 'chat_sessions', ['user_id'])
+    op.create_table(
+        'chat_turns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(length=32), nullable=False),
+        sa.Column('role', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_chat_turns_id', 'chat_turns', ['id'])
+    op.create_index('ix_chat_turns_session_id', 'chat_turns', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_turns_session_id', table_name='chat_turns')
+    op.drop_index('ix_chat_turns_id', table_name='chat_turns')
+    op.drop_table('chat_turns')
+    op.drop_index('ix_chat_sessions_user_id', table_name='chat_sessions')
+    op.drop_table('chat_sessions')
@@ -0,0 +1,64 @@
+"""ticket sla deadlines
+
+Revision ID: 44d75a5de9f9
+Revises: 561eb41f6915
+Create Date: 2026-10-19 11:31:52.804476
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '44d75a5de9f9'
+down_revision: Union[str, None] = '561eb41f6915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.add_column(sa.Column('sla_due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('escalated_from', sa.String(), nullable=True))
+    op.create_index('ix_tickets_sla_due_at', 'tickets', ['sla_due_at'])
+    op.create_table(
+        'worker_leases',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('holder', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+    # Give open and in-progress tickets a deadline, counted from their last
+    # change, so the SLA worker tracks them too
+    from sla import TARGETS, due_at
+
+    tickets = sa.table(
+        'tickets',
+        sa.column('id', sa.Integer()),
+        sa.column('status', sa.String()),
+        sa.column('priority', sa.String()),
+        sa.column('sla_due_at', sa.DateTime()),
+        sa.column('created_at', sa.DateTime()),
+        sa.column('updated_at', sa.DateTime()),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(tickets.c.id, tickets.c.status, tickets.c.priority, tickets.c.created_at, tickets.c.updated_at)
+        .where(tickets.c.status.in_(list(TARGETS)))
+    ).all()
+    for row in rows:
+        start = row.updated_at or row.created_at
+        due = due_at(row.status, row.priority, start) if start else None
+        if due is not None:
+            bind.execute(tickets.update().where(tickets.c.id == row.id).values(sla_due_at=due))
+
+
+def downgrade() -> None:
+    op.drop_table('worker_leases')
+    op.drop_index('ix_tickets_sla_due_at', table_name='tickets')
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_column('escalated_from')
+        batch_op.drop_column('sla_due_at')
@@ -0,0 +1,36 @@
+"""ticket priority and topic labels
+
+Revision ID: 561eb41f6915
+Revises: 1a12385a41cd
+Create Date: 2026-10-19 14:21:37.904165
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '561eb41f6915'
+down_revision: Union[str, None] = '1a12385a41cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.add_column(sa.Column('requested_priority', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('predicted_priority', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('reviewed_priority', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('reviewed_topic', sa.String(), nullable=True))
+    # No classifier has run on existing tickets, so their priority is the one people set
+    op.execute("UPDATE tickets SET requested_priority = priority")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_column('reviewed_topic')
+        batch_op.drop_column('reviewed_priority')
+        batch_op.drop_column('predicted_priority')
+        batch_op.drop_column('requested_priority')
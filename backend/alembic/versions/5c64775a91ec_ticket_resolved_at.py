@@ -0,0 +1,33 @@
+"""ticket resolved_at
+
+Revision ID: 5c64775a91ec
+Revises: 01d1c4e9b749
+Create Date: 2026-10-19 11:20:45.118027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c64775a91ec'
+down_revision: Union[str, None] = '01d1c4e9b749'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.add_column(sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True))
+    # Best guess for tickets resolved before the column existed: their last update
+    op.execute(
+        "UPDATE tickets SET resolved_at = coalesce(updated_at, created_at) "
+        "WHERE status IN ('resolved', 'closed')"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_column('resolved_at')
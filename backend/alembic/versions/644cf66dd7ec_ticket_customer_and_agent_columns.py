@@ -0,0 +1,36 @@
+"""ticket customer and agent columns
+
+Revision ID: 644cf66dd7ec
+Revises:
+Create Date: 2026-10-19 09:12:40.518213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '644cf66dd7ec'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.alter_column('owner_id', new_column_name='customer_id', existing_type=sa.Integer(), existing_nullable=False)
+        batch_op.add_column(sa.Column('assigned_agent_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_tickets_assigned_agent_id_users', 'users', ['assigned_agent_id'], ['id'])
+    op.create_index('ix_tickets_customer_id', 'tickets', ['customer_id'])
+    op.create_index('ix_tickets_assigned_agent_id', 'tickets', ['assigned_agent_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tickets_assigned_agent_id', table_name='tickets')
+    op.drop_index('ix_tickets_customer_id', table_name='tickets')
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_constraint('fk_tickets_assigned_agent_id_users', type_='foreignkey')
+        batch_op.drop_column('assigned_agent_id')
+        batch_op.alter_column('customer_id', new_column_name='owner_id', existing_type=sa.Integer(), existing_nullable=False)
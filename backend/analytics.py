@@ -0,0 +1,216 @@
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from config import settings
+from metrics import record_cache
+
+# Dialect-specific SQL fragments: day bucket label and a difference in seconds.
+# Rows are grouped per day in SQL and folded into ISO weeks in Python, so the
+# week labels are the same on every database.
+_DAY_SQL = {
+    "sqlite": "strftime('%Y-%m-%d', {col})",
+    "postgresql": "to_char({col}, 'YYYY-MM-DD')",
+}
+_SECONDS_SQL = {
+    "sqlite": "((julianday({end}) - julianday({start})) * 86400.0)",
+    "postgresql": "EXTRACT(EPOCH FROM ({end} - {start}))",
+}
+
+# Per-ticket metrics for tickets created in the range. The first response is
+# the earliest message on the ticket written by someone other than the
+# customer; resolution time runs to `resolved_at` of resolved/closed tickets.
+# Sums and counts rather than averages, so days can be merged into weeks.
+_TICKET_SQL = """
+    SELECT {day} AS day,
+           t.assigned_agent_id AS agent_id,
+           COUNT(*) AS tickets,
+           COUNT(fr.first_reply_at) AS responded,
+           SUM({first_response}) AS first_response_total,
+           SUM(CASE WHEN t.status IN ('resolved', 'closed') THEN 1 ELSE 0 END) AS resolved,
+           COUNT(CASE WHEN t.status IN ('resolved', 'closed') THEN {resolution} END) AS timed_resolutions,
+           SUM(CASE WHEN t.status IN ('resolved', 'closed') THEN {resolution} END) AS resolution_total
+    FROM tickets t
+    LEFT JOIN (
+        SELECT m.ticket_id, MIN(m.created_at) AS first_reply_at
+        FROM messages m
+        JOIN tickets t2 ON t2.id = m.ticket_id
+        WHERE m.user_id != t2.customer_id
+          AND t2.created_at >= :start AND t2.created_at < :end
+        GROUP BY m.ticket_id
+    ) fr ON fr.ticket_id = t.id
+    WHERE t.created_at >= :start AND t.created_at < :end {agent_filter}
+    GROUP BY day, t.assigned_agent_id
+"""
+
+# Reply counts for messages written in the range, split into AI and human
+_REPLY_SQL = """
+    SELECT {day} AS day,
+           t.assigned_agent_id AS agent_id,
+           SUM(CASE WHEN m.is_ai_generated THEN 1 ELSE 0 END) AS ai_replies,
+           SUM(CASE WHEN NOT m.is_ai_generated AND m.user_id != t.customer_id THEN 1 ELSE 0 END) AS human_replies
+    FROM messages m
+    JOIN tickets t ON t.id = m.ticket_id
+    WHERE m.created_at >= :start AND m.created_at < :end {agent_filter}
+    GROUP BY day, t.assigned_agent_id
+"""
+
+
+def iso_week(day: str) -> str:
+    """ISO 8601 week label ("2024-W01") of a YYYY-MM-DD day."""
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class _ResultCache:
+    """Small thread-safe TTL cache for analytics results."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple, Tuple[float, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: Tuple, value: List[Dict]) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _ResultCache(settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def response_time_stats(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    agent_id: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[Dict]:
+    """Compute response-time and AI-share metrics per agent and week.
+
+    Everything is aggregated in the database with two grouped queries, so
+    the cost on the Python side is proportional to the number of
+    (week, agent) buckets rather than the number of tickets.
+
+    Args:
+        db: Database session
+        start: Inclusive lower bound on creation time
+        end: Exclusive upper bound on creation time
+        agent_id: Optional assigned agent to restrict the results to
+        use_cache: Whether to serve and store results in the TTL cache
+
+    Returns:
+        One dict per (week, agent) bucket, ordered by week then agent
+    """
+    key = (start, end, agent_id)
+    if use_cache:
+        cached = _cache.get(key)
+        record_cache("analytics", cached is not None)
+        if cached is not None:
+            return cached
+
+    dialect = db.get_bind().dialect.name
+    if dialect not in _DAY_SQL:
+        raise NotImplementedError(f"Analytics are not supported on {dialect}")
+
+    params = {"start": start, "end": end}
+    agent_filter = ""
+    if agent_id is not None:
+        params["agent_id"] = agent_id
+        agent_filter = "AND t.assigned_agent_id = :agent_id"
+
+    seconds = _SECONDS_SQL[dialect]
+    ticket_sql = _TICKET_SQL.format(
+        day=_DAY_SQL[dialect].format(col="t.created_at"),
+        first_response=seconds.format(end="fr.first_reply_at", start="t.created_at"),
+        resolution=seconds.format(end="t.resolved_at", start="t.created_at"),
+        agent_filter=agent_filter,
+    )
+    reply_sql = _REPLY_SQL.format(
+        day=_DAY_SQL[dialect].format(col="m.created_at"),
+        agent_filter=agent_filter,
+    )
+
+    buckets: Dict[Tuple[str, Optional[int]], Dict] = {}
+    # (week, agent) -> [first response total, resolution total, timed resolutions]
+    totals: Dict[Tuple[str, Optional[int]], List[float]] = {}
+
+    def bucket(week: str, agent: Optional[int]) -> Dict:
+        if (week, agent) not in buckets:
+            buckets[(week, agent)] = {
+                "week": week,
+                "agent_id": agent,
+                "tickets": 0,
+                "responded": 0,
+                "avg_first_response_seconds": None,
+                "resolved": 0,
+                "avg_resolution_seconds": None,
+                "ai_replies": 0,
+                "human_replies": 0,
+                "ai_reply_share": None,
+            }
+        return buckets[(week, agent)]
+
+    for row in db.execute(text(ticket_sql), params).mappings():
+        week = iso_week(row["day"])
+        entry = bucket(week, row["agent_id"])
+        entry["tickets"] += row["tickets"]
+        entry["responded"] += row["responded"]
+        entry["resolved"] += row["resolved"] or 0
+        total = totals.setdefault((week, row["agent_id"]), [0.0, 0.0, 0])
+        total[0] += float(row["first_response_total"] or 0)
+        total[1] += float(row["resolution_total"] or 0)
+        total[2] += row["timed_resolutions"]
+
+    for (week, agent), (first_response, resolution, timed) in totals.items():
+        entry = buckets[(week, agent)]
+        if entry["responded"]:
+            entry["avg_first_response_seconds"] = first_response / entry["responded"]
+        if timed:
+            entry["avg_resolution_seconds"] = resolution / timed
+
+    for row in db.execute(text(reply_sql), params).mappings():
+        entry = bucket(iso_week(row["day"]), row["agent_id"])
+        entry["ai_replies"] += row["ai_replies"] or 0
+        entry["human_replies"] += row["human_replies"] or 0
+
+    for entry in buckets.values():
+        replies = entry["ai_replies"] + entry["human_replies"]
+        if replies:
+            entry["ai_reply_share"] = entry["ai_replies"] / replies
+
+    results = sorted(
+        buckets.values(),
+        key=lambda entry: (entry["week"], entry["agent_id"] is None, entry["agent_id"] or 0),
+    )
+    if use_cache:
+        _cache.set(key, results)
+    return results
+
+
+def clear_cache() -> None:
+    """Drop all cached analytics results."""
+    _cache.clear()
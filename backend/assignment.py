@@ -0,0 +1,416 @@
+import calendar
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import ticket_summary
+from config import settings
+from database import SessionLocal
+from metrics import ASSIGNMENT_QUEUE_DEPTH, ASSIGNMENT_WAIT, TICKET_ASSIGNMENTS
+from models import AgentProfile, Ticket, TicketSummary, User, UserRole
+
+# Tickets in these statuses count towards their agent's load
+OPEN_STATUSES = ("open", "in_progress")
+
+# Load a ticket adds to its agent, by priority
+PRIORITY_WEIGHTS = {"urgent": 3, "high": 2, "medium": 1, "low": 1}
+
+# Queues are served strictly in this order; medium and low share the normal queue
+QUEUES = ("urgent", "high", "normal")
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+FLUSH_CHUNK_SIZE = 500
+
+
+def _value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def priority_weight(priority) -> int:
+    return PRIORITY_WEIGHTS.get(_value(priority), 1)
+
+
+def queue_for(priority) -> str:
+    priority = _value(priority)
+    return priority if priority in ("urgent", "high") else "normal"
+
+
+def parse_skills(skills: Optional[str]) -> FrozenSet[str]:
+    return frozenset(skill.strip() for skill in (skills or "").split(",") if skill.strip())
+
+
+def settled(key: ticket_summary.SummaryKey) -> bool:
+    """Whether a ticket with this summary key no longer needs the scheduler."""
+    status, priority, agent_id = key
+    return status not in OPEN_STATUSES or agent_id != ticket_summary.UNASSIGNED
+
+
+def _epoch(moment: Optional[datetime]) -> float:
+    # created_at is stored in UTC, with or without tzinfo depending on the backend
+    return calendar.timegm(moment.utctimetuple()) if moment else time.time()
+
+
+class QueuedTicket:
+    __slots__ = ("ticket_id", "priority", "topic", "enqueued_at")
+
+    def __init__(self, ticket_id: int, priority, topic: Optional[str], enqueued_at: float):
+        self.ticket_id = ticket_id
+        self.priority = _value(priority)
+        self.topic = topic
+        self.enqueued_at = enqueued_at
+
+
+class AgentState:
+    __slots__ = ("agent_id", "skills", "capacity", "load")
+
+    def __init__(self, agent_id: int, skills: FrozenSet[str], capacity: int, load: int = 0):
+        self.agent_id = agent_id
+        self.skills = skills
+        self.capacity = max(1, capacity)
+        self.load = load
+
+    @property
+    def has_room(self) -> bool:
+        return self.load < self.capacity
+
+    def covers(self, topic: Optional[str]) -> bool:
+        """Agents without listed skills take any topic."""
+        return not self.skills or topic is None or topic in self.skills
+
+
+class AssignmentScheduler:
+    """Assigns new tickets to agents from an in-memory view of agent load and skills.
+
+    Tickets wait in per-priority queues (urgent, then high, then the rest)
+    and go to the covering agent with the lowest load relative to capacity,
+    where load is the priority-weighted count of the agent's open tickets.
+    Assignments take effect in memory immediately and are written to the
+    database in batches by a background thread. The batch UPDATE only
+    touches tickets that are still open and unassigned, so a manual
+    assignment (or another worker) always wins a race.
+
+    Loads are seeded from the ticket_summary table, kept current through
+    record_moves() as tickets change, and re-read every resync interval to
+    absorb changes made by other processes. Flushes and resyncs run on the
+    same background thread, so a resync never sees a half-written batch.
+    """
+
+    def __init__(self, default_capacity: int = 10, batch_size: int = 50,
+                 flush_seconds: float = 1.0, resync_seconds: float = 60.0):
+        self.default_capacity = default_capacity
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.resync_seconds = resync_seconds
+        self._agents: Dict[int, AgentState] = {}
+        self._queues: Dict[str, Deque[QueuedTicket]] = {name: deque() for name in QUEUES}
+        # ticket id -> queue entry; forgotten tickets are dropped here and skipped lazily
+        self._queued: Dict[int, QueuedTicket] = {}
+        # ticket id -> (agent id, entry) assigned in memory but not yet persisted
+        self._pending: Dict[int, Tuple[int, QueuedTicket]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self, db: Session) -> None:
+        """(Re)build the agent view and queue every open, unassigned ticket."""
+        profiles = {profile.agent_id: profile for profile in db.query(AgentProfile)}
+        agent_ids = [row.id for row in db.query(User.id).filter(
+            User.role == UserRole.AGENT,
+            User.is_active == True
+        )]
+        loads: Dict[int, int] = {}
+        for row in db.query(TicketSummary).filter(
+            TicketSummary.status.in_(OPEN_STATUSES),
+            TicketSummary.agent_id != ticket_summary.UNASSIGNED,
+            TicketSummary.ticket_count > 0
+        ):
+            loads[row.agent_id] = loads.get(row.agent_id, 0) + row.ticket_count * priority_weight(row.priority)
+        unassigned = db.query(Ticket.id, Ticket.priority, Ticket.topic, Ticket.created_at).filter(
+            Ticket.assigned_agent_id.is_(None),
+            Ticket.status.in_(OPEN_STATUSES)
+        ).order_by(Ticket.id).all()
+
+        agents = {}
+        for agent_id in agent_ids:
+            profile = profiles.get(agent_id)
+            agents[agent_id] = AgentState(
+                agent_id,
+                parse_skills(profile.skills if profile else ""),
+                (profile.capacity if profile else None) or self.default_capacity,
+                loads.get(agent_id, 0),
+            )
+
+        with self._lock:
+            # Assignments not yet persisted are missing from ticket_summary
+            for agent_id, entry in self._pending.values():
+                if agent_id in agents:
+                    agents[agent_id].load += priority_weight(entry.priority)
+            self._agents = agents
+            for row in unassigned:
+                if row.id not in self._queued and row.id not in self._pending:
+                    self._enqueue(QueuedTicket(row.id, row.priority, row.topic, _epoch(row.created_at)))
+            self._dispatch()
+
+    def update_agent(self, agent_id: int, skills: FrozenSet[str], capacity: Optional[int]) -> None:
+        with self._lock:
+            agent = self._agents.get(agent_id)
+            if agent is None:
+                agent = self._agents[agent_id] = AgentState(agent_id, skills, self.default_capacity)
+            agent.skills = skills
+            agent.capacity = max(1, capacity or self.default_capacity)
+            self._dispatch()
+
+    def agent_loads(self) -> Dict[int, Tuple[int, int]]:
+        """agent id -> (load, capacity)"""
+        with self._lock:
+            return {agent.agent_id: (agent.load, agent.capacity) for agent in self._agents.values()}
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: sum(1 for entry in queue if entry.ticket_id in self._queued)
+                    for name, queue in self._queues.items()}
+
+    def submit(self, ticket_id: int, priority, topic: Optional[str] = None) -> Optional[int]:
+        """Queue a new ticket and try to place it; returns the agent id if assigned now."""
+        with self._lock:
+            if ticket_id in self._queued or ticket_id in self._pending:
+                return None
+            self._enqueue(QueuedTicket(ticket_id, priority, topic, time.time()))
+            self._dispatch()
+            pending = self._pending.get(ticket_id)
+            backlog = len(self._pending)
+        if backlog >= self.batch_size:
+            self._wake.set()
+        return pending[0] if pending else None
+
+    def _enqueue(self, entry: QueuedTicket) -> None:
+        self._queued[entry.ticket_id] = entry
+        self._queues[queue_for(entry.priority)].append(entry)
+
+    def _choose(self, entry: QueuedTicket) -> Optional[AgentState]:
+        """Weighted least-load agent with room that covers the ticket's topic."""
+        agents = list(self._agents.values())
+        candidates = [agent for agent in agents if agent.has_room and agent.covers(entry.topic)]
+        if not candidates and not any(agent.covers(entry.topic) for agent in agents):
+            # Nobody covers the topic at all, so waiting would not help
+            candidates = [agent for agent in agents if agent.has_room]
+        if not candidates:
+            return None
+        cost = priority_weight(entry.priority)
+        return min(candidates, key=lambda agent: ((agent.load + cost) / agent.capacity, agent.agent_id))
+
+    def _dispatch(self) -> None:
+        """Place queued tickets, highest priority queue first (caller holds the lock)."""
+        now = time.time()
+        for name in QUEUES:
+            queue = self._queues[name]
+            waiting: Deque[QueuedTicket] = deque()
+            while queue:
+                if not any(agent.has_room for agent in self._agents.values()):
+                    break
+                entry = queue.popleft()
+                if self._queued.get(entry.ticket_id) is not entry:
+                    continue
+                agent = self._choose(entry)
+                if agent is None:
+                    waiting.append(entry)
+                    continue
+                agent.load += priority_weight(entry.priority)
+                del self._queued[entry.ticket_id]
+                self._pending[entry.ticket_id] = (agent.agent_id, entry)
+                ASSIGNMENT_WAIT.labels(name).observe(max(0.0, now - entry.enqueued_at))
+            waiting.extend(queue)
+            self._queues[name] = waiting
+            ASSIGNMENT_QUEUE_DEPTH.labels(name).set(len(waiting))
+
+    def _apply(self, key: Optional[ticket_summary.SummaryKey], delta: int) -> None:
+        if key is None:
+            return
+        status, priority, agent_id = key
+        agent = self._agents.get(agent_id)
+        if agent is not None and status in OPEN_STATUSES:
+            agent.load = max(0, agent.load + delta * priority_weight(priority))
+
+    def record_moves(self, moves: Iterable[Tuple[ticket_summary.SummaryKey, ticket_summary.SummaryKey, int]],
+                     ticket_ids: Iterable[int] = ()) -> None:
+        """Mirror ticket_summary moves made outside the scheduler.
+
+        A None key stands for a deleted ticket. `ticket_ids` are tickets that
+        were assigned, closed or deleted outside the scheduler; they leave
+        the queue, and unpersisted scheduler assignments of them are dropped.
+        """
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self._queued.pop(ticket_id, None)
+                pending = self._pending.pop(ticket_id, None)
+                if pending is not None:
+                    agent_id, entry = pending
+                    self._apply(("open", entry.priority, agent_id), -1)
+            for before, after, count in moves:
+                if before != after:
+                    self._apply(before, -count)
+                    self._apply(after, count)
+            self._dispatch()
+
+    def flush(self) -> int:
+        """Write pending assignments in batched UPDATEs; returns how many were persisted."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+        by_agent: Dict[int, List[int]] = {}
+        for ticket_id, (agent_id, entry) in batch.items():
+            by_agent.setdefault(agent_id, []).append(ticket_id)
+
+        persisted = set()
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            moves = []
+            for agent_id, ticket_ids in by_agent.items():
+                for start in range(0, len(ticket_ids), FLUSH_CHUNK_SIZE):
+                    chunk = ticket_ids[start:start + FLUSH_CHUNK_SIZE]
+                    query = db.query(Ticket).filter(
+                        Ticket.id.in_(chunk),
+                        Ticket.assigned_agent_id.is_(None),
+                        Ticket.status.in_(OPEN_STATUSES)
+                    )
+                    rows = query.with_entities(Ticket.id, Ticket.status, Ticket.priority).all()
+                    matched = query.update(
+                        {"assigned_agent_id": agent_id, "updated_at": now},
+                        synchronize_session=False
+                    )
+                    if matched != len(rows):
+                        changed = {row.id for row in db.query(Ticket.id).filter(
+                            Ticket.id.in_(chunk),
+                            Ticket.assigned_agent_id == agent_id,
+                            Ticket.updated_at == now
+                        )}
+                        rows = [row for row in rows if row.id in changed]
+                    for row in rows:
+                        persisted.add(row.id)
+                        moves.append((
+                            ticket_summary.summary_key(row.status, row.priority, None),
+                            ticket_summary.summary_key(row.status, row.priority, agent_id),
+                            1
+                        ))
+            ticket_summary.record_moves(db, moves)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[-] Persisting ticket assignments failed, will retry: {e}")
+            with self._lock:
+                for ticket_id, pending in batch.items():
+                    self._pending.setdefault(ticket_id, pending)
+            return 0
+        finally:
+            db.close()
+
+        # Tickets assigned or closed elsewhere in the meantime give their load back
+        lost = [pending for ticket_id, pending in batch.items() if ticket_id not in persisted]
+        if lost:
+            with self._lock:
+                for agent_id, entry in lost:
+                    self._apply(("open", entry.priority, agent_id), -1)
+                self._dispatch()
+        TICKET_ASSIGNMENTS.labels("persisted").inc(len(persisted))
+        TICKET_ASSIGNMENTS.labels("conflict").inc(len(lost))
+        return len(persisted)
+
+    def resync(self) -> None:
+        db = SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ticket-assignment", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        last_resync = time.monotonic()
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - last_resync >= self.resync_seconds:
+                    self.resync()
+                    last_resync = time.monotonic()
+            except Exception as e:
+                print(f"[-] Ticket assignment loop error: {e}")
+
+
+def ticket_topic(title: str, description: Optional[str], vector: Optional[np.ndarray] = None) -> Optional[str]:
+    """The default knowledge base topic closest to the ticket, or None if nothing is close enough."""
+    try:
+        from kb_store import DEFAULT_TENANT
+        from tenant_indexes import get_index_manager
+        engine = get_index_manager().get(DEFAULT_TENANT)
+        if vector is None:
+            vector = engine.model.encode([f"{title}\n{description or ''}"], convert_to_tensor=False)[0]
+        ranked = engine.classify_topics(np.asarray(vector, dtype='float32'))
+    except Exception as e:
+        print(f"[-] Ticket topic classification failed: {e}")
+        return None
+    if ranked and ranked[0][1] >= settings.ASSIGNMENT_TOPIC_MIN_SCORE:
+        return ranked[0][0]
+    return None
+
+
+_scheduler: Optional[AssignmentScheduler] = None
+
+
+def start_scheduler() -> Optional[AssignmentScheduler]:
+    """Load agent state and start this process's scheduler; None when disabled."""
+    global _scheduler
+    if not settings.ASSIGNMENT_ENABLED:
+        return None
+    if _scheduler is None:
+        scheduler = AssignmentScheduler(
+            default_capacity=settings.ASSIGNMENT_AGENT_CAPACITY,
+            batch_size=settings.ASSIGNMENT_BATCH_SIZE,
+            flush_seconds=settings.ASSIGNMENT_FLUSH_SECONDS,
+            resync_seconds=settings.ASSIGNMENT_RESYNC_SECONDS,
+        )
+        scheduler.resync()
+        scheduler.start()
+        _scheduler = scheduler
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    """Stop the scheduler, persisting assignments still pending."""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def get_scheduler() -> Optional[AssignmentScheduler]:
+    """The running scheduler, or None when disabled or not started."""
+    return _scheduler
+
+
+def record_moves(moves, ticket_ids: Iterable[int] = ()) -> None:
+    """Tell a running scheduler about ticket changes made by the API."""
+    if _scheduler is not None:
+        _scheduler.record_moves(moves, ticket_ids)
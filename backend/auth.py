@@ -5,9 +5,10 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from . import models, schemas
-from .database import get_db
-from .config import settings
+import models, schemas
+from database import get_db
+from config import settings
+from tracing import span
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -46,15 +47,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     )
     
     try:
-        payload = decode_token(token)
-        if payload is None:
-            raise credentials_exception
-        
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
+        with span("auth.lookup"):
+            payload = decode_token(token)
+            if payload is None:
+                raise credentials_exception
             
-        user = db.query(models.User).filter(models.User.id == user_id).first()
+            user_id: int = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+                
+            user = db.query(models.User).filter(models.User.id == user_id).first()
         if user is None:
             raise credentials_exception
             
@@ -0,0 +1,306 @@
+"""
+End-to-end load test for the API.
+
+Seeds a fresh SQLite database, boots the app with a stub LLM
+(stub_server.py), drives each scenario at a fixed concurrency and writes
+throughput and latency percentiles to a JSON file so runs can be compared
+across commits. The run fails if any scenario's non-2xx rate exceeds
+--max-error-rate, so error responses are never reported as throughput.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --users 1000 --tickets 20000 \\
+        --messages-per-ticket 5 --concurrency 32 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from common import BACKEND_DIR, environment, latency_summary, write_results
+
+BENCH_PASSWORD = "BenchPassw0rd"
+
+CHAT_QUESTIONS = [
+    "How much is shipping?",
+    "Do you deliver overseas?",
+    "Can I book a brewery tour?",
+    "Do you have gluten free beer?",
+    "How can I track my delivery?",
+    "What is 2+2?",
+]
+
+SCENARIOS = ["chat", "login", "list_tickets", "create_message"]
+
+
+def seed_database(workdir: str, users: int, agents: int, tickets: int, messages_per_ticket: int) -> Dict:
+    """Create ./customer_support.db inside `workdir` with synthetic data."""
+    os.chdir(workdir)
+    # database.py resolves its SQLite path relative to the working directory
+    from passlib.context import CryptContext
+    from database import Base, SessionLocal, engine
+    from models import Message, Ticket, User
+
+    Base.metadata.create_all(bind=engine)
+    hashed = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(BENCH_PASSWORD)
+    rng = random.Random(42)
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        user_rows = [{
+            "id": 1, "email": "admin@bench.example.com", "hashed_password": hashed,
+            "full_name": "Bench Admin", "role": "admin", "is_active": True,
+        }]
+        for i in range(agents):
+            user_rows.append({
+                "id": 2 + i, "email": f"agent{i}@bench.example.com", "hashed_password": hashed,
+                "full_name": f"Agent {i}", "role": "agent", "is_active": True,
+            })
+        first_customer = 2 + agents
+        for i in range(users):
+            user_rows.append({
+                "id": first_customer + i, "email": f"customer{i}@bench.example.com", "hashed_password": hashed,
+                "full_name": f"Customer {i}", "role": "customer", "is_active": True,
+            })
+        db.bulk_insert_mappings(User, user_rows)
+        db.commit()
+
+        statuses = ["open", "in_progress", "resolved", "closed"]
+        priorities = ["low", "medium", "high", "urgent"]
+        message_id = 1
+        batch_tickets, batch_messages = [], []
+        for ticket_id in range(1, tickets + 1):
+            customer_id = first_customer + rng.randrange(users)
+            ticket = {
+                "id": ticket_id,
+                "title": f"Question about order {ticket_id}",
+                "description": rng.choice(CHAT_QUESTIONS),
+                "status": rng.choice(statuses),
+                "priority": rng.choice(priorities),
+                "customer_id": customer_id,
+                "assigned_agent_id": 2 + rng.randrange(agents) if agents and rng.random() < 0.7 else None,
+            }
+            batch_tickets.append(ticket)
+            for n in range(messages_per_ticket):
+                from_customer = n % 2 == 0 or not agents
+                batch_messages.append({
+                    "id": message_id,
+                    "content": f"Message {n} on ticket {ticket_id}: {rng.choice(CHAT_QUESTIONS)}",
+                    "ticket_id": ticket_id,
+                    "user_id": customer_id if from_customer else 2 + rng.randrange(agents),
+                    "is_ai_generated": not from_customer and rng.random() < 0.5,
+                })
+                message_id += 1
+            if len(batch_tickets) >= 5000:
+                db.bulk_insert_mappings(Ticket, batch_tickets)
+                db.bulk_insert_mappings(Message, batch_messages)
+                db.commit()
+                batch_tickets, batch_messages = [], []
+        db.bulk_insert_mappings(Ticket, batch_tickets)
+        db.bulk_insert_mappings(Message, batch_messages)
+        db.commit()
+    finally:
+        db.close()
+
+    return {
+        "customers": users,
+        "agents": agents,
+        "tickets": tickets,
+        "messages": tickets * messages_per_ticket,
+        "first_customer_id": first_customer,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def start_server(workdir: str, port: int, llm_latency_ms: float, extra_env: Dict = None) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, **(extra_env or {}))
+    return subprocess.Popen(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stub_server.py"),
+            "--port", str(port), "--llm-latency-ms", str(llm_latency_ms),
+        ],
+        cwd=workdir,
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/openapi.json")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+async def login(client: httpx.AsyncClient, email: str) -> Dict:
+    """Log a customer in and note their own tickets, which they may post messages to."""
+    response = await client.post("/api/login", json={"email": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = await client.get("/api/tickets/", params={"limit": 100}, headers=headers)
+    response.raise_for_status()
+    return {"headers": headers, "ticket_ids": [ticket["id"] for ticket in response.json()]}
+
+
+def build_request(scenario: str, rng: random.Random, seed: Dict, sessions: List[Dict]) -> Dict:
+    """Return httpx.request kwargs for one request of `scenario`."""
+    session = rng.choice(sessions) if sessions else {"headers": {}, "ticket_ids": []}
+    headers = session["headers"]
+    if scenario == "chat":
+        return {"method": "POST", "url": "/api/chat", "json": {"message": rng.choice(CHAT_QUESTIONS)}}
+    if scenario == "login":
+        email = f"customer{rng.randrange(seed['customers'])}@bench.example.com"
+        return {"method": "POST", "url": "/api/login", "json": {"email": email, "password": BENCH_PASSWORD}}
+    if scenario == "list_tickets":
+        return {"method": "GET", "url": "/api/tickets/", "params": {"limit": 50}, "headers": headers}
+    if scenario == "create_message":
+        return {
+            "method": "POST",
+            "url": "/api/messages/",
+            "json": {"content": "Any update on this?", "ticket_id": rng.choice(session["ticket_ids"])},
+            "headers": headers,
+        }
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(
+    base_url: str, scenario: str, concurrency: int, duration: float, seed: Dict, sessions: List[Dict]
+) -> Dict:
+    """Run `concurrency` closed-loop workers against one scenario for `duration` seconds."""
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker(worker_id: int):
+            nonlocal errors
+            rng = random.Random(worker_id)
+            while time.perf_counter() < deadline:
+                request = build_request(scenario, rng, seed, sessions)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                code = str(response.status_code)
+                status_codes[code] = status_codes.get(code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ok = sum(count for code, count in status_codes.items() if code.startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "success_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - ok / (len(latencies) + errors), 4) if latencies or errors else 0.0,
+        "status_codes": status_codes,
+        "transport_errors": errors,
+        "latency": latency_summary(latencies),
+    }
+
+
+async def drive(args, seed: Dict) -> Dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    await wait_until_ready(base_url)
+
+    sessions = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        for i in range(min(args.token_users, seed["customers"])):
+            sessions.append(await login(client, f"customer{i}@bench.example.com"))
+
+    results = {}
+    for scenario in args.scenarios:
+        scenario_sessions = sessions
+        if scenario == "create_message":
+            scenario_sessions = [session for session in sessions if session["ticket_ids"]]
+            if not scenario_sessions:
+                raise RuntimeError("None of the logged-in customers has a ticket to post messages to")
+        if args.warmup:
+            await run_scenario(base_url, scenario, args.concurrency, args.warmup, seed, scenario_sessions)
+        print(f"[*] Running {scenario} for {args.duration}s at concurrency {args.concurrency}...")
+        results[scenario] = await run_scenario(
+            base_url, scenario, args.concurrency, args.duration, seed, scenario_sessions
+        )
+        summary = results[scenario]
+        print(
+            f"    {summary['throughput_rps']} req/s, "
+            f"p50 {summary['latency'].get('p50_ms')} ms, p99 {summary['latency'].get('p99_ms')} ms, "
+            f"status {summary['status_codes']}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API load test")
+    parser.add_argument("--users", type=int, default=500, help="Seeded customers")
+    parser.add_argument("--agents", type=int, default=10, help="Seeded agents")
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--messages-per-ticket", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--token-users", type=int, default=20, help="Customers logged in before the run")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Fail the run if any scenario has more non-2xx responses than this")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workdir", default=None, help="Directory for the seeded DB (default: temp dir)")
+    parser.add_argument("--output", default=None, help="Result JSON path")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="support-bench-")
+    print(f"--- SEEDING {workdir} ---")
+    seed = seed_database(workdir, args.users, args.agents, args.tickets, args.messages_per_ticket)
+    print(f"[+] Seeded {seed['tickets']} tickets / {seed['messages']} messages in {seed['seconds']}s")
+
+    server = start_server(workdir, args.port, args.llm_latency_ms)
+    try:
+        results = asyncio.run(drive(args, seed))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "workdir")}
+    path = write_results("load_test", {
+        "environment": environment(),
+        "config": config,
+        "seed": seed,
+        "scenarios": results,
+    }, args.output)
+    failed = {
+        scenario: summary["error_rate"]
+        for scenario, summary in results.items()
+        if summary["error_rate"] > args.max_error_rate
+    }
+    if failed:
+        for scenario, rate in failed.items():
+            print(f"[-] {scenario}: {rate:.1%} of requests failed (limit {args.max_error_rate:.1%})")
+        print(f"[-] Results written to {path}, but the run is not valid")
+        sys.exit(1)
+    print(f"[SUCCESS] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
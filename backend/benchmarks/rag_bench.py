@@ -0,0 +1,221 @@
+"""
+Microbenchmarks for rag_engine.RAGEngine, without the web stack.
+
+For each synthetic knowledge-base size this measures index build time,
+single-query and batched retrieve_relevant_faqs latency, memory footprint
+and recall@k (the share of paraphrased queries with a matching FAQ in the
+top k). Build time and memory are measured in separate builds, so tracing
+allocations does not slow the timed one.
+
+Usage (from backend/):
+    python benchmarks/rag_bench.py --sizes 100 1000 10000 --encoder hash
+    python benchmarks/rag_bench.py --sizes 100 1000 --encoder sentence-transformers
+
+The "hash" encoder is a deterministic bag-of-words hashing encoder that
+isolates index and scoring costs from the transformer forward pass; use
+"sentence-transformers" to include real embedding cost and quality.
+"""
+import argparse
+import random
+import re
+import resource
+import time
+import tracemalloc
+import zlib
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from common import environment, latency_summary, write_results
+
+TOPICS = [
+    "Web Order Shipping", "General Order Queries", "The Tap Yard",
+    "Brewery Tours", "Beer & Ingredients", "Gift Vouchers",
+]
+SUBJECTS = [
+    "shipping", "delivery", "collection", "tour", "voucher", "refund", "order",
+    "beer", "gluten", "allergen", "keg", "subscription", "discount", "event",
+    "booking", "parking", "dog", "age", "tasting", "merchandise",
+]
+QUALIFIERS = [
+    "overseas", "next day", "weekend", "group", "corporate", "birthday",
+    "vegan", "alcohol free", "damaged", "late", "missing", "cancelled",
+    "student", "local", "bulk", "seasonal", "limited", "returning",
+]
+TEMPLATES = [
+    "How does {subject} work for {qualifier} customers?",
+    "Can I get {qualifier} {subject}?",
+    "What is your policy on {qualifier} {subject}?",
+    "Do you offer {subject} for {qualifier} orders?",
+    "Is {subject} available on {qualifier} requests?",
+]
+
+
+class HashingEncoder:
+    """Cheap stand-in for SentenceTransformer.encode using feature hashing."""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, texts: List[str], convert_to_tensor: bool = False, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().replace("?", " ").split():
+                vectors[row, zlib.crc32(token.encode('utf-8')) % self.dimension] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def synthetic_faqs(size: int, rng: random.Random) -> List[Dict]:
+    """Generate `size` FAQ records shaped like data/faqs.json."""
+    faqs = []
+    for i in range(size):
+        subject = rng.choice(SUBJECTS)
+        qualifier = rng.choice(QUALIFIERS)
+        question = rng.choice(TEMPLATES).format(subject=subject, qualifier=qualifier)
+        faqs.append({
+            "id": f"faq_{i + 1}",
+            "topic": rng.choice(TOPICS),
+            # A numeric suffix keeps questions distinct at large sizes; queries never contain it
+            "question": f"{question} (ref {i})",
+            "answer": f"Answer {i} about {qualifier} {subject}.",
+            "category": subject,
+        })
+    return faqs
+
+
+REF_TAG = re.compile(r" \(ref \d+\)$")
+
+
+def base_question(question: str) -> str:
+    return REF_TAG.sub("", question)
+
+
+def paraphrase(question: str, rng: random.Random) -> str:
+    """Drop one word and lowercase; the reference tag is removed so it cannot give the answer away."""
+    words = base_question(question).rstrip("?").split()
+    if len(words) > 4:
+        del words[rng.randrange(1, len(words) - 1)]
+    return " ".join(words).lower()
+
+
+def make_queries(faqs: List[Dict], count: int, rng: random.Random) -> List[Tuple[str, Set[str]]]:
+    """(query, ids of every FAQ with the source's question) pairs.
+
+    Without the tag, FAQs generated from the same template and words are
+    indistinguishable, so any of them counts as a hit.
+    """
+    same_question: Dict[str, Set[str]] = {}
+    for faq in faqs:
+        same_question.setdefault(base_question(faq["question"]), set()).add(faq["id"])
+    picks = [rng.randrange(len(faqs)) for _ in range(count)]
+    return [
+        (paraphrase(faqs[i]["question"], rng), same_question[base_question(faqs[i]["question"])])
+        for i in picks
+    ]
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def bench_size(size: int, encoder, args, rng: random.Random) -> Dict:
+    from rag_engine import RAGEngine
+
+    faqs = synthetic_faqs(size, rng)
+    queries = make_queries(faqs, args.queries, rng)
+
+    rss_before = max_rss_mb()
+    started = time.perf_counter()
+    engine = RAGEngine(faqs=faqs, model=encoder, route_queries=args.route)
+    build_seconds = time.perf_counter() - started
+    rss_after = max_rss_mb()
+
+    # Allocation tracing slows the build, so peak memory comes from a second one
+    tracemalloc.start()
+    traced = RAGEngine(faqs=faqs, model=encoder, route_queries=args.route)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+
+    # Single-query latency; threshold 0 so every query returns k results
+    single = []
+    hits = {k: 0 for k in args.recall_k}
+    max_k = max(args.recall_k)
+    for query, expected in queries:
+        started = time.perf_counter()
+        results = engine.retrieve_relevant_faqs(query, k=max_k, threshold=0.0)
+        single.append((time.perf_counter() - started) * 1000.0)
+        ids = [faq["id"] for faq in results]
+        for k in args.recall_k:
+            if expected.intersection(ids[:k]):
+                hits[k] += 1
+
+    batched = {}
+    texts = [query for query, _ in queries]
+    for batch_size in args.batch_sizes:
+        per_query = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            started = time.perf_counter()
+            engine.retrieve_relevant_faqs_batch(batch, k=max_k, threshold=0.0)
+            per_query.append((time.perf_counter() - started) * 1000.0 / len(batch))
+        batched[str(batch_size)] = latency_summary(per_query)
+
+    return {
+        "size": size,
+        "build_seconds": round(build_seconds, 4),
+        "memory": {
+            "index_bytes": int(engine.index.ntotal * engine.index.d * 4),
+            "python_peak_bytes_during_build": traced_peak,
+            "max_rss_mb": round(rss_after, 1),
+            "max_rss_growth_mb": round(rss_after - rss_before, 1),
+        },
+        "single_query": latency_summary(single),
+        "batched_per_query": batched,
+        "recall": {f"recall@{k}": round(hits[k] / len(queries), 4) for k in args.recall_k},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAGEngine retrieval microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--encoder", choices=["hash", "sentence-transformers"], default="hash")
+    parser.add_argument("--model-name", default="all-MiniLM-L6-v2")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--recall-k", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--route", action="store_true", help="Route single queries to topic partitions")
+    parser.add_argument("--output", default=None, help="Result JSON path")
+    args = parser.parse_args()
+
+    if args.encoder == "hash":
+        encoder = HashingEncoder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(args.model_name)
+
+    results = []
+    for size in args.sizes:
+        print(f"[*] Benchmarking {size} FAQs...")
+        result = bench_size(size, encoder, args, random.Random(args.seed))
+        results.append(result)
+        print(
+            f"    build {result['build_seconds']}s, "
+            f"p50 {result['single_query'].get('p50_ms')} ms, "
+            f"{result['recall']}"
+        )
+
+    path = write_results("rag_bench", {
+        "environment": environment(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }, args.output)
+    print(f"[SUCCESS] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
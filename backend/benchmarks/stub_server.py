@@ -0,0 +1,34 @@
+"""
+Run the API with the stub LLM provider.
+
+Used by load_test.py; the database is ./customer_support.db relative to the
+working directory, so start it from the directory holding the seeded DB.
+Stub behaviour comes from the STUB_LLM_* settings (see config.py).
+"""
+import argparse
+import os
+
+import common  # noqa: F401  (puts the backend directory on sys.path)
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with the stub LLM provider")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency-ms", type=float, default=None, help="Overrides STUB_LLM_LATENCY_MS")
+    parser.add_argument("--no-faq-fast-path", action="store_true", help="Send every chat question to the LLM")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so set them before importing main
+    os.environ["LLM_PROVIDER"] = "stub"
+    if args.llm_latency_ms is not None:
+        os.environ["STUB_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    if args.no_faq_fast_path:
+        os.environ["FAQ_FAST_PATH_ENABLED"] = "False"
+
+    import main as app_module
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import secrets
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import ChatSession, ChatTurn
+
+# (previous summary, transcript of turns to fold in) -> new summary
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+# Sessions with a compaction in progress in this process
+_compacting: Set[str] = set()
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _clip_tail(text: str, limit: int) -> str:
+    """Keep the most recent `limit` characters of a summary."""
+    return text if len(text) <= limit else "..." + text[-(limit - 3):].lstrip()
+
+
+def get_or_create_session(db: Session, session_id: Optional[str], user_id: Optional[int] = None) -> ChatSession:
+    """Load the session, or start a new one when the id is missing, unknown or another user's.
+
+    Anonymous sessions (user_id None) can be continued by anyone holding the id.
+    """
+    if session_id:
+        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if session and session.user_id in (None, user_id):
+            return session
+    session = ChatSession(id=secrets.token_hex(16), user_id=user_id, summary="", summarized_through=0)
+    db.add(session)
+    db.commit()
+    return session
+
+
+def recent_turns(db: Session, session: ChatSession, limit: Optional[int] = None) -> List[ChatTurn]:
+    """The newest `limit` turns of the session, oldest first."""
+    limit = limit or settings.CHAT_HISTORY_TURNS
+    turns = db.query(ChatTurn).filter(
+        ChatTurn.session_id == session.id
+    ).order_by(ChatTurn.id.desc()).limit(limit).all()
+    return list(reversed(turns))
+
+
+def format_transcript(turns: List[ChatTurn]) -> str:
+    labels = {"user": "User", "assistant": "Assistant"}
+    return "\n".join(
+        f"{labels.get(turn.role, turn.role)}: {_clip(turn.content, settings.CHAT_TURN_MAX_CHARS)}"
+        for turn in turns
+    )
+
+
+def build_history(db: Session, session: ChatSession) -> str:
+    """Conversation context for the next prompt: rolling summary plus recent turns.
+
+    Both parts are capped (CHAT_SUMMARY_MAX_CHARS, CHAT_HISTORY_TURNS x
+    CHAT_TURN_MAX_CHARS), so the prompt stays the same size however long
+    the conversation runs.
+    """
+    parts = []
+    if session.summary:
+        parts.append(f"Summary of earlier conversation: {session.summary}")
+    turns = recent_turns(db, session)
+    if turns:
+        parts.append(format_transcript(turns))
+    return "\n".join(parts)
+
+
+def add_exchange(db: Session, session: ChatSession, question: str, answer: str) -> None:
+    db.add_all([
+        ChatTurn(session_id=session.id, role="user", content=question),
+        ChatTurn(session_id=session.id, role="assistant", content=answer),
+    ])
+    db.commit()
+
+
+def extractive_summary(previous: str, transcript: str) -> str:
+    """Summary that just appends the folded turns; used when no LLM is available."""
+    combined = f"{previous} {transcript}".strip()
+    return _clip_tail(" ".join(combined.split()), settings.CHAT_SUMMARY_MAX_CHARS)
+
+
+def _load_overflow(db: Session, session_id: str) -> Optional[Tuple[ChatSession, List[ChatTurn]]]:
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if not session:
+        return None
+    pending = db.query(ChatTurn).filter(
+        ChatTurn.session_id == session_id,
+        ChatTurn.id > session.summarized_through,
+    ).order_by(ChatTurn.id).all()
+    overflow = pending[:max(0, len(pending) - settings.CHAT_HISTORY_TURNS)]
+    return (session, overflow) if overflow else None
+
+
+def _save_summary(db: Session, session: ChatSession, summary: str, through: int) -> None:
+    session.summary = _clip_tail(summary.strip(), settings.CHAT_SUMMARY_MAX_CHARS)
+    session.summarized_through = through
+    db.commit()
+
+
+async def compact_session(session_id: str, summarize: Optional[Summarizer] = None) -> None:
+    """Fold turns that have left the recent window into the rolling summary.
+
+    Runs after the response is sent, with its own database session. Each
+    turn is summarized once, so the work per request stays constant. The
+    database work runs in the threadpool, off the event loop.
+    """
+    if session_id in _compacting:
+        return
+    _compacting.add(session_id)
+    db = SessionLocal()
+    try:
+        loaded = await run_in_threadpool(_load_overflow, db, session_id)
+        if loaded is None:
+            return
+        session, overflow = loaded
+
+        transcript = format_transcript(overflow)
+        summary = None
+        if summarize is not None:
+            try:
+                summary = await summarize(session.summary, transcript)
+            except Exception as e:
+                print(f"[-] Chat summary failed, keeping extractive summary: {e}")
+        if not summary:
+            summary = extractive_summary(session.summary, transcript)
+
+        await run_in_threadpool(_save_summary, db, session, summary, overflow[-1].id)
+    finally:
+        await run_in_threadpool(db.close)
+        _compacting.discard(session_id)
@@ -29,6 +29,91 @@ class Settings(BaseSettings):
     # Google Gemini API
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     
+    # LLM provider ("gemini" or "stub" for offline testing and load tests)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+    STUB_LLM_LATENCY_MS: float = float(os.getenv("STUB_LLM_LATENCY_MS", "200"))
+    STUB_LLM_JITTER_MS: float = float(os.getenv("STUB_LLM_JITTER_MS", "50"))
+    STUB_LLM_CHUNKS_PER_SECOND: float = float(os.getenv("STUB_LLM_CHUNKS_PER_SECOND", "20"))
+    STUB_LLM_OUTPUT_TOKENS: int = int(os.getenv("STUB_LLM_OUTPUT_TOKENS", "120"))
+    STUB_LLM_ERROR_RATE: float = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+    # Share one upstream call among concurrent identical chat prompts
+    LLM_COALESCING_ENABLED: bool = os.getenv("LLM_COALESCING_ENABLED", "True").lower() == "true"
+    # Cache the static chat instruction + knowledge base as a prompt prefix
+    LLM_PREFIX_CACHE_ENABLED: bool = os.getenv("LLM_PREFIX_CACHE_ENABLED", "True").lower() == "true"
+    LLM_PREFIX_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_PREFIX_CACHE_TTL_SECONDS", "3600"))
+    # Prefixes cached at once (one per tenant); least recently used go first
+    LLM_PREFIX_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_PREFIX_CACHE_MAX_ENTRIES", "64"))
+    # Client-side rate limiting, retries and circuit breaker for LLM calls
+    LLM_RATE_LIMIT_PER_SECOND: float = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", "5"))
+    LLM_RATE_LIMIT_BURST: float = float(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS: float = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "2"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_DELAY_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+    LLM_RETRY_MAX_DELAY_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "4"))
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    # Answer chat questions straight from the FAQ index above this similarity
+    FAQ_FAST_PATH_ENABLED: bool = os.getenv("FAQ_FAST_PATH_ENABLED", "True").lower() == "true"
+    FAQ_FAST_PATH_THRESHOLD: float = float(os.getenv("FAQ_FAST_PATH_THRESHOLD", "0.8"))
+    # Re-read a tenant's FAQ file when its mtime changes, checked at most this often (0 disables)
+    KB_RELOAD_CHECK_SECONDS: float = float(os.getenv("KB_RELOAD_CHECK_SECONDS", "5"))
+    # Per-tenant FAQ indexes: persisted under RAG_INDEX_DIR, LRU-evicted above the budget
+    RAG_INDEX_DIR: str = os.getenv("RAG_INDEX_DIR", "indexes")
+    RAG_MEMORY_BUDGET_MB: int = int(os.getenv("RAG_MEMORY_BUDGET_MB", "512"))
+    # Topic/category filter partitions kept per tenant index (LRU)
+    RAG_MAX_FILTERED_PARTITIONS: int = int(os.getenv("RAG_MAX_FILTERED_PARTITIONS", "32"))
+    # Optional cross-encoder rerank of FAQ candidates, skipped past the latency budget
+    RAG_RERANK_ENABLED: bool = os.getenv("RAG_RERANK_ENABLED", "False").lower() == "true"
+    RAG_RERANK_MODEL: str = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RAG_RERANK_CANDIDATES: int = int(os.getenv("RAG_RERANK_CANDIDATES", "10"))
+    RAG_RERANK_BUDGET_MS: float = float(os.getenv("RAG_RERANK_BUDGET_MS", "50"))
+    # Duplicate ticket check at creation ("flag", "merge" into the open ticket, or "off")
+    DUPLICATE_TICKET_ACTION: str = os.getenv("DUPLICATE_TICKET_ACTION", "flag")
+    DUPLICATE_TICKET_THRESHOLD: float = float(os.getenv("DUPLICATE_TICKET_THRESHOLD", "0.85"))
+    DUPLICATE_TICKET_MAX_CUSTOMERS: int = int(os.getenv("DUPLICATE_TICKET_MAX_CUSTOMERS", "10000"))
+    # Rebuild a customer's index after this long, picking up other processes' changes
+    DUPLICATE_TICKET_INDEX_TTL_SECONDS: float = float(os.getenv("DUPLICATE_TICKET_INDEX_TTL_SECONDS", "300"))
+    # Automatic ticket assignment: weighted least-load over agents, batched writes
+    ASSIGNMENT_ENABLED: bool = os.getenv("ASSIGNMENT_ENABLED", "True").lower() == "true"
+    ASSIGNMENT_AGENT_CAPACITY: int = int(os.getenv("ASSIGNMENT_AGENT_CAPACITY", "10"))
+    ASSIGNMENT_BATCH_SIZE: int = int(os.getenv("ASSIGNMENT_BATCH_SIZE", "50"))
+    ASSIGNMENT_FLUSH_SECONDS: float = float(os.getenv("ASSIGNMENT_FLUSH_SECONDS", "1.0"))
+    ASSIGNMENT_RESYNC_SECONDS: float = float(os.getenv("ASSIGNMENT_RESYNC_SECONDS", "60"))
+    ASSIGNMENT_TOPIC_MIN_SCORE: float = float(os.getenv("ASSIGNMENT_TOPIC_MIN_SCORE", "0.3"))
+    # Ticket priority/topic classifier (train with: python ticket_classifier.py train)
+    TICKET_CLASSIFIER_ENABLED: bool = os.getenv("TICKET_CLASSIFIER_ENABLED", "True").lower() == "true"
+    TICKET_CLASSIFIER_PATH: str = os.getenv("TICKET_CLASSIFIER_PATH", "classifiers/ticket_classifier.npz")
+    TICKET_CLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("TICKET_CLASSIFIER_MIN_CONFIDENCE", "0.6"))
+    # Only predictions are recorded until a `ticket_classifier.py report` has been reviewed
+    TICKET_CLASSIFIER_OVERRIDE_PRIORITY: bool = os.getenv("TICKET_CLASSIFIER_OVERRIDE_PRIORITY", "False").lower() == "true"
+    # SLA targets in minutes per priority; the lease-holding worker escalates and/or notifies on breach
+    SLA_ENABLED: bool = os.getenv("SLA_ENABLED", "True").lower() == "true"
+    SLA_RESPONSE_MINUTES: str = os.getenv("SLA_RESPONSE_MINUTES", "urgent=60,high=240,medium=480,low=1440")
+    SLA_RESOLUTION_MINUTES: str = os.getenv("SLA_RESOLUTION_MINUTES", "urgent=480,high=1440,medium=4320,low=10080")
+    SLA_BREACH_ACTION: str = os.getenv("SLA_BREACH_ACTION", "both")  # "escalate", "notify" or "both"
+    SLA_LEASE_SECONDS: float = float(os.getenv("SLA_LEASE_SECONDS", "30"))
+    SLA_HORIZON_HOURS: float = float(os.getenv("SLA_HORIZON_HOURS", "24"))
+    # How often the leader re-reads deadlines, which is how soon it sees ones set by other processes
+    SLA_REFRESH_SECONDS: float = float(os.getenv("SLA_REFRESH_SECONDS", "30"))
+    # Chat memory: recent turns sent verbatim, older turns folded into a summary
+    CHAT_HISTORY_TURNS: int = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+    CHAT_TURN_MAX_CHARS: int = int(os.getenv("CHAT_TURN_MAX_CHARS", "1000"))
+    CHAT_SUMMARY_MAX_CHARS: int = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "1500"))
+    
+    # Tracing ("none", "console" or "file")
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+    TRACING_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("TRACING_N_PLUS_ONE_THRESHOLD", "5"))
+    
+    # Profiling (admin-only sampling endpoints; off unless enabled)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_MAX_SECONDS: int = int(os.getenv("PROFILING_MAX_SECONDS", "60"))
+    
+    # Analytics
+    ANALYTICS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+    
     # Email settings
     SMTP_SERVER: Optional[str] = os.getenv("SMTP_SERVER")
     SMTP_PORT: Optional[int] = int(os.getenv("SMTP_PORT", "587"))
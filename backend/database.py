@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -11,9 +13,33 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Existing databases are migrated with `alembic upgrade head` (see start.sh)
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+
 def init_db():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    """Create the tables of a fresh database, or check an existing one is migrated.
+
+    A fresh database is created from the models and stamped at the latest
+    alembic revision. An existing one is never altered here; it must already
+    be at that revision.
+    """
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    script = ScriptDirectory.from_config(config)
+    with engine.begin() as conn:
+        context = MigrationContext.configure(conn)
+        if not inspect(conn).get_table_names():
+            Base.metadata.create_all(bind=conn)
+            context.stamp(script, "head")
+        elif set(context.get_current_heads()) != set(script.get_heads()):
+            raise RuntimeError("Database schema is out of date; run `alembic upgrade head` in backend/")
+    # Create the full-text search index and its sync triggers
+    from search_index import install_search_index
+    install_search_index(engine)
 
 # Dependency to get DB session
 def get_db():
@@ -0,0 +1,315 @@
+"""
+Bulk import of historical users, tickets and messages from JSONL.
+
+Each line is a JSON object with a "type" of "user", "ticket" or "message";
+the remaining fields are validated with the import schemas in schemas.py.
+Rows that would break a unique or foreign key constraint (an existing
+email or id, an unknown customer, agent or ticket) are rejected and
+counted in the report; the rest of the batch is still imported.
+
+Usage:
+    python importer.py export.jsonl [--batch-size 5000] [--workers 4]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+from passlib.context import CryptContext
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import sla
+import ticket_summary
+from database import SessionLocal, init_db
+from models import Message, Ticket, User, UserRole
+from schemas import MessageImport, TicketImport, UserImport
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+DEFAULT_BATCH_SIZE = 5000
+# Errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Record type -> (validation schema, model); flushed in this order so
+# foreign keys always point at rows that are already inserted
+RECORD_TYPES = {
+    "user": (UserImport, User),
+    "ticket": (TicketImport, Ticket),
+    "message": (MessageImport, Message),
+}
+
+
+def _hash_password(password: str) -> str:
+    # bcrypt releases the GIL, so threads hash in parallel without forking
+    # the server process and its background threads
+    return pwd_context.hash(password)
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+class ImportStats:
+    def __init__(self):
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+        self.rejected = 0
+        self.errors: List[str] = []
+        self.started = time.perf_counter()
+
+    def reject(self, line_no: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_no}: {message}")
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def report(self) -> Dict:
+        return {
+            "users": self.counts["user"],
+            "tickets": self.counts["ticket"],
+            "messages": self.counts["message"],
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+class BulkImporter:
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: Optional[int] = None,
+        verbose: bool = False,
+    ):
+        """
+        Args:
+            batch_size: Rows per executemany/transaction
+            workers: Threads used for password hashing (default: CPU count)
+            verbose: Print progress after every batch
+        """
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.verbose = verbose
+        self.stats = ImportStats()
+        # record type -> buffered (line number, row) pairs
+        self.buffers: Dict[str, List[Tuple[int, Dict]]] = {record_type: [] for record_type in RECORD_TYPES}
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    def run(self, lines: Iterable) -> Dict:
+        """Import every record from an iterable of JSONL lines (str or bytes)."""
+        init_db()
+        db = SessionLocal()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for line_no, line in enumerate(lines, start=1):
+                if isinstance(line, bytes):
+                    line = line.decode("utf-8")
+                if not line.strip():
+                    continue
+                self._add(db, line_no, line)
+            self._flush_all(db)
+            self._finish(db)
+        finally:
+            self.pool.shutdown()
+            db.close()
+        return self.stats.report()
+
+    def _add(self, db, line_no: int, line: str) -> None:
+        try:
+            record = json.loads(line)
+            record_type = record.pop("type")
+            schema = RECORD_TYPES[record_type][0]
+            row = schema(**record).dict(exclude_none=True)
+            if record_type == "user":
+                # /api/login looks addresses up lowercased
+                row["email"] = row["email"].lower().strip()
+        except (ValueError, KeyError, TypeError, ValidationError) as e:
+            # json.JSONDecodeError and ValidationError are ValueErrors in
+            # some pydantic versions; report both the same way
+            self.stats.reject(line_no, str(e).splitlines()[0] if str(e) else repr(e))
+            return
+
+        self.buffers[record_type].append((line_no, row))
+        if len(self.buffers[record_type]) >= self.batch_size:
+            self._flush_all(db, up_to=record_type)
+
+    def _flush_all(self, db, up_to: Optional[str] = None) -> None:
+        for record_type in RECORD_TYPES:
+            self._flush(db, record_type)
+            if record_type == up_to:
+                break
+
+    def _flush(self, db, record_type: str) -> None:
+        buffered = self.buffers[record_type]
+        if not buffered:
+            return
+        self.buffers[record_type] = []
+
+        valid = self._valid(db, record_type, buffered)
+        rows = [row for _, row in valid]
+        if not rows:
+            return
+        if record_type == "user":
+            self._hash_passwords(rows)
+        elif record_type == "ticket":
+            now = datetime.utcnow()
+            for row in rows:
+                row["status"] = getattr(row["status"], "value", row["status"])
+                row["priority"] = getattr(row["priority"], "value", row["priority"])
+                # Historical priorities were set by people, so they are training labels
+                row.setdefault("requested_priority", row["priority"])
+                # The current status was entered at the last update at the latest
+                started = _naive_utc(row.get("updated_at") or row.get("created_at")) or now
+                row["sla_due_at"] = sla.due_at(row["status"], row["priority"], started)
+                if row["status"] not in ("resolved", "closed"):
+                    row["resolved_at"] = None
+                elif row.get("resolved_at") is None:
+                    row["resolved_at"] = started
+
+        model = RECORD_TYPES[record_type][1]
+        try:
+            db.bulk_insert_mappings(model, rows)
+            db.commit()
+        except IntegrityError as e:
+            # Rows written concurrently since the checks in _valid
+            db.rollback()
+            for line_no, _ in valid:
+                self.stats.reject(line_no, f"batch rejected: {str(e.orig).splitlines()[0]}")
+            return
+        self.stats.counts[record_type] += len(rows)
+
+        if self.verbose:
+            print(
+                f"[*] {self.stats.total} rows imported "
+                f"({self.stats.rows_per_second:,.0f} rows/sec)"
+            )
+
+    def _valid(self, db, record_type: str, buffered: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+        """Reject rows that would violate a unique or foreign key constraint.
+
+        One query per checked column and batch, so a bad row is reported
+        instead of failing the whole batch.
+        """
+        model = RECORD_TYPES[record_type][1]
+        ids = {row["id"] for _, row in buffered if "id" in row}
+        taken_ids = {row.id for row in db.query(model.id).filter(model.id.in_(ids))} if ids else set()
+
+        if record_type == "user":
+            emails = {row["email"] for _, row in buffered}
+            taken_emails = {row.email for row in db.query(User.email).filter(User.email.in_(emails))}
+        elif record_type == "ticket":
+            user_ids = {row["customer_id"] for _, row in buffered}
+            user_ids |= {row["assigned_agent_id"] for _, row in buffered if "assigned_agent_id" in row}
+            roles = dict(db.query(User.id, User.role).filter(User.id.in_(user_ids)))
+        else:
+            ticket_ids = {row["ticket_id"] for _, row in buffered}
+            known_tickets = {row.id for row in db.query(Ticket.id).filter(Ticket.id.in_(ticket_ids))}
+            user_ids = {row["user_id"] for _, row in buffered}
+            known_users = {row.id for row in db.query(User.id).filter(User.id.in_(user_ids))}
+
+        valid = []
+        for line_no, row in buffered:
+            if "id" in row and row["id"] in taken_ids:
+                error = f"{record_type} id {row['id']} already exists"
+            elif record_type == "user":
+                error = f"email {row['email']} already exists" if row["email"] in taken_emails else None
+                taken_emails.add(row["email"])
+            elif record_type == "ticket":
+                if roles.get(row["customer_id"]) != UserRole.CUSTOMER:
+                    error = f"user {row['customer_id']} is not a customer"
+                elif "assigned_agent_id" in row and roles.get(row["assigned_agent_id"]) not in (UserRole.AGENT, UserRole.ADMIN):
+                    error = f"user {row['assigned_agent_id']} is not an agent"
+                else:
+                    error = None
+            elif row["ticket_id"] not in known_tickets:
+                error = f"ticket {row['ticket_id']} does not exist"
+            elif row["user_id"] not in known_users:
+                error = f"user {row['user_id']} does not exist"
+            else:
+                error = None
+
+            if error:
+                self.stats.reject(line_no, error)
+            else:
+                valid.append((line_no, row))
+                if "id" in row:
+                    taken_ids.add(row["id"])
+        return valid
+
+    def _hash_passwords(self, rows: List[Dict]) -> None:
+        """Hash plain-text passwords of a user batch in the thread pool."""
+        pending = [row for row in rows if "hashed_password" not in row]
+        passwords = [row.pop("password") for row in pending]
+        chunksize = max(1, len(passwords) // (4 * self.workers))
+        hashes = self.pool.map(_hash_password, passwords, chunksize=chunksize)
+        for row, hashed in zip(pending, hashes):
+            row["hashed_password"] = hashed
+        for row in rows:
+            row.pop("password", None)
+            row["role"] = getattr(row["role"], "value", row["role"])
+
+    def _finish(self, db) -> None:
+        # Explicit ids bypass PostgreSQL sequences; move them past the data
+        if db.get_bind().dialect.name == "postgresql":
+            for table in ("users", "tickets", "messages"):
+                db.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                ))
+            db.commit()
+        if self.stats.counts["ticket"]:
+            ticket_summary.rebuild(db)
+
+
+def import_jsonl(
+    stream: IO,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None,
+    verbose: bool = False,
+) -> Dict:
+    """Import a JSONL stream and return the import report."""
+    return BulkImporter(batch_size=batch_size, workers=workers, verbose=verbose).run(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users, tickets and messages from JSONL")
+    parser.add_argument("path", help="JSONL file to import")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing threads")
+    args = parser.parse_args()
+
+    print(f"--- IMPORTING {args.path} ---")
+    with open(args.path, "r", encoding="utf-8") as f:
+        report = import_jsonl(f, batch_size=args.batch_size, workers=args.workers, verbose=True)
+
+    print(
+        f"[SUCCESS] {report['users']} users, {report['tickets']} tickets, "
+        f"{report['messages']} messages in {report['seconds']}s "
+        f"({report['rows_per_second']:,.0f} rows/sec)"
+    )
+    if report["rejected"]:
+        print(f"[WARNING] {report['rejected']} rows rejected")
+        for error in report["errors"]:
+            print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+
+# Single source of FAQ content for prompts and retrieval
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_FAQ_PATH = os.path.join(DATA_DIR, "faqs.json")
+
+# The default tenant uses DEFAULT_FAQ_PATH; others use data/tenants/<tenant>/faqs.json
+DEFAULT_TENANT = "default"
+TENANTS_DIR = os.path.join(DATA_DIR, "tenants")
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+class UnknownTenant(Exception):
+    """Raised for a tenant name that is invalid or has no knowledge base."""
+
+
+class FAQ:
+    """One knowledge-base entry."""
+
+    __slots__ = ("id", "topic", "category", "question", "answer")
+
+    def __init__(self, id: str, topic: str, category: str, question: str, answer: str):
+        self.id = id
+        self.topic = topic
+        self.category = category
+        self.question = question
+        self.answer = answer
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "category": self.category,
+            "question": self.question,
+            "answer": self.answer,
+        }
+
+
+class KnowledgeBase:
+    """Immutable, pre-parsed snapshot of the FAQ corpus.
+
+    `version` is a hash of the content, so anything derived from a snapshot
+    (prompt prefixes, vector indexes) can be cached until the version changes.
+    """
+
+    def __init__(self, faqs: List[FAQ]):
+        self.faqs: Tuple[FAQ, ...] = tuple(faqs)
+        self.by_id: Dict[str, FAQ] = {faq.id: faq for faq in self.faqs}
+        # topic / category -> positions in self.faqs
+        self.topic_index: Dict[str, Tuple[int, ...]] = self._index("topic")
+        self.category_index: Dict[str, Tuple[int, ...]] = self._index("category")
+        self.version = self._content_hash()
+        self._prompt_text: Optional[str] = None
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "KnowledgeBase":
+        return cls([
+            FAQ(
+                id=str(record.get("id") or f"faq_{position + 1}"),
+                topic=record.get("topic", ""),
+                category=record.get("category", ""),
+                question=record["question"],
+                answer=record["answer"],
+            )
+            for position, record in enumerate(records)
+        ])
+
+    def _index(self, field: str) -> Dict[str, Tuple[int, ...]]:
+        index: Dict[str, List[int]] = {}
+        for position, faq in enumerate(self.faqs):
+            index.setdefault(getattr(faq, field), []).append(position)
+        return {key: tuple(positions) for key, positions in index.items()}
+
+    def _content_hash(self) -> str:
+        digest = hashlib.sha256()
+        for faq in self.faqs:
+            for value in (faq.id, faq.topic, faq.category, faq.question, faq.answer):
+                digest.update(value.encode("utf-8"))
+                digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.faqs)
+
+    def __iter__(self) -> Iterator[FAQ]:
+        return iter(self.faqs)
+
+    @property
+    def topics(self) -> List[str]:
+        return list(self.topic_index)
+
+    def by_topic(self, topic: str) -> List[FAQ]:
+        return [self.faqs[position] for position in self.topic_index.get(topic, ())]
+
+    @property
+    def prompt_text(self) -> str:
+        """The corpus rendered once for LLM prompts, grouped by topic.
+
+        Plain Q/A lines use noticeably fewer tokens than the raw JSON.
+        """
+        if self._prompt_text is None:
+            sections = []
+            for topic, positions in self.topic_index.items():
+                lines = [f"## {topic}" if topic else "## General"]
+                for position in positions:
+                    faq = self.faqs[position]
+                    lines.append(f"Q: {faq.question}\nA: {faq.answer}")
+                sections.append("\n".join(lines))
+            self._prompt_text = "\n\n".join(sections)
+        return self._prompt_text
+
+
+def load_knowledge_base(path: str = DEFAULT_FAQ_PATH) -> KnowledgeBase:
+    """Parse an FAQ JSON file (a list of {id, topic, category, question, answer})."""
+    with open(path, "r", encoding="utf-8") as f:
+        return KnowledgeBase.from_records(json.load(f))
+
+
+def tenant_faq_path(tenant: str) -> str:
+    if tenant == DEFAULT_TENANT:
+        return DEFAULT_FAQ_PATH
+    if not TENANT_NAME.match(tenant):
+        raise UnknownTenant(tenant)
+    return os.path.join(TENANTS_DIR, tenant, "faqs.json")
+
+
+def tenant_exists(tenant: str) -> bool:
+    try:
+        return os.path.isfile(tenant_faq_path(tenant))
+    except UnknownTenant:
+        return False
+
+
+# tenant -> current snapshot; FAQ text is small, so every loaded tenant stays here
+# (the large per-tenant vector indexes are managed by tenant_indexes)
+_snapshots: Dict[str, KnowledgeBase] = {}
+# tenant -> mtime of the file its snapshot was read from, and when it was last checked
+_mtimes: Dict[str, float] = {}
+_checked_at: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _read(tenant: str) -> Tuple[float, KnowledgeBase]:
+    path = tenant_faq_path(tenant)
+    # Stat before reading, so a write that lands mid-read is picked up next check
+    mtime = os.path.getmtime(path)
+    return mtime, load_knowledge_base(path)
+
+
+def get_knowledge_base(tenant: str = DEFAULT_TENANT) -> KnowledgeBase:
+    """The process-wide knowledge base of `tenant`, loaded on first use.
+
+    Every KB_RELOAD_CHECK_SECONDS the FAQ file's mtime is compared with the
+    snapshot's, so edits reach every worker process without a restart.
+    """
+    snapshot = _snapshots.get(tenant)
+    if snapshot is None:
+        if not tenant_exists(tenant):
+            raise UnknownTenant(tenant)
+        with _lock:
+            snapshot = _snapshots.get(tenant)
+            if snapshot is None:
+                _mtimes[tenant], snapshot = _read(tenant)
+                _checked_at[tenant] = time.monotonic()
+                _snapshots[tenant] = snapshot
+    elif _file_changed(tenant):
+        try:
+            snapshot = reload_knowledge_base(tenant)
+        except Exception as e:
+            # A half-written or removed file keeps the last good snapshot
+            print(f"[-] Knowledge base reload failed for {tenant}: {e}")
+    return snapshot
+
+
+def _file_changed(tenant: str) -> bool:
+    interval = settings.KB_RELOAD_CHECK_SECONDS
+    now = time.monotonic()
+    if interval <= 0 or now - _checked_at.get(tenant, 0.0) < interval:
+        return False
+    _checked_at[tenant] = now
+    try:
+        return os.path.getmtime(tenant_faq_path(tenant)) != _mtimes.get(tenant)
+    except OSError:
+        return False
+
+
+def reload_knowledge_base(tenant: str = DEFAULT_TENANT) -> KnowledgeBase:
+    """Re-read the tenant's FAQ file; the snapshot is only replaced if its content changed."""
+    if not tenant_exists(tenant):
+        raise UnknownTenant(tenant)
+    mtime, fresh = _read(tenant)
+    with _lock:
+        _mtimes[tenant] = mtime
+        _checked_at[tenant] = time.monotonic()
+        current = _snapshots.get(tenant)
+        if current is None or current.version != fresh.version:
+            _snapshots[tenant] = fresh
+            print(f"[+] Knowledge base {tenant} loaded (version {fresh.version}, {len(fresh)} FAQs)")
+        return _snapshots[tenant]
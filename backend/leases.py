@@ -0,0 +1,50 @@
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import WorkerLease
+
+
+def holder_id() -> str:
+    """Identity of this process as a lease holder."""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+
+def acquire(db: Session, name: str, holder: str, ttl_seconds: float) -> bool:
+    """Take or renew the lease; True if `holder` owns it for the next `ttl_seconds`.
+
+    A single conditional UPDATE (or the first INSERT) decides ownership, so
+    competing processes cannot both win. A holder that stops renewing loses
+    the lease once it expires.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    try:
+        updated = db.query(WorkerLease).filter(
+            WorkerLease.name == name,
+            or_(WorkerLease.holder == holder, WorkerLease.expires_at < now)
+        ).update({"holder": holder, "expires_at": expires_at}, synchronize_session=False)
+        if not updated:
+            if db.query(WorkerLease.name).filter(WorkerLease.name == name).first():
+                db.rollback()
+                return False
+            db.add(WorkerLease(name=name, holder=holder, expires_at=expires_at))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another process inserted the lease first
+        db.rollback()
+        return False
+
+
+def release(db: Session, name: str, holder: str) -> None:
+    db.query(WorkerLease).filter(
+        WorkerLease.name == name,
+        WorkerLease.holder == holder
+    ).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,402 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from llm_providers import LLMError, LLMProvider, LLMResponse, estimate_tokens, prefix_key
+from metrics import (
+    LLM_CIRCUIT_STATE,
+    LLM_CIRCUIT_TRANSITIONS,
+    LLM_RATE_LIMIT_RATE,
+    LLM_RATE_LIMIT_WAITS,
+    LLM_RETRIES,
+    record_cache,
+    record_llm,
+    record_prefix_cache,
+)
+
+
+class RateLimitedError(LLMError):
+    """The client-side token bucket had no capacity within the allowed wait."""
+
+    def __init__(self, message: str = "LLM rate limit reached"):
+        super().__init__(message, retryable=False, rate_limited=True)
+
+
+class CircuitOpenError(LLMError):
+    """The circuit breaker is open, so the provider is not being called."""
+
+    def __init__(self, message: str = "LLM circuit breaker is open"):
+        super().__init__(message, retryable=False)
+
+
+def coalescing_key(prompt: str, prefix: Optional[str] = None) -> str:
+    """Key identical prompts regardless of case and whitespace differences."""
+    normalized = " ".join(prompt.split()).lower()
+    if prefix:
+        normalized = prefix_key(prefix) + normalized
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """Async token bucket with AIMD rate adaptation.
+
+    The refill rate is halved whenever the provider reports a quota error
+    and creeps back towards the configured rate on every success, so the
+    client backs off before the upstream starts rejecting everything.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.1, recovery: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min(min_rate, rate)
+        self.recovery = recovery
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take one token, waiting up to `max_wait` seconds; False if none came."""
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            delay = (1.0 - self.tokens) / self.rate
+            if waited + delay > max_wait:
+                return False
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def on_rate_limited(self) -> None:
+        self.rate = max(self.min_rate, self.rate / 2.0)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures; half-open trial after a cool-down."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        LLM_CIRCUIT_STATE.labels(name).set(0)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        LLM_CIRCUIT_STATE.labels(self.name).set(self.STATE_VALUES[state])
+        LLM_CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+        print(f"[*] LLM circuit breaker for '{self.name}' is now {state}")
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            # Let exactly one trial request through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """Give back a half-open trial slot without recording an outcome."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+
+class SingleFlight:
+    """Share one in-flight coroutine among concurrent callers with the same key.
+
+    The call runs as its own task, so a caller that disconnects does not
+    cancel the result for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        joined = task is not None
+        record_cache("llm_singleflight", joined)
+        if not joined:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class _SharedStream:
+    """Fan one upstream chunk stream out to any number of subscribers.
+
+    Subscribers that join late first replay the chunks already received.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.chunks) > position or self.done)
+                new_chunks = self.chunks[position:]
+                finished = self.done
+            position += len(new_chunks)
+            for chunk in new_chunks:
+                yield chunk
+            if finished and position == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class LLMGateway:
+    """Front door for LLM calls made by request handlers.
+
+    Concurrent identical prompts are coalesced into a single upstream call
+    (or a single upstream stream), cutting duplicate calls and quota use
+    when a question trends. Each upstream call passes a per-API-key token
+    bucket and a circuit breaker, and retryable errors are retried with
+    jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        coalesce: bool = True,
+        rate_limit_key: Optional[str] = None,
+        rate_per_second: float = 5.0,
+        burst: float = 10.0,
+        max_wait_seconds: float = 2.0,
+        max_retries: int = 2,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 4.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            provider: The LLM backend
+            coalesce: Share in-flight calls among identical prompts
+            rate_limit_key: Key the token bucket is shared under (the API key)
+            rate_per_second: Sustained upstream requests per second
+            burst: Token bucket capacity
+            max_wait_seconds: Longest a request waits for a token
+            max_retries: Retries after a retryable error
+            retry_base_delay: First backoff ceiling in seconds
+            retry_max_delay: Largest backoff ceiling in seconds
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Time the circuit stays open before a trial call
+        """
+        self.provider = provider
+        self.coalesce = coalesce
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.bucket = _bucket_for(rate_limit_key or provider.name, rate_per_second, burst)
+        self.breaker = CircuitBreaker(provider.name, failure_threshold, reset_seconds)
+        self._calls = SingleFlight()
+        self._streams: Dict[str, _SharedStream] = {}
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state == CircuitBreaker.CLOSED
+
+    async def _admit(self) -> bool:
+        """Pass the circuit breaker and take a rate-limit token, or raise.
+
+        Returns whether the call holds the half-open trial slot, which the
+        caller must give back when the call ends, however it ends.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError()
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            admitted = await self.bucket.acquire(self.max_wait_seconds)
+        except BaseException:
+            if trial:
+                self.breaker.release()
+            raise
+        if not admitted:
+            LLM_RATE_LIMIT_WAITS.labels(self.provider.name, "rejected").inc()
+            # Not an upstream failure, so the breaker records no outcome
+            if trial:
+                self.breaker.release()
+            raise RateLimitedError()
+        LLM_RATE_LIMIT_WAITS.labels(self.provider.name, "admitted").inc()
+        return trial
+
+    def _on_success(self) -> None:
+        self.breaker.record_success()
+        self.bucket.on_success()
+        LLM_RATE_LIMIT_RATE.labels(self.provider.name).set(self.bucket.rate)
+
+    def _on_failure(self, error: LLMError) -> None:
+        self.breaker.record_failure()
+        if error.rate_limited:
+            self.bucket.on_rate_limited()
+            LLM_RATE_LIMIT_RATE.labels(self.provider.name).set(self.bucket.rate)
+
+    async def _backoff(self, attempt: int) -> None:
+        LLM_RETRIES.labels(self.provider.name).inc()
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        ceiling = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+        await asyncio.sleep(random.uniform(0, ceiling))
+
+    async def _call(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        attempt = 0
+        while True:
+            trial = await self._admit()
+            try:
+                response = await self.provider.agenerate(prompt, prefix)
+            except LLMError as e:
+                self._on_failure(e)
+                record_llm(self.provider.name, outcome="error")
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt)
+                attempt += 1
+                continue
+            except Exception as e:
+                # Timeouts and unexpected provider errors count as failures, and
+                # surface as LLMError so callers fall back instead of failing
+                self.breaker.record_failure()
+                record_llm(self.provider.name, outcome="error")
+                raise LLMError(f"{self.provider.name} provider error: {e}") from e
+            finally:
+                # Cancellation records no outcome but must not strand the trial slot
+                if trial:
+                    self.breaker.release()
+            self._on_success()
+            record_llm(self.provider.name, response)
+            if prefix:
+                record_cache("llm_prefix", response.cached_input_tokens > 0)
+            return response
+
+    async def _guarded_stream(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream with the same admission and retry rules; no retry after the first chunk."""
+        attempt = 0
+        while True:
+            trial = await self._admit()
+            started = False
+            # Streams carry no usage data, so estimate the cached prefix size
+            if prefix:
+                cached = self.provider.prefix_cached(prefix)
+                record_prefix_cache(self.provider.name, estimate_tokens(prefix) if cached else 0)
+            try:
+                async for chunk in self.provider.astream(prompt, prefix):
+                    started = True
+                    yield chunk
+            except LLMError as e:
+                self._on_failure(e)
+                if started or not e.retryable or attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt)
+                attempt += 1
+                continue
+            except Exception as e:
+                self.breaker.record_failure()
+                raise LLMError(f"{self.provider.name} provider error: {e}") from e
+            finally:
+                if trial:
+                    self.breaker.release()
+            self._on_success()
+            return
+
+    async def agenerate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        """Generate a response; `prefix` is the static part of the prompt the provider may cache."""
+        if not self.coalesce:
+            return await self._call(prompt, prefix)
+        return await self._calls.do(coalescing_key(prompt, prefix), lambda: self._call(prompt, prefix))
+
+    async def _pump(self, key: str, shared: _SharedStream, prompt: str, prefix: Optional[str]) -> None:
+        try:
+            await shared.pump(self._guarded_stream(prompt, prefix))
+            record_llm(self.provider.name, outcome="error" if shared.error else "success")
+        finally:
+            self._streams.pop(key, None)
+
+    async def astream(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        if not self.coalesce:
+            async for chunk in self._guarded_stream(prompt, prefix):
+                yield chunk
+            return
+
+        key = coalescing_key(prompt, prefix)
+        shared = self._streams.get(key)
+        record_cache("llm_singleflight_stream", shared is not None)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            # The pump task outlives any single subscriber
+            asyncio.ensure_future(self._pump(key, shared, prompt, prefix))
+        async for chunk in shared.subscribe():
+            yield chunk
+
+
+# Token buckets are shared by every gateway using the same API key
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def _bucket_for(key: str, rate: float, burst: float) -> TokenBucket:
+    if key not in _buckets:
+        _buckets[key] = TokenBucket(rate, burst)
+    return _buckets[key]
@@ -0,0 +1,443 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Set
+
+from config import settings
+
+
+class LLMError(Exception):
+    """Raised by providers when a generation request fails.
+
+    `retryable` marks transient failures (quota, timeouts, 5xx) that may
+    succeed if sent again; `rate_limited` marks quota/429 responses.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, rate_limited: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.rate_limited = rate_limited
+
+
+class LLMResponse:
+    def __init__(self, text: str, input_tokens: int = 0, output_tokens: int = 0, model: str = "",
+                 cached_input_tokens: int = 0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.model = model
+        # Input tokens served from a prefix cache rather than reprocessed
+        self.cached_input_tokens = cached_input_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for providers without usage data."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def prefix_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+def join_prefix(prefix: Optional[str], prompt: str) -> str:
+    return f"{prefix}\n{prompt}" if prefix else prompt
+
+
+class PrefixCache:
+    """Bounded LRU of per-prefix cache entries that expire after a TTL.
+
+    Entries are keyed by prefix hash, so each tenant's prefix stays cached
+    alongside the others. Entries pinned by an in-flight request are never
+    evicted; `on_evict` releases the provider-side resource of an entry
+    pushed out by newer ones. Expired entries are just forgotten, since the
+    provider expires them on its side.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, on_evict: Optional[Callable] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        # prefix hash -> (value, expiry)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # prefix hash -> requests currently using its entry
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            for old_key in list(self._entries):
+                if len(self._entries) <= self.max_entries:
+                    break
+                if old_key != key and not self._pins.get(old_key):
+                    evicted.append(self._entries.pop(old_key)[0])
+        if self.on_evict is not None:
+            for value in evicted:
+                try:
+                    self.on_evict(value)
+                except Exception:
+                    pass
+
+    @contextmanager
+    def pinned(self, prefix: Optional[str]):
+        """Keep `prefix`'s entry from being evicted while the block runs."""
+        if not prefix:
+            yield
+            return
+        key = prefix_key(prefix)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._pins.pop(key) - 1
+                if remaining:
+                    self._pins[key] = remaining
+
+
+class LLMProvider:
+    """Interface every LLM backend implements.
+
+    Sync methods serve scripts; the async methods are used by request
+    handlers so slow generations do not block the event loop. `prefix` is
+    a static leading part of the prompt (system instruction, knowledge
+    base) that providers with context caching process once and reuse.
+    """
+
+    name = "base"
+
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        yield self.generate(prompt, prefix).text
+
+    async def agenerate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        return await asyncio.get_running_loop().run_in_executor(None, partial(self.generate, prompt, prefix))
+
+    async def astream(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        response = await self.agenerate(prompt, prefix)
+        yield response.text
+
+    def prefix_cached(self, prefix: str) -> bool:
+        """Whether `prefix` is currently served from the provider's cache."""
+        return False
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the google-generativeai SDK."""
+
+    name = "gemini"
+
+    # Substrings of SDK error names that indicate a transient failure
+    RETRYABLE_ERRORS = ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests")
+    RATE_LIMIT_ERRORS = ("ResourceExhausted", "TooManyRequests")
+
+    def __init__(self, api_key: str, model_name: str, cache_prefixes: bool = True, cache_ttl_seconds: int = 3600,
+                 max_cached_prefixes: int = 64):
+        """
+        Args:
+            api_key: Gemini API key
+            model_name: Model to generate with
+            cache_prefixes: Store prompt prefixes as Gemini cached content
+            cache_ttl_seconds: Lifetime of each cached-content entry
+            max_cached_prefixes: Cached-content entries kept at once (one per tenant prefix)
+        """
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.cache_prefixes = cache_prefixes
+        self.cache_ttl_seconds = cache_ttl_seconds
+        # Serializes cached-content creation so a prefix is only created once
+        self._cache_lock = threading.Lock()
+        # prefix hash -> (cached content, model bound to it); refreshed a
+        # minute before the server-side expiry
+        self._cached = PrefixCache(
+            max_cached_prefixes,
+            max(1, cache_ttl_seconds - 60),
+            on_evict=self._delete_cached,
+        )
+        # Prefixes the API refused to cache (e.g. below the minimum size)
+        self._uncacheable: Set[str] = set()
+
+    @staticmethod
+    def _delete_cached(entry) -> None:
+        # Evicted entries are not in use; stop paying storage for them
+        entry[0].delete()
+
+    def _lookup_cached_model(self, key: str):
+        entry = self._cached.get(key)
+        return entry[1] if entry else None
+
+    def _create_cached_model(self, prefix: str, key: str):
+        """Create cached content for `prefix` (blocking)."""
+        import datetime
+
+        from google.generativeai import caching
+        import google.generativeai as genai
+
+        with self._cache_lock:
+            model = self._lookup_cached_model(key)
+            if model is not None or key in self._uncacheable:
+                return model
+            try:
+                cached = caching.CachedContent.create(
+                    model=self.model_name,
+                    system_instruction=prefix,
+                    ttl=datetime.timedelta(seconds=self.cache_ttl_seconds),
+                )
+            except Exception as e:
+                print(f"[-] Gemini context cache unavailable, sending the prefix inline: {e}")
+                self._uncacheable.add(key)
+                return None
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            self._cached.put(key, (cached, model))
+            return model
+
+    def _resolve(self, prompt: str, prefix: Optional[str]):
+        """(model, contents) for a request, using cached content for the prefix when possible."""
+        if not prefix:
+            return self.model, prompt
+        if self.cache_prefixes:
+            key = prefix_key(prefix)
+            model = self._lookup_cached_model(key)
+            if model is None and key not in self._uncacheable:
+                model = self._create_cached_model(prefix, key)
+            if model is not None:
+                return model, prompt
+        return self.model, join_prefix(prefix, prompt)
+
+    async def _aresolve(self, prompt: str, prefix: Optional[str]):
+        if prefix and self.cache_prefixes and self._lookup_cached_model(prefix_key(prefix)) is None:
+            # Cache creation is a blocking network call
+            return await asyncio.get_running_loop().run_in_executor(None, self._resolve, prompt, prefix)
+        return self._resolve(prompt, prefix)
+
+    def prefix_cached(self, prefix: str) -> bool:
+        return self._lookup_cached_model(prefix_key(prefix)) is not None
+
+    def _wrap_error(self, error: Exception) -> LLMError:
+        error_name = type(error).__name__
+        return LLMError(
+            f"{error_name}: {error}",
+            retryable=any(name in error_name for name in self.RETRYABLE_ERRORS),
+            rate_limited=any(name in error_name for name in self.RATE_LIMIT_ERRORS),
+        )
+
+    def _to_response(self, response) -> LLMResponse:
+        usage = getattr(response, "usage_metadata", None)
+        text = response.text
+        return LLMResponse(
+            text=text,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or estimate_tokens(text),
+            model=self.model_name,
+            cached_input_tokens=getattr(usage, "cached_content_token_count", 0) or 0,
+        )
+
+    # Each call pins its prefix's cached content so eviction never deletes
+    # it out from under the request
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        with self._cached.pinned(prefix):
+            model, contents = self._resolve(prompt, prefix)
+            try:
+                return self._to_response(model.generate_content(contents))
+            except Exception as e:
+                raise self._wrap_error(e) from e
+
+    def stream(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._cached.pinned(prefix):
+            model, contents = self._resolve(prompt, prefix)
+            try:
+                for chunk in model.generate_content(contents, stream=True):
+                    if chunk.text:
+                        yield chunk.text
+            except Exception as e:
+                raise self._wrap_error(e) from e
+
+    async def agenerate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        with self._cached.pinned(prefix):
+            model, contents = await self._aresolve(prompt, prefix)
+            try:
+                return self._to_response(await model.generate_content_async(contents))
+            except Exception as e:
+                raise self._wrap_error(e) from e
+
+    async def astream(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        with self._cached.pinned(prefix):
+            model, contents = await self._aresolve(prompt, prefix)
+            try:
+                async for chunk in await model.generate_content_async(contents, stream=True):
+                    if chunk.text:
+                        yield chunk.text
+            except Exception as e:
+                raise self._wrap_error(e) from e
+
+
+class StubProvider(LLMProvider):
+    """Local stand-in that simulates latency, streaming, token counts and failures.
+
+    Lets the chat path be load-tested and exercised offline without
+    network access or API quota.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 50.0,
+        chunks_per_second: float = 20.0,
+        output_tokens: int = 120,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        cache_prefixes: bool = True,
+        cache_ttl_seconds: float = 3600.0,
+        max_cached_prefixes: int = 64,
+    ):
+        """
+        Args:
+            latency_ms: Mean time to the first token
+            jitter_ms: Uniform +/- jitter added to latency_ms
+            chunks_per_second: Streaming rate after the first token
+            output_tokens: Tokens in each generated answer
+            error_rate: Probability (0-1) that a request fails with a retryable error
+            seed: Seed for reproducible latency and error sampling
+            cache_prefixes: Emulate context caching: a prefix seen before is
+                reported as cached input tokens until its TTL expires
+            cache_ttl_seconds: Lifetime of an emulated cache entry
+            max_cached_prefixes: Emulated entries kept at once, like GeminiProvider
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunks_per_second = chunks_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.cache_prefixes = cache_prefixes
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cached = PrefixCache(max_cached_prefixes, cache_ttl_seconds)
+
+    def _first_token_delay(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise LLMError("Stub provider simulated failure", retryable=True)
+
+    def _chunks(self, prompt: str):
+        words = ["stub"] * self.output_tokens
+        # Roughly 4 tokens per chunk, like real streaming APIs
+        for start in range(0, len(words), 4):
+            yield " ".join(words[start:start + 4]) + " "
+
+    def prefix_cached(self, prefix: str) -> bool:
+        return self._cached.get(prefix_key(prefix)) is not None
+
+    def _use_prefix(self, prefix: Optional[str]) -> int:
+        """Cached input tokens for this request; caches the prefix for later ones."""
+        if not prefix or not self.cache_prefixes:
+            return 0
+        hit = self.prefix_cached(prefix)
+        if not hit:
+            self._cached.put(prefix_key(prefix), True)
+        return estimate_tokens(prefix) if hit else 0
+
+    def _response(self, prompt: str, prefix: Optional[str]) -> LLMResponse:
+        text = "".join(self._chunks(prompt)).strip()
+        return LLMResponse(
+            text=text,
+            input_tokens=estimate_tokens(join_prefix(prefix, prompt)),
+            output_tokens=self.output_tokens,
+            model="stub",
+            cached_input_tokens=self._use_prefix(prefix),
+        )
+
+    def _stream_seconds(self) -> float:
+        chunks = (self.output_tokens + 3) // 4
+        return chunks / self.chunks_per_second if self.chunks_per_second else 0.0
+
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        time.sleep(self._first_token_delay() + self._stream_seconds())
+        self._maybe_fail()
+        return self._response(prompt, prefix)
+
+    def stream(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        time.sleep(self._first_token_delay())
+        self._maybe_fail()
+        self._use_prefix(prefix)
+        interval = 1.0 / self.chunks_per_second if self.chunks_per_second else 0.0
+        for chunk in self._chunks(prompt):
+            yield chunk
+            if interval:
+                time.sleep(interval)
+
+    async def agenerate(self, prompt: str, prefix: Optional[str] = None) -> LLMResponse:
+        await asyncio.sleep(self._first_token_delay() + self._stream_seconds())
+        self._maybe_fail()
+        return self._response(prompt, prefix)
+
+    async def astream(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        await asyncio.sleep(self._first_token_delay())
+        self._maybe_fail()
+        self._use_prefix(prefix)
+        interval = 1.0 / self.chunks_per_second if self.chunks_per_second else 0.0
+        for chunk in self._chunks(prompt):
+            yield chunk
+            if interval:
+                await asyncio.sleep(interval)
+
+
+def create_provider(name: str) -> LLMProvider:
+    """Build the provider called `name` from settings."""
+    if name == "gemini":
+        return GeminiProvider(
+            settings.GEMINI_API_KEY,
+            settings.LLM_MODEL,
+            cache_prefixes=settings.LLM_PREFIX_CACHE_ENABLED,
+            cache_ttl_seconds=settings.LLM_PREFIX_CACHE_TTL_SECONDS,
+            max_cached_prefixes=settings.LLM_PREFIX_CACHE_MAX_ENTRIES,
+        )
+    if name == "stub":
+        return StubProvider(
+            latency_ms=settings.STUB_LLM_LATENCY_MS,
+            jitter_ms=settings.STUB_LLM_JITTER_MS,
+            chunks_per_second=settings.STUB_LLM_CHUNKS_PER_SECOND,
+            output_tokens=settings.STUB_LLM_OUTPUT_TOKENS,
+            error_rate=settings.STUB_LLM_ERROR_RATE,
+            cache_prefixes=settings.LLM_PREFIX_CACHE_ENABLED,
+            cache_ttl_seconds=settings.LLM_PREFIX_CACHE_TTL_SECONDS,
+            max_cached_prefixes=settings.LLM_PREFIX_CACHE_MAX_ENTRIES,
+        )
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+@lru_cache()
+def get_provider() -> LLMProvider:
+    """The provider selected by settings.LLM_PROVIDER (one instance per process)."""
+    return create_provider(settings.LLM_PROVIDER)
@@ -1,23 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
-import google.generativeai as genai
+import asyncio
 import os
 
 # --- IMPORT YOUR DATA ---
-from knowledge_base import FAQ_DATA 
+# Shared, pre-parsed FAQ store (data/faqs.json); also indexed by RAGEngine
+from kb_store import DEFAULT_TENANT, get_knowledge_base, tenant_exists
+
+from config import settings
 
 # --- DATABASE SETUP ---
-from database import Base, engine, SessionLocal
-from models import User, UserRole
+from database import engine, SessionLocal, init_db
+from models import ChatSession, User, UserRole
+import assignment
+import chat_memory
+import sla
+from metrics import CHAT_FALLBACKS, CHAT_TIER, PrometheusMiddleware, instrument_engine, metrics_response, time_stage
+import tracing
+from routers import admin, analytics, auth, dashboard, export, messages, search, tickets, users
 
-Base.metadata.create_all(bind=engine)
+instrument_engine(engine)
+tracing.instrument_engine(engine)
 
 def get_db():
     db = SessionLocal()
@@ -36,31 +50,69 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
 
 # --- SECURITY ---
-SECRET_KEY = "your-secret-key-here"
-ALGORITHM = "HS256"
+# Same key and claims as auth.py, so /api/login tokens also work on the routers
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
+# Chat works without logging in; a token only ties the chat session to the user
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login", auto_error=False)
 
 # --- AI CONFIGURATION ---
-# YOUR KEY
-GOOGLE_API_KEY = "YOUR_GOOGLE_API_KEY_HERE"
+# The backend (Gemini or the offline stub) is chosen by LLM_PROVIDER in config
+from llm_providers import LLMError, get_provider
+from llm_gateway import CircuitOpenError, LLMGateway, RateLimitedError
 
-model = None
+llm = None
 
 try:
-    print(f"[*] Connecting to AI with Key: {GOOGLE_API_KEY[:10]}...")
-    genai.configure(api_key=GOOGLE_API_KEY)
-    
-    # Using the Flash model for speed
-    model = genai.GenerativeModel('gemini-2.5-flash')
-
+    print(f"[*] Connecting to AI provider '{settings.LLM_PROVIDER}' ({settings.LLM_MODEL})...")
+    # Identical concurrent prompts share one upstream call through the gateway,
+    # which also rate limits per API key, retries and trips a circuit breaker
+    llm = LLMGateway(
+        get_provider(),
+        coalesce=settings.LLM_COALESCING_ENABLED,
+        rate_limit_key=settings.GEMINI_API_KEY or settings.LLM_PROVIDER,
+        rate_per_second=settings.LLM_RATE_LIMIT_PER_SECOND,
+        burst=settings.LLM_RATE_LIMIT_BURST,
+        max_wait_seconds=settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+        retry_max_delay=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+        failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=settings.LLM_CIRCUIT_RESET_SECONDS,
+    )
     print("[+] AI Model initialized successfully!")
 except Exception as e:
     print(f"[-] AI Connection Failed: {e}")
-    model = None
+    llm = None
+
+# FAQ retrieval answers confident matches directly and covers for the LLM
+# when it is unavailable. Each tenant (brand) has its own knowledge base and
+# index; only recently used tenants' indexes stay in memory.
+rag_indexes = None
+
+try:
+    from tenant_indexes import get_index_manager
+    rag_indexes = get_index_manager()
+    if rag_indexes.reranker is not None:
+        # Load the cross-encoder now rather than inside the first chat request
+        try:
+            rag_indexes.reranker.load()
+            print(f"[+] FAQ reranker loaded ({rag_indexes.reranker.model_name})")
+        except Exception as e:
+            print(f"[-] FAQ reranker unavailable: {e}")
+            rag_indexes.reranker = None
+    rag_indexes.get(DEFAULT_TENANT)
+    print("[+] FAQ fallback index loaded")
+except Exception as e:
+    print(f"[-] FAQ fallback unavailable: {e}")
+    rag_indexes = None
 
 # --- HELPERS ---
 def get_password_hash(password: str) -> str:
@@ -76,18 +128,23 @@ def create_access_token(data: dict, expires_delta: timedelta):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
+    with tracing.span("auth.lookup"):
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = int(payload.get("sub"))
+        except (JWTError, TypeError, ValueError):
             raise HTTPException(status_code=401, detail="Invalid credentials")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    user = db.query(User).filter(User.email == email).first()
+        user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):
+    """The logged-in user, or None without a token; an invalid token is still rejected."""
+    if token is None:
+        return None
+    return get_current_user(token, db)
+
 # --- SCHEMAS ---
 class UserCreate(BaseModel):
     email: str
@@ -101,28 +158,32 @@ class LoginRequest(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    # Omit to start a new conversation; the response returns the id to reuse
+    session_id: Optional[str] = None
+    # Brand whose knowledge base answers the question
+    tenant: str = DEFAULT_TENANT
 
-# --- ROUTES ---
+# =================================================================
+#  HYBRID INTELLIGENCE PROMPT
+# =================================================================
+# This tells the AI: "Be an expert on the Brewery data, 
+# BUT also be a general assistant for everything else."
+# The instruction and knowledge base form a static prefix that the provider
+# caches (Gemini cached content); only the question part changes per request.
+# It is rebuilt only when the tenant's knowledge base version changes.
+_chat_prefixes = {}
 
-@app.post("/api/chat")
-async def chat_with_ai(request: ChatRequest):
-    if not model:
-        return {"response": "System Error: AI is not configured."}
-    
-    try:
-        # =================================================================
-        #  HYBRID INTELLIGENCE PROMPT
-        # =================================================================
-        # This tells the AI: "Be an expert on the Brewery data, 
-        # BUT also be a general assistant for everything else."
-        
-        system_instruction = f"""
+def build_chat_prefix(tenant: str = DEFAULT_TENANT) -> str:
+    kb = get_knowledge_base(tenant)
+    cached = _chat_prefixes.get(tenant)
+    if cached is None or cached[0] != kb.version:
+        prefix = f"""
         You are 'Support AutoPilot', an intelligent AI assistant.
         
         You have access to a specific Knowledge Base for a company called 'Just Another Sample' Brewery.
         
         === KNOWLEDGE BASE (Specific Company Data) ===
-        {FAQ_DATA}
+        {kb.prompt_text}
         ==============================================
         
         YOUR INSTRUCTIONS:
@@ -130,16 +191,230 @@ async def chat_with_ai(request: ChatRequest):
         2. SECOND, if the user asks a GENERAL question (e.g., "What is 2+2?", "Write Python code", "Who is Albert Einstein?"), IGNORE the knowledge base and answer using your own general intelligence.
         3. Do not say "I don't know" if it is a general knowledge question. Answer it!
         4. Be helpful, friendly, and professional.
-        
-        User Question: {request.message}
+        5. Use the conversation so far (if any) to understand follow-up questions.
+        """
+        cached = _chat_prefixes[tenant] = (kb.version, prefix)
+    return cached[1]
+
+def build_chat_prompt(message: str, history: str = "") -> str:
+    conversation = f"""
+        === CONVERSATION SO FAR ===
+        {history}
+        ===========================
+        """ if history else ""
+    return f"""{conversation}
+        User Question: {message}
         """
+
+def build_summary_prompt(previous: str, transcript: str) -> str:
+    return f"""
+        Update the running summary of a customer support chat.
+        Keep names, order details, questions asked and answers given; drop pleasantries.
+        Reply with the updated summary only, in at most {settings.CHAT_SUMMARY_MAX_CHARS // 5} words.
+        
+        Current summary: {previous or "(none)"}
         
-        response = model.generate_content(system_instruction)
-        return {"response": response.text}
+        New turns:
+        {transcript}
+        """
+
+async def summarize_turns(previous: str, transcript: str) -> str:
+    """Rolling-summary update through the LLM; falls back to an extractive summary."""
+    if not llm or not llm.healthy:
+        return chat_memory.extractive_summary(previous, transcript)
+    with time_stage("chat", "summarize"):
+        response = await llm.agenerate(build_summary_prompt(previous, transcript))
+    return response.text
+
+def fallback_reason(error: LLMError) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, RateLimitedError) or error.rate_limited:
+        return "rate_limited"
+    return "llm_error"
+
+async def tenant_rag(tenant: str):
+    """The tenant's RAGEngine (loaded from disk if not resident), or None if retrieval is off."""
+    if rag_indexes is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with time_stage("rag", "tenant_load"):
+        return await loop.run_in_executor(None, rag_indexes.get, tenant)
+
+async def faq_fallback(message: str, reason: str, tenant: str = DEFAULT_TENANT) -> str:
+    """Answer from the FAQ index alone when the LLM cannot be used."""
+    CHAT_FALLBACKS.labels(reason).inc()
+    CHAT_TIER.labels("faq_fallback").inc()
+    rag = await tenant_rag(tenant)
+    if rag is None:
+        return "I am having trouble processing your request right now."
+    loop = asyncio.get_running_loop()
+    with time_stage("chat", "faq_fallback"):
+        context = await loop.run_in_executor(None, rag.retrieve_relevant_faqs, message)
+        answer, _ = rag.generate_answer(message, context)
+    return answer
+
+async def faq_fast_path(message: str, tenant: str = DEFAULT_TENANT):
+    """Return the FAQ answer if the best match clears the confidence threshold, else None."""
+    if not settings.FAQ_FAST_PATH_ENABLED:
+        return None
+    rag = await tenant_rag(tenant)
+    if rag is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with time_stage("chat", "faq_fast_path"):
+        context = await loop.run_in_executor(
+            None, lambda: rag.retrieve_relevant_faqs(message, k=1, threshold=settings.FAQ_FAST_PATH_THRESHOLD)
+        )
+    if not context:
+        return None
+    answer, _ = rag.generate_answer(message, context)
+    CHAT_TIER.labels("faq").inc()
+    return answer
+
+def check_tenant(tenant: str) -> None:
+    if not tenant_exists(tenant):
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+
+# --- ROUTES ---
 
-    except Exception as e:
+async def answer_chat(message: str, history: str, tenant: str = DEFAULT_TENANT):
+    """Answer one chat message; returns (text, tier)."""
+    # Questions that clearly match an FAQ never reach the LLM
+    answer = await faq_fast_path(message, tenant)
+    if answer is not None:
+        return answer, "faq"
+
+    if not llm:
+        return await faq_fallback(message, "not_configured", tenant), "faq_fallback"
+
+    try:
+        with time_stage("chat", "prompt_build"):
+            prompt = build_chat_prompt(message, history)
+        with time_stage("chat", "llm"):
+            response = await llm.agenerate(prompt, prefix=build_chat_prefix(tenant))
+        CHAT_TIER.labels("llm").inc()
+        return response.text, "llm"
+
+    except LLMError as e:
         print(f"AI Error: {e}")
-        return {"response": "I am having trouble processing your request right now."}
+        return await faq_fallback(message, fallback_reason(e), tenant), "faq_fallback"
+
+# Chat memory reads and writes are blocking DB calls; the async chat
+# handlers run them in the threadpool so they never stall the event loop
+def open_chat(db: Session, session_id: Optional[str], user_id: Optional[int]):
+    session = chat_memory.get_or_create_session(db, session_id, user_id)
+    with time_stage("chat", "history"):
+        history = chat_memory.build_history(db, session)
+    return session, history
+
+def save_streamed_exchange(session_id: str, user_id: Optional[int], question: str, answer: str) -> None:
+    # The request's DB session is closed once streaming starts
+    db = SessionLocal()
+    try:
+        session = chat_memory.get_or_create_session(db, session_id, user_id)
+        chat_memory.add_exchange(db, session, question, answer)
+    finally:
+        db.close()
+
+@app.post("/api/chat")
+async def chat_with_ai(request: ChatRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
+                       current_user: Optional[User] = Depends(get_optional_user)):
+    check_tenant(request.tenant)
+    user_id = current_user.id if current_user else None
+    session, history = await run_in_threadpool(open_chat, db, request.session_id, user_id)
+
+    answer, tier = await answer_chat(request.message, history, request.tenant)
+
+    await run_in_threadpool(chat_memory.add_exchange, db, session, request.message, answer)
+    # Fold turns that left the window into the summary after responding
+    background_tasks.add_task(chat_memory.compact_session, session.id, summarize_turns)
+    return {"response": answer, "tier": tier, "session_id": session.id}
+
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(request: ChatRequest, db: Session = Depends(get_db),
+                              current_user: Optional[User] = Depends(get_optional_user)):
+    check_tenant(request.tenant)
+    user_id = current_user.id if current_user else None
+    session, history = await run_in_threadpool(open_chat, db, request.session_id, user_id)
+    session_id = session.id
+    headers = {"X-Chat-Session": session_id}
+    # Runs once the whole body is sent (after the exchange is saved); like
+    # BackgroundTasks, the response holds the task and errors are logged
+    compaction = BackgroundTask(chat_memory.compact_session, session_id, summarize_turns)
+
+    answer, tier = await faq_fast_path(request.message, request.tenant), "faq"
+    if answer is None and not llm:
+        answer, tier = await faq_fallback(request.message, "not_configured", request.tenant), "faq_fallback"
+    if answer is not None:
+        await run_in_threadpool(chat_memory.add_exchange, db, session, request.message, answer)
+        headers["X-Chat-Tier"] = tier
+        return StreamingResponse(iter([answer]), media_type="text/plain", headers=headers, background=compaction)
+
+    async def chunks():
+        sent = []
+        try:
+            with time_stage("chat", "llm_stream"):
+                async for chunk in llm.astream(build_chat_prompt(request.message, history), prefix=build_chat_prefix(request.tenant)):
+                    sent.append(chunk)
+                    yield chunk
+            CHAT_TIER.labels("llm").inc()
+        except LLMError as e:
+            print(f"AI Error: {e}")
+            if sent:
+                tail = "\n\nI am having trouble processing your request right now."
+            else:
+                tail = await faq_fallback(request.message, fallback_reason(e), request.tenant)
+            sent.append(tail)
+            yield tail
+
+        await run_in_threadpool(save_streamed_exchange, session_id, user_id, request.message, "".join(sent))
+
+    headers["X-Chat-Tier"] = "llm"
+    return StreamingResponse(chunks(), media_type="text/plain", headers=headers, background=compaction)
+
+@app.get("/api/chat/sessions/{session_id}")
+def get_chat_session(session_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    # Agents and admins can review any chat; customers only the ones they started
+    if not session or (current_user.role == UserRole.CUSTOMER and session.user_id != current_user.id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {
+        "session_id": session.id,
+        "summary": session.summary,
+        "recent_turns": [
+            {"role": turn.role, "content": turn.content, "created_at": turn.created_at}
+            for turn in chat_memory.recent_turns(db, session)
+        ],
+    }
+
+@app.on_event("startup")
+def prepare_database():
+    # Runs before the workers below, which read the tables it checks
+    init_db()
+
+@app.on_event("startup")
+def start_sla_worker():
+    # Every worker process runs one; only the holder of the DB lease escalates
+    sla.start_worker()
+
+@app.on_event("shutdown")
+def stop_sla_worker():
+    sla.stop_worker()
+
+@app.on_event("startup")
+def start_assignment_scheduler():
+    # Loads agent loads and queues unassigned tickets before requests arrive
+    assignment.start_scheduler()
+
+@app.on_event("shutdown")
+def stop_assignment_scheduler():
+    # Writes assignments still waiting for the next batch
+    assignment.stop_scheduler()
+
+@app.get("/metrics")
+def metrics():
+    return metrics_response()
 
 @app.post("/api/register", status_code=201)
 def register(user: UserCreate, db: Session = Depends(get_db)):
@@ -162,7 +437,7 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
     if not user or not verify_password(data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token = create_access_token({"sub": user.email}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    access_token = create_access_token({"sub": str(user.id)}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/users/me")
@@ -174,5 +449,16 @@ def read_me(current_user: User = Depends(get_current_user)):
         "role": current_user.role
     }
 
+# Ticketing API; mounted last so the routes above take precedence
+app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(tickets.router, prefix="/api/tickets", tags=["tickets"])
+app.include_router(messages.router, prefix="/api/messages", tags=["messages"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,249 @@
+import time
+from contextlib import contextmanager
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from tracing import tracer
+
+# Buckets from 1ms to 30s cover both SQL statements and LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of internal processing stages",
+    ["component", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed",
+    ["operation"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total",
+    "LLM generation requests by outcome",
+    ["provider", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens by direction (cached_input = input tokens served from a prefix cache)",
+    ["provider", "direction"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM calls retried after a retryable error",
+    ["provider"],
+)
+LLM_RATE_LIMIT_WAITS = Counter(
+    "llm_rate_limit_waits_total",
+    "Requests delayed or rejected by the client-side token bucket",
+    ["provider", "result"],
+)
+LLM_RATE_LIMIT_RATE = Gauge(
+    "llm_rate_limit_tokens_per_second",
+    "Current adaptive token bucket refill rate",
+    ["provider"],
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["provider"],
+)
+LLM_CIRCUIT_TRANSITIONS = Counter(
+    "llm_circuit_transitions_total",
+    "Circuit breaker state changes",
+    ["provider", "state"],
+)
+CHAT_FALLBACKS = Counter(
+    "chat_fallback_total",
+    "Chat requests answered from the FAQ index instead of the LLM",
+    ["reason"],
+)
+CHAT_TIER = Counter(
+    "chat_tier_total",
+    "Chat requests by the tier that answered them",
+    ["tier"],
+)
+RAG_SEARCHES = Counter(
+    "rag_searches_total",
+    "FAQ retrievals by search mode (full, filtered, routed, routed_fallback)",
+    ["mode"],
+)
+TICKET_PRIORITY_PREDICTIONS = Counter(
+    "ticket_priority_predictions_total",
+    "Classifier priority vs the customer's pick (agreed, overridden, disagreed, low_confidence)",
+    ["outcome"],
+)
+
+# Ticket queue waits range from seconds to days
+WAIT_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 14400, 86400)
+
+ASSIGNMENT_WAIT = Histogram(
+    "ticket_assignment_wait_seconds",
+    "Time tickets waited in the assignment queue before getting an agent",
+    ["queue"],
+    buckets=WAIT_BUCKETS,
+)
+ASSIGNMENT_QUEUE_DEPTH = Gauge(
+    "ticket_assignment_queue_depth",
+    "Tickets waiting for an agent, by priority queue",
+    ["queue"],
+)
+TICKET_ASSIGNMENTS = Counter(
+    "ticket_assignments_total",
+    "Scheduler assignments written to the database (persisted) or lost to a concurrent change (conflict)",
+    ["outcome"],
+)
+SLA_BREACHES = Counter(
+    "sla_breaches_total",
+    "Tickets past their SLA deadline, by target (response, resolution) and action taken",
+    ["kind", "action"],
+)
+SLA_ESCALATION_LAG = Histogram(
+    "sla_escalation_lag_seconds",
+    "Delay between an SLA deadline passing and the worker acting on it",
+    buckets=LATENCY_BUCKETS,
+)
+SLA_PENDING = Gauge(
+    "sla_pending_deadlines",
+    "SLA deadlines within the horizon held in this worker's heap",
+)
+SLA_LEADER = Gauge(
+    "sla_worker_leader",
+    "1 if this process holds the SLA escalation lease",
+)
+TICKET_DUPLICATES = Counter(
+    "ticket_duplicates_total",
+    "Likely duplicate tickets at creation, by action taken (flagged, merged)",
+    ["action"],
+)
+
+RAG_RERANKS = Counter(
+    "rag_rerank_total",
+    "Rerank stage outcomes (changed_top, kept_top, skipped_budget, skipped_too_few, over_budget)",
+    ["outcome"],
+)
+RAG_RESIDENT_BYTES = Gauge(
+    "rag_resident_index_bytes",
+    "Memory held by tenant FAQ indexes currently resident",
+)
+RAG_TENANT_EVICTIONS = Counter(
+    "rag_tenant_evictions_total",
+    "Tenant FAQ indexes evicted from memory to stay under the budget",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups; hit ratio = hit / (hit + miss)",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def time_stage(component: str, stage: str):
+    """Record how long the wrapped block takes as a stage of `component`.
+
+    The block is also traced as a `component.stage` span when tracing is on.
+    """
+    started = time.perf_counter()
+    try:
+        with tracer.span(f"{component}.{stage}"):
+            yield
+    finally:
+        STAGE_LATENCY.labels(component, stage).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_llm(provider: str, response=None, outcome: str = "success") -> None:
+    """Count an LLM request and, when a response is given, its tokens."""
+    LLM_REQUESTS.labels(provider, outcome).inc()
+    if response is not None:
+        LLM_TOKENS.labels(provider, "input").inc(response.input_tokens)
+        LLM_TOKENS.labels(provider, "output").inc(response.output_tokens)
+        LLM_TOKENS.labels(provider, "cached_input").inc(response.cached_input_tokens)
+
+
+def record_prefix_cache(provider: str, cached_tokens: int) -> None:
+    """Count a prompt-prefix cache lookup; cached tokens are input tokens saved."""
+    record_cache("llm_prefix", cached_tokens > 0)
+    LLM_TOKENS.labels(provider, "cached_input").inc(cached_tokens)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every SQL statement executed through `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Keep the start-time stack balanced when a statement fails
+        starts = context.connection.info.get("metrics_query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency per route template.
+
+    Uses the matched route's path (e.g. /tickets/{ticket_id}) rather than
+    the raw URL so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route_path, str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+def metrics_response() -> Response:
+    """Render all metrics in the Prometheus text format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
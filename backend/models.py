@@ -22,7 +22,8 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
-    tickets = relationship("Ticket", back_populates="owner")
+    tickets = relationship("Ticket", back_populates="customer", foreign_keys="Ticket.customer_id")
+    assigned_tickets = relationship("Ticket", back_populates="assigned_agent", foreign_keys="Ticket.assigned_agent_id")
     messages = relationship("Message", back_populates="user")
 
 class TicketStatus(str, enum.Enum):
@@ -39,12 +40,30 @@ class Ticket(Base):
     description = Column(Text, nullable=True)
     status = Column(String, default=TicketStatus.OPEN)
     priority = Column(String, default="medium")
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Priority the customer picked; `priority` may differ after a classifier override
+    requested_priority = Column(String, nullable=True)
+    # Classifier's pick at creation (None when no classifier ran)
+    predicted_priority = Column(String, nullable=True)
+    # Last priority an agent or admin set by hand; with requested_priority, the training labels
+    reviewed_priority = Column(String, nullable=True)
+    # Priority before the SLA worker first raised it; cleared when someone sets the priority
+    escalated_from = Column(String, nullable=True)
+    # FAQ topic the ticket was classified under; used to route it to skilled agents
+    topic = Column(String, nullable=True)
+    # Last topic an agent or admin set by hand; the classifier's topic training label
+    reviewed_topic = Column(String, nullable=True)
+    # Next SLA deadline (UTC) while open or in progress; indexed so the SLA worker reads only near-due rows
+    sla_due_at = Column(DateTime, nullable=True, index=True)
+    customer_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    assigned_agent_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # When the ticket last became resolved or closed; cleared if it is reopened
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
-    owner = relationship("User", back_populates="tickets")
+    customer = relationship("User", back_populates="tickets", foreign_keys=[customer_id])
+    assigned_agent = relationship("User", back_populates="assigned_tickets", foreign_keys=[assigned_agent_id])
     messages = relationship("Message", back_populates="ticket")
 
 class Message(Base):
@@ -59,4 +78,61 @@ class Message(Base):
     
     # Relationships
     ticket = relationship("Ticket", back_populates="messages")
-    user = relationship("User", back_populates="messages")
\ No newline at end of file
+    user = relationship("User", back_populates="messages")
+
+class AgentProfile(Base):
+    """Routing settings of an agent; agents without a profile take any topic at default capacity"""
+    __tablename__ = "agent_profiles"
+    
+    agent_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Comma-separated FAQ topics; empty means the agent takes any topic
+    skills = Column(Text, nullable=False, default="")
+    # Open-ticket load (priority-weighted) the scheduler fills the agent up to
+    capacity = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class WorkerLease(Base):
+    """Named lease so only one process runs a singleton background job at a time"""
+    __tablename__ = "worker_leases"
+    
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class TicketSummary(Base):
+    """Ticket counts per (status, priority, agent), maintained alongside ticket writes"""
+    __tablename__ = "ticket_summary"
+    
+    status = Column(String, primary_key=True)
+    priority = Column(String, primary_key=True)
+    # 0 stands for "unassigned" so the column can be part of the primary key
+    agent_id = Column(Integer, primary_key=True, default=0)
+    ticket_count = Column(Integer, nullable=False, default=0)
+
+class ChatSession(Base):
+    """A chat conversation; older turns are folded into a rolling summary"""
+    __tablename__ = "chat_sessions"
+    
+    id = Column(String(32), primary_key=True)
+    # Who started the chat; None for anonymous chats
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    summary = Column(Text, nullable=False, default="")
+    # Highest turn id already folded into the summary (0 = none)
+    summarized_through = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    turns = relationship("ChatTurn", back_populates="session", order_by="ChatTurn.id")
+
+class ChatTurn(Base):
+    __tablename__ = "chat_turns"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(32), ForeignKey("chat_sessions.id"), nullable=False, index=True)
+    role = Column(String, nullable=False)  # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    session = relationship("ChatSession", back_populates="turns")
@@ -0,0 +1,84 @@
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List
+
+# Only one profiling session per worker at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running in this worker."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def _folded(counts: Dict[str, int]) -> str:
+    """Render stacks in the folded format read by flamegraph.pl and speedscope."""
+    return "\n".join(f"{stack} {count}" for stack, count in sorted(counts.items())) + "\n"
+
+
+def sample_cpu(seconds: float, interval: float = 0.01) -> str:
+    """Statistically sample every thread's stack for `seconds`.
+
+    Runs in the calling thread, which is excluded from the samples. Each
+    line of the result is `thread;outer;...;inner count`.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    try:
+        own_ident = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts: Dict[str, int] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(interval)
+        return _folded(counts)
+    finally:
+        _profile_lock.release()
+
+
+def allocation_snapshot(seconds: float, frames: int = 25, top: int = 200) -> str:
+    """Trace allocations for `seconds` and return live bytes per allocating stack.
+
+    tracemalloc is only started for the duration of the call (unless it was
+    already running), so there is no overhead outside a session. Output is
+    folded stacks weighted by bytes still allocated at the end.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(frames)
+        time.sleep(seconds)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        counts: Dict[str, int] = {}
+        for stat in snapshot.statistics("traceback")[:top]:
+            stack = ";".join(
+                f"{frame.filename}:{frame.lineno}" for frame in stat.traceback
+            )
+            counts[stack] = counts.get(stack, 0) + stat.size
+        return _folded(counts)
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _profile_lock.release()
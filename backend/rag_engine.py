@@ -1,50 +1,200 @@
-import json
 import numpy as np
-from typing import List, Dict, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Sequence
 from sentence_transformers import SentenceTransformer
 import faiss
 import os
+import threading
+import time
+
+from kb_store import KnowledgeBase, get_knowledge_base, load_knowledge_base
+from metrics import RAG_SEARCHES, record_cache, time_stage
+
+class IndexPartition:
+    """A FAISS index over a subset of the FAQs, mapping hits back to corpus positions."""
+    
+    __slots__ = ("index", "positions")
+    
+    def __init__(self, vectors: np.ndarray, positions: Sequence[int]):
+        """`vectors` holds the embeddings of `positions`, row for row."""
+        self.positions = np.asarray(positions, dtype='int64')
+        self.index = faiss.IndexFlatL2(vectors.shape[1])
+        self.index.add(vectors)
+    
+    def search(self, query_embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, local = self.index.search(query_embeddings, min(k, len(self.positions)))
+        # Keep FAISS's -1 padding, translate everything else to corpus positions
+        return distances, np.where(local >= 0, self.positions[np.maximum(local, 0)], -1)
 
 class RAGEngine:
-    def __init__(self, faq_path: str = "data/faqs.json", model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, faq_path: Optional[str] = None, model_name: str = 'all-MiniLM-L6-v2',
+                 faqs: Optional[List[Dict]] = None, model=None, kb: Optional[KnowledgeBase] = None,
+                 route_queries: bool = False, route_max_topics: int = 2, route_margin: float = 0.1,
+                 index: Optional[faiss.IndexFlatL2] = None, reranker=None,
+                 max_filtered_partitions: int = 32):
         """
         Initialize the RAG Engine with FAQ data and embedding model.
         
         Args:
-            faq_path: Path to the JSON file containing FAQs
+            faq_path: Path to a JSON file of FAQs; defaults to the shared knowledge base
             model_name: Name of the sentence transformer model to use
+            faqs: FAQ records to index instead of loading faq_path
+            model: Preloaded encoder exposing encode(); overrides model_name
+            kb: Knowledge base snapshot to index; overrides faq_path and faqs
+            route_queries: Search the topic partitions a query most likely belongs
+                to first, falling back to the whole corpus if nothing qualifies.
+                Off by default: a routed hit is returned even when an unrouted
+                topic holds a closer FAQ, and on corpora of a few hundred FAQs
+                the flat search is no slower
+            route_max_topics: Most topic partitions searched for a routed query
+            route_margin: Topics scoring within this of the best one are also searched
+            index: Previously built (e.g. persisted) index over the same FAQs,
+                which skips re-embedding the corpus
+            reranker: Optional CrossEncoderReranker that reorders the top
+                candidates of single-query retrievals
+            max_filtered_partitions: Topic/category filter partitions kept
+                built; the least recently used are dropped first
         """
-        self.model = SentenceTransformer(model_name)
-        self.faqs = self._load_faqs(faq_path)
-        self.index = self._build_faiss_index()
-        
-    def _load_faqs(self, faq_path: str) -> List[Dict]:
-        """Load FAQs from a JSON file."""
-        try:
-            with open(faq_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            # Return some sample FAQs if the file doesn't exist
-            return [
-                {"id": "faq_1", "question": "How do I reset my password?", "answer": "You can reset your password by clicking on 'Forgot Password' on the login page."},
-                {"id": "faq_2", "question": "What are your business hours?", "answer": "Our support team is available 24/7 to assist you."},
-                {"id": "faq_3", "question": "How can I track my order?", "answer": "You can track your order by logging into your account and visiting the 'My Orders' section."}
-            ]
-    
-    def _build_faiss_index(self) -> faiss.IndexFlatL2:
-        """Build a FAISS index from the FAQ embeddings."""
-        # Generate embeddings for all FAQ questions
-        questions = [faq["question"] for faq in self.faqs]
-        question_embeddings = self.model.encode(questions, convert_to_tensor=False)
+        self.model = model if model is not None else SentenceTransformer(model_name)
+        if kb is None:
+            if faqs is not None:
+                kb = KnowledgeBase.from_records(faqs)
+            elif faq_path is not None:
+                kb = load_knowledge_base(faq_path)
+            else:
+                kb = get_knowledge_base()
+        self.kb = kb
+        self.faqs = kb.faqs
+        self.route_queries = route_queries
+        self.route_max_topics = route_max_topics
+        self.route_margin = route_margin
+        self.reranker = reranker
+        self.max_filtered_partitions = max_filtered_partitions
         
+        if index is not None and index.ntotal == len(self.faqs):
+            self.index = index
+            embeddings = index.reconstruct_n(0, index.ntotal)
+        else:
+            embeddings = self._embed_faqs()
+            self.index = self._build_faiss_index(embeddings)
+        self._build_partitions(embeddings)
+    
+    def _embed_faqs(self) -> np.ndarray:
+        # Generate embeddings for all FAQ questions
+        questions = [faq.question for faq in self.faqs]
+        with time_stage("rag", "index_embed"):
+            return self.model.encode(questions, convert_to_tensor=False).astype('float32')
+    
+    def _build_faiss_index(self, question_embeddings: np.ndarray) -> faiss.IndexFlatL2:
+        """Build a FAISS index from the FAQ embeddings."""
         # Create and train the FAISS index
-        dimension = question_embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(question_embeddings.astype('float32'))
+        with time_stage("rag", "index_build"):
+            dimension = question_embeddings.shape[1]
+            index = faiss.IndexFlatL2(dimension)
+            index.add(question_embeddings)
         
         return index
     
-    def retrieve_relevant_faqs(self, query: str, k: int = 3, threshold: float = 0.7) -> List[Dict]:
+    def _build_partitions(self, embeddings: np.ndarray) -> None:
+        """One index per topic, plus normalized topic centroids for query routing."""
+        with time_stage("rag", "partition_build"):
+            self.topics = self.kb.topics
+            self.partitions: Dict[str, IndexPartition] = {}
+            for topic in self.topics:
+                positions = list(self.kb.topic_index[topic])
+                self.partitions[topic] = IndexPartition(embeddings[positions], positions)
+            # Filtered partitions (category, topic combinations) are built on
+            # first use and kept in a bounded LRU
+            self._filtered: "OrderedDict[Tuple, Optional[IndexPartition]]" = OrderedDict()
+            self._filtered_lock = threading.Lock()
+            centroids = np.stack([
+                embeddings[list(self.kb.topic_index[topic])].mean(axis=0) for topic in self.topics
+            ]) if self.topics else np.zeros((0, embeddings.shape[1]), dtype='float32')
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.topic_centroids = (centroids / norms).astype('float32')
+    
+    def memory_bytes(self) -> int:
+        """Approximate RAM held by the vectors (flat index, partitions and cached filters)."""
+        vector_bytes = self.index.d * 4
+        with self._filtered_lock:
+            filtered = [p for p in self._filtered.values() if p is not None]
+        partitions = list(self.partitions.values()) + filtered
+        total = self.index.ntotal + sum(p.index.ntotal for p in partitions)
+        return total * vector_bytes
+    
+    def save_index(self, path: str) -> None:
+        """Write the flat index to `path` atomically; partitions are rebuilt from it on load."""
+        tmp_path = f"{path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+    
+    def classify_topics(self, query_embedding: np.ndarray) -> List[Tuple[str, float]]:
+        """Rank topics by cosine similarity between the query and each topic centroid.
+        
+        Costs one small matrix-vector product per query, independent of corpus size.
+        """
+        if not self.topics:
+            return []
+        vector = query_embedding.reshape(-1)
+        norm = np.linalg.norm(vector) or 1.0
+        scores = self.topic_centroids @ (vector / norm)
+        order = np.argsort(-scores)
+        return [(self.topics[i], float(scores[i])) for i in order]
+    
+    def route(self, query_embedding: np.ndarray) -> List[str]:
+        """The topics a routed query searches first."""
+        ranked = self.classify_topics(query_embedding)
+        if not ranked:
+            return []
+        best = ranked[0][1]
+        return [topic for topic, score in ranked[:self.route_max_topics] if score >= best - self.route_margin]
+    
+    def _filtered_partition(self, topics: Optional[Sequence[str]], category: Optional[str]) -> Optional[IndexPartition]:
+        """Partition over the FAQs matching the given topics and/or category; None if empty."""
+        if category is None and topics is not None and len(topics) == 1:
+            return self.partitions.get(topics[0])
+        key = (tuple(sorted(topics)) if topics is not None else None, category)
+        with self._filtered_lock:
+            if key in self._filtered:
+                self._filtered.move_to_end(key)
+                record_cache("rag_filtered_partition", True)
+                return self._filtered[key]
+        record_cache("rag_filtered_partition", False)
+        
+        positions = set(range(len(self.faqs)))
+        if topics is not None:
+            positions = {p for topic in topics for p in self.kb.topic_index.get(topic, ())}
+        if category is not None:
+            positions &= set(self.kb.category_index.get(category, ()))
+        partition = None
+        if positions:
+            positions = sorted(positions)
+            # Only the matching vectors are read back from the flat index, not kept twice
+            vectors = self.index.reconstruct_batch(np.asarray(positions, dtype='int64'))
+            partition = IndexPartition(vectors, positions)
+        
+        with self._filtered_lock:
+            self._filtered[key] = partition
+            while len(self._filtered) > self.max_filtered_partitions:
+                self._filtered.popitem(last=False)
+        return partition
+    
+    def _search_partitions(self, query_embedding: np.ndarray, partitions: List[IndexPartition], k: int,
+                           threshold: float) -> List[Dict]:
+        """Search each partition and merge the hits into the overall top k."""
+        distances, indices = [], []
+        for partition in partitions:
+            d, i = partition.search(query_embedding, k)
+            distances.append(d[0])
+            indices.append(i[0])
+        if not distances:
+            return []
+        return self._collect_results(np.concatenate(distances), np.concatenate(indices), threshold)[:k]
+    
+    def retrieve_relevant_faqs(self, query: str, k: int = 3, threshold: float = 0.7,
+                               topics: Optional[Sequence[str]] = None, category: Optional[str] = None,
+                               route: Optional[bool] = None) -> List[Dict]:
         """
         Retrieve the most relevant FAQs for a given query.
         
@@ -52,24 +202,88 @@ class RAGEngine:
             query: The user's query
             k: Number of results to return
             threshold: Minimum similarity score threshold
+            topics: Only search FAQs with one of these topics
+            category: Only search FAQs in this category
+            route: Search the classifier's likely topics first; defaults to route_queries
             
         Returns:
             List of relevant FAQs with their similarity scores
+            (and rerank_score when the reranker ran)
+        """
+        if self.reranker is None:
+            return self._retrieve(query, k, threshold, topics, category, route)
+        
+        started = time.perf_counter()
+        # Fetch a wider candidate set for the cross-encoder to reorder
+        candidates = self._retrieve(query, max(k, self.reranker.candidates), threshold, topics, category, route)
+        return self.reranker.rerank(query, candidates, started)[:k]
+    
+    def _retrieve(self, query: str, k: int, threshold: float, topics: Optional[Sequence[str]],
+                  category: Optional[str], route: Optional[bool]) -> List[Dict]:
+        route = self.route_queries if route is None else route
+        if topics is None and category is None and not route:
+            RAG_SEARCHES.labels("full").inc()
+            return self.retrieve_relevant_faqs_batch([query], k=k, threshold=threshold)[0]
+        
+        with time_stage("rag", "embed"):
+            query_embedding = self.model.encode([query], convert_to_tensor=False).astype('float32')
+        
+        if topics is not None or category is not None:
+            RAG_SEARCHES.labels("filtered").inc()
+            with time_stage("rag", "search"):
+                partition = self._filtered_partition(topics, category)
+                return self._search_partitions(query_embedding, [partition] if partition else [], k, threshold)
+        
+        with time_stage("rag", "classify"):
+            routed = self.route(query_embedding)
+        with time_stage("rag", "search"):
+            results = self._search_partitions(
+                query_embedding, [self.partitions[topic] for topic in routed], k, threshold
+            )
+            if results:
+                RAG_SEARCHES.labels("routed").inc()
+                return results
+            # Nothing in the likely topics cleared the threshold; search everything
+            RAG_SEARCHES.labels("routed_fallback").inc()
+            distances, indices = self.index.search(query_embedding, k)
+            return self._collect_results(distances[0], indices[0], threshold)
+    
+    def retrieve_relevant_faqs_batch(self, queries: List[str], k: int = 3, threshold: float = 0.7) -> List[List[Dict]]:
         """
-        # Encode the query
-        query_embedding = self.model.encode([query], convert_to_tensor=False).astype('float32')
+        Retrieve relevant FAQs for several queries with one encode and one search call.
+        
+        Args:
+            queries: The user queries
+            k: Number of results to return per query
+            threshold: Minimum similarity score threshold
+            
+        Returns:
+            One list of relevant FAQs per query, in the same order as queries
+        """
+        if not queries:
+            return []
+        
+        # Encode all queries in a single forward pass
+        with time_stage("rag", "embed"):
+            query_embeddings = self.model.encode(queries, convert_to_tensor=False).astype('float32')
         
         # Search the FAISS index
-        distances, indices = self.index.search(query_embedding, k)
+        with time_stage("rag", "search"):
+            distances, indices = self.index.search(query_embeddings, k)
         
+        with time_stage("rag", "collect"):
+            return [self._collect_results(distances[i], indices[i], threshold) for i in range(len(queries))]
+    
+    def _collect_results(self, distances: np.ndarray, indices: np.ndarray, threshold: float) -> List[Dict]:
+        """Turn one row of FAISS search output into FAQ results."""
         # Convert distances to similarity scores (1 / (1 + distance))
-        similarities = 1 / (1 + distances[0])
+        similarities = 1 / (1 + distances)
         
-        # Get the relevant FAQs
+        # Get the relevant FAQs; FAISS pads with -1 when k exceeds the index size
         results = []
-        for i, idx in enumerate(indices[0]):
-            if similarities[i] >= threshold:
-                faq = self.faqs[idx].copy()
+        for i, idx in enumerate(indices):
+            if idx >= 0 and similarities[i] >= threshold:
+                faq = self.faqs[idx].to_dict()
                 faq["similarity"] = float(similarities[i])
                 results.append(faq)
         
@@ -0,0 +1,89 @@
+import time
+from typing import Dict, List, Optional
+
+from metrics import RAG_RERANKS, time_stage
+
+
+class CrossEncoderReranker:
+    """Rescore retrieval candidates with a cross-encoder in one batched forward pass.
+
+    Reranking runs under a per-request latency budget that also covers the
+    retrieval before it. The cost per (query, candidate) pair is tracked as a
+    moving average, so the number of candidates is cut to what fits in the
+    remaining budget, and the stage is skipped entirely when not even the top
+    two fit.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", model=None,
+                 candidates: int = 10, budget_ms: float = 50.0):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder to load
+            model: Preloaded scorer exposing predict(pairs); overrides model_name
+            candidates: Most retrieval results rescored per query
+            budget_ms: Latency budget for retrieval plus reranking
+        """
+        self.model_name = model_name
+        self._model = model
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        # Moving average of milliseconds per scored pair; None until measured
+        self.pair_cost_ms: Optional[float] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def load(self) -> None:
+        """Load the model and score one pair, so no request pays for either.
+
+        The warm-up pass is not counted in `pair_cost_ms`; its one-off setup
+        cost would otherwise skip reranking until the average decayed.
+        """
+        self.model.predict([("warm up", "warm up")])
+
+    def _fits(self, remaining_ms: float) -> int:
+        """How many candidates can be scored in `remaining_ms`."""
+        if self.pair_cost_ms is None:
+            return self.candidates
+        return min(self.candidates, int(remaining_ms // self.pair_cost_ms))
+
+    def rerank(self, query: str, results: List[Dict], started: float) -> List[Dict]:
+        """Reorder `results` by cross-encoder score, within the budget counted from `started`.
+
+        `started` is a time.perf_counter() value taken when retrieval began.
+        Results that were not rescored keep their order after the rescored ones.
+        """
+        if len(results) < 2:
+            RAG_RERANKS.labels("skipped_too_few").inc()
+            return results
+
+        remaining_ms = self.budget_ms - (time.perf_counter() - started) * 1000
+        count = min(len(results), self._fits(remaining_ms))
+        if count < 2:
+            RAG_RERANKS.labels("skipped_budget").inc()
+            # Let the estimate decay so a transient slowdown does not disable reranking for good
+            if self.pair_cost_ms is not None:
+                self.pair_cost_ms *= 0.95
+            return results
+
+        head, tail = results[:count], results[count:]
+        with time_stage("rag", "rerank"):
+            scoring_started = time.perf_counter()
+            scores = self.model.predict([(query, faq["question"]) for faq in head])
+            elapsed_ms = (time.perf_counter() - scoring_started) * 1000
+
+        cost = elapsed_ms / count
+        self.pair_cost_ms = cost if self.pair_cost_ms is None else 0.7 * self.pair_cost_ms + 0.3 * cost
+
+        for faq, score in zip(head, scores):
+            faq["rerank_score"] = float(score)
+        reranked = sorted(head, key=lambda faq: faq["rerank_score"], reverse=True)
+
+        RAG_RERANKS.labels("changed_top" if reranked[0]["id"] != head[0]["id"] else "kept_top").inc()
+        if (time.perf_counter() - started) * 1000 > self.budget_ms:
+            RAG_RERANKS.labels("over_budget").inc()
+        return reranked + tail
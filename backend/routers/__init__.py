@@ -3,4 +3,9 @@
 from routers import users
 from routers import tickets
 from routers import messages
-from routers import auth
\ No newline at end of file
+from routers import auth
+from routers import search
+from routers import dashboard
+from routers import analytics
+from routers import export
+from routers import admin
\ No newline at end of file
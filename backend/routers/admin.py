@@ -0,0 +1,115 @@
+from typing import Any
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+import models, schemas, auth, importer, profiling, assignment, kb_store
+from config import settings
+from database import get_db
+
+router = APIRouter()
+
+@router.post("/import", response_model=schemas.ImportReport)
+def import_records(
+    file: UploadFile = File(...),
+    batch_size: int = importer.DEFAULT_BATCH_SIZE,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Bulk import users, tickets and messages from an uploaded JSONL file (admin only)"""
+    # UploadFile spools to disk, so iterating it streams line by line
+    return importer.import_jsonl(file.file, batch_size=batch_size)
+
+def check_profiling(seconds: float) -> None:
+    """Reject profiling requests unless enabled in config and within the time limit"""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profiling is disabled"
+        )
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be at most {settings.PROFILING_MAX_SECONDS}"
+        )
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+def profile_cpu(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Sample this worker's CPU stacks for N seconds as folded flamegraph input (admin only)"""
+    check_profiling(seconds)
+    try:
+        return profiling.sample_cpu(seconds, interval=interval_ms / 1000.0)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/profile/memory", response_class=PlainTextResponse)
+def profile_memory(
+    seconds: float = Query(10.0, gt=0),
+    top: int = Query(200, ge=1, le=5000),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Trace allocations for N seconds and return bytes per stack as folded flamegraph input (admin only)"""
+    check_profiling(seconds)
+    try:
+        return profiling.allocation_snapshot(seconds, top=top)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.put("/agents/{agent_id}/profile", response_model=schemas.AgentProfileResponse)
+def update_agent_profile(
+    agent_id: int,
+    profile_in: schemas.AgentProfileUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Set the topics and capacity the assignment scheduler uses for an agent (admin only)"""
+    agent = db.query(models.User).filter(
+        models.User.id == agent_id,
+        models.User.role == models.UserRole.AGENT
+    ).first()
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agent not found"
+        )
+    
+    skills = sorted(assignment.parse_skills(",".join(profile_in.skills)))
+    profile = db.query(models.AgentProfile).filter(models.AgentProfile.agent_id == agent_id).first()
+    if not profile:
+        profile = models.AgentProfile(agent_id=agent_id)
+        db.add(profile)
+    profile.skills = ",".join(skills)
+    profile.capacity = profile_in.capacity
+    db.commit()
+    
+    load = None
+    scheduler = assignment.get_scheduler()
+    if scheduler is not None:
+        scheduler.update_agent(agent_id, frozenset(skills), profile_in.capacity)
+        load = scheduler.agent_loads().get(agent_id, (None, None))[0]
+    return schemas.AgentProfileResponse(
+        agent_id=agent_id, skills=skills, capacity=profile_in.capacity, load=load
+    )
+
+@router.post("/knowledge-base/reload", response_model=schemas.KnowledgeBaseInfo)
+def reload_knowledge_base(
+    tenant: str = kb_store.DEFAULT_TENANT,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Re-read a tenant's FAQ file in this worker now (admin only); others pick it up within KB_RELOAD_CHECK_SECONDS"""
+    try:
+        kb = kb_store.reload_knowledge_base(tenant)
+    except kb_store.UnknownTenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown tenant"
+        )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid knowledge base file: {e}"
+        )
+    return schemas.KnowledgeBaseInfo(tenant=tenant, version=kb.version, faqs=len(kb))
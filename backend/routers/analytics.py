@@ -0,0 +1,40 @@
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+import models, schemas, auth, analytics
+from database import get_db
+
+router = APIRouter()
+
+# Default reporting window when no start date is given
+DEFAULT_RANGE = timedelta(weeks=12)
+
+@router.get("/response-times", response_model=schemas.ResponseTimeAnalytics)
+def get_response_times(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """First-response time, resolution time and AI reply share per agent and week (admin only)"""
+    if end is None:
+        # Round up to the next hour so repeated requests share a cache entry
+        end = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = start or end - DEFAULT_RANGE
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    try:
+        items = analytics.response_time_stats(db, start, end, agent_id=agent_id)
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e)
+        )
+    return {"start": start, "end": end, "items": items}
@@ -4,10 +4,9 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from typing import Any
 
-from .. import models, schemas
-from . import auth_utils
-from ..database import get_db
-from ..config import settings
+import models, schemas, auth
+from database import get_db
+from config import settings
 
 router = APIRouter()
 
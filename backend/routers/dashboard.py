@@ -0,0 +1,25 @@
+from typing import Any
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+import models, schemas, auth, ticket_summary
+from database import get_db
+
+router = APIRouter()
+
+@router.get("/summary", response_model=schemas.TicketSummaryResponse)
+def get_ticket_summary(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Ticket counts by status, priority and agent (admin only)"""
+    return ticket_summary.get_summary(db)
+
+@router.post("/summary/rebuild", response_model=schemas.TicketSummaryResponse)
+def rebuild_ticket_summary(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+) -> Any:
+    """Recompute the ticket summary table from the tickets table (admin only)"""
+    ticket_summary.rebuild(db)
+    return ticket_summary.get_summary(db)
@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import Iterator, List, Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+import models, schemas, auth
+from database import SessionLocal
+
+router = APIRouter()
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+# Approximate size of each chunk written to the response
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+TICKET_COLUMNS = [
+    "id", "title", "description", "status", "priority",
+    "customer_id", "assigned_agent_id", "created_at", "updated_at", "resolved_at"
+]
+MESSAGE_COLUMNS = [
+    "id", "ticket_id", "user_id", "content", "is_ai_generated", "created_at"
+]
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    JSONL = "jsonl"
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+def _iter_rows(build_query, columns: List[str]) -> Iterator[tuple]:
+    """Stream rows through a server-side cursor in its own session.
+
+    The request-scoped session may be closed before the response body is
+    fully sent, so the generator owns its session for the whole stream.
+    """
+    db = SessionLocal()
+    try:
+        query = build_query(db).execution_options(stream_results=True)
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            yield tuple(_serialize(value) for value in row)
+    finally:
+        db.close()
+
+def _encode(rows: Iterator[tuple], columns: List[str], fmt: ExportFormat) -> Iterator[str]:
+    if fmt == ExportFormat.CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        parts = []
+        size = 0
+        for row in rows:
+            line = json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+            parts.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield "".join(parts)
+                parts = []
+                size = 0
+        yield "".join(parts)
+
+def _compress(chunks: Iterator[str], gzip: bool) -> Iterator[bytes]:
+    if not gzip:
+        for chunk in chunks:
+            if chunk:
+                yield chunk.encode("utf-8")
+        return
+    # wbits=31 produces a gzip container instead of a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _export_response(build_query, columns: List[str], name: str, fmt: ExportFormat, gzip: bool):
+    body = _compress(_encode(_iter_rows(build_query, columns), columns, fmt), gzip)
+    filename = f"{name}.{fmt.value}"
+    media_type = "text/csv" if fmt == ExportFormat.CSV else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _ticket_filters(query, start, end, status):
+    if start:
+        query = query.filter(models.Ticket.created_at >= start)
+    if end:
+        query = query.filter(models.Ticket.created_at < end)
+    if status:
+        query = query.filter(models.Ticket.status == status)
+    return query
+
+@router.get("/tickets")
+def export_tickets(
+    format: ExportFormat = ExportFormat.CSV,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[schemas.TicketStatus] = None,
+    gzip: bool = False,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Stream all tickets matching the filters as CSV or JSONL (admin only)"""
+    def build_query(db):
+        query = db.query(*[getattr(models.Ticket, column) for column in TICKET_COLUMNS])
+        return _ticket_filters(query, start, end, status).order_by(models.Ticket.id)
+
+    return _export_response(build_query, TICKET_COLUMNS, "tickets", format, gzip)
+
+@router.get("/messages")
+def export_messages(
+    format: ExportFormat = ExportFormat.JSONL,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[schemas.TicketStatus] = None,
+    gzip: bool = False,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Stream the conversations of tickets matching the filters (admin only)
+
+    Messages are ordered by ticket and creation time so each conversation
+    is contiguous in the output.
+    """
+    def build_query(db):
+        query = db.query(
+            *[getattr(models.Message, column) for column in MESSAGE_COLUMNS]
+        ).join(models.Ticket, models.Ticket.id == models.Message.ticket_id)
+        return _ticket_filters(query, start, end, status).order_by(
+            models.Message.ticket_id, models.Message.created_at, models.Message.id
+        )
+
+    return _export_response(build_query, MESSAGE_COLUMNS, "messages", format, gzip)
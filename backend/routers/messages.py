@@ -1,10 +1,10 @@
-from typing import List
+from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from .. import models, schemas, auth
-from ..database import get_db
+import models, schemas, auth
+from database import get_db
 from .tickets import can_access_ticket
 
 router = APIRouter()
@@ -0,0 +1,27 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+import models, schemas, auth, search_index
+from database import get_db
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.SearchHit])
+def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    scope: schemas.SearchScope = schemas.SearchScope.ALL,
+    status: Optional[schemas.TicketStatus] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+) -> Any:
+    """Full-text search over ticket titles, descriptions and message content"""
+    return search_index.search(
+        db,
+        q,
+        current_user,
+        scope=scope.value,
+        limit=limit,
+        status=status.value if status else None
+    )
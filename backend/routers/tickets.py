@@ -1,13 +1,47 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from .. import models, schemas, auth
-from ..database import get_db
+import models, schemas, auth, ticket_summary, ticket_dedup, assignment, ticket_classifier, sla
+from config import settings
+from database import get_db
+from metrics import TICKET_DUPLICATES, TICKET_PRIORITY_PREDICTIONS
 
 router = APIRouter()
 
+# Allowed ticket status transitions (current status -> new statuses)
+VALID_STATUS_TRANSITIONS = {
+    schemas.TicketStatus.OPEN: [
+        schemas.TicketStatus.IN_PROGRESS, 
+        schemas.TicketStatus.RESOLVED,
+        schemas.TicketStatus.CLOSED
+    ],
+    schemas.TicketStatus.IN_PROGRESS: [
+        schemas.TicketStatus.RESOLVED,
+        schemas.TicketStatus.CLOSED
+    ],
+    schemas.TicketStatus.RESOLVED: [
+        schemas.TicketStatus.CLOSED
+    ],
+    schemas.TicketStatus.CLOSED: []
+}
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+BULK_CHUNK_SIZE = 500
+
+# Statuses in which a ticket counts as resolved; they also take it out of
+# the duplicate check
+CLOSED_STATUSES = [schemas.TicketStatus.RESOLVED, schemas.TicketStatus.CLOSED]
+
+def record_resolution(ticket: models.Ticket, before_status, now: datetime) -> None:
+    """Stamp resolved_at when a ticket becomes resolved or closed; clear it when reopened."""
+    if ticket.status not in CLOSED_STATUSES:
+        ticket.resolved_at = None
+    elif before_status not in CLOSED_STATUSES or ticket.resolved_at is None:
+        ticket.resolved_at = now
+
 def can_access_ticket(
     db: Session, 
     ticket_id: int, 
@@ -84,10 +118,11 @@ def list_tickets(
 @router.post("/", response_model=schemas.TicketResponse, status_code=status.HTTP_201_CREATED)
 def create_ticket(
     ticket_in: schemas.TicketCreate,
+    allow_duplicate: bool = Query(False, description="Skip the duplicate check"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ) -> Any:
-    """Create a new ticket"""
+    """Create a new ticket, flagging or merging likely duplicates of the customer's open tickets"""
     # Only customers can create tickets
     if current_user.role != models.UserRole.CUSTOMER:
         raise HTTPException(
@@ -95,22 +130,257 @@ def create_ticket(
             detail="Only customers can create tickets"
         )
     
+    # Compare against the customer's open tickets in memory; no table scan
+    detector = ticket_dedup.get_detector()
+    vector = match = None
+    if detector is not None:
+        vector = detector.embed([ticket_dedup.ticket_text(ticket_in.title, ticket_in.description)])[0]
+        if not allow_duplicate:
+            match = detector.check(db, current_user.id, vector)
+    
+    # The index may predate a close or delete made by another process
+    while match is not None:
+        existing = db.query(models.Ticket).filter(models.Ticket.id == match.ticket_id).first()
+        if existing is not None and existing.status not in CLOSED_STATUSES:
+            break
+        ticket_dedup.discard_tickets([match.ticket_id])
+        stale_id = match.ticket_id
+        match = detector.check(db, current_user.id, vector)
+        if match is not None and match.ticket_id == stale_id:
+            match = None
+    
+    if match is not None and settings.DUPLICATE_TICKET_ACTION == "merge":
+        # Keep the new report as a message on the ticket already open
+        db.add(models.Message(
+            content=f"{ticket_in.title}\n\n{ticket_in.description}",
+            ticket_id=existing.id,
+            user_id=current_user.id,
+            is_ai_generated=False
+        ))
+        existing.updated_at = datetime.utcnow()
+        db.commit()
+        db.refresh(existing)
+        TICKET_DUPLICATES.labels("merged").inc()
+        existing.duplicate_of = existing.id
+        existing.duplicate_similarity = match.similarity
+        existing.merged = True
+        return existing
+    
+    # Classify from the same embedding; with TICKET_CLASSIFIER_OVERRIDE_PRIORITY on,
+    # a confident prediction replaces the customer's pick
+    classifier = ticket_classifier.get_classifier()
+    prediction = None
+    priority = ticket_in.priority
+    if classifier is not None:
+        if vector is None:
+            vector = classifier.embed(ticket_dedup.ticket_text(ticket_in.title, ticket_in.description))
+        prediction = classifier.predict(vector)
+        if prediction.priority_confidence < settings.TICKET_CLASSIFIER_MIN_CONFIDENCE:
+            TICKET_PRIORITY_PREDICTIONS.labels("low_confidence").inc()
+        elif prediction.priority == ticket_in.priority:
+            TICKET_PRIORITY_PREDICTIONS.labels("agreed").inc()
+        elif settings.TICKET_CLASSIFIER_OVERRIDE_PRIORITY:
+            TICKET_PRIORITY_PREDICTIONS.labels("overridden").inc()
+            priority = prediction.priority
+        else:
+            TICKET_PRIORITY_PREDICTIONS.labels("disagreed").inc()
+    
+    # The topic routes the ticket to agents with matching skills
+    scheduler = assignment.get_scheduler()
+    topic = None
+    if (prediction is not None and prediction.topic
+            and prediction.topic_confidence >= settings.TICKET_CLASSIFIER_MIN_CONFIDENCE):
+        topic = prediction.topic
+    elif scheduler is not None:
+        topic = assignment.ticket_topic(ticket_in.title, ticket_in.description, vector)
+    
     # Create the ticket
     db_ticket = models.Ticket(
         title=ticket_in.title,
         description=ticket_in.description,
         status=schemas.TicketStatus.OPEN,
-        priority=ticket_in.priority,
+        priority=priority,
+        requested_priority=ticket_in.priority,
+        predicted_priority=prediction.priority if prediction is not None else None,
+        topic=topic,
+        sla_due_at=sla.due_at(schemas.TicketStatus.OPEN, priority, datetime.utcnow()),
         customer_id=current_user.id,
-        assigned_agent_id=None  # Will be assigned by an agent or admin
+        assigned_agent_id=None  # Set by the scheduler's next batch write, or manually
     )
     
     db.add(db_ticket)
+    ticket_summary.adjust(db, ticket_summary.ticket_key(db_ticket), 1)
     db.commit()
     db.refresh(db_ticket)
     
+    sla.schedule(db_ticket.id, db_ticket.sla_due_at)
+    if scheduler is not None:
+        scheduler.submit(db_ticket.id, db_ticket.priority, topic)
+    if detector is not None:
+        detector.add(current_user.id, db_ticket.id, vector)
+    if prediction is not None:
+        db_ticket.priority_confidence = prediction.priority_confidence
+    if match is not None:
+        TICKET_DUPLICATES.labels("flagged").inc()
+        db_ticket.duplicate_of = match.ticket_id
+        db_ticket.duplicate_similarity = match.similarity
+    
     return db_ticket
 
+@router.post("/bulk", response_model=schemas.TicketBulkResponse)
+def bulk_update_tickets(
+    bulk_in: schemas.TicketBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+) -> Any:
+    """Assign or change the status of many tickets in one transaction (admin/agent only)"""
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.AGENT]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+    values = {"updated_at": datetime.utcnow()}
+    source_statuses = None
+
+    if bulk_in.operation == schemas.TicketBulkOperation.ASSIGN:
+        if bulk_in.agent_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="agent_id is required for the assign operation"
+            )
+        # Check the agent once for the whole batch
+        agent = db.query(models.User.id).filter(
+            models.User.id == bulk_in.agent_id,
+            models.User.role == models.UserRole.AGENT,
+            models.User.is_active == True
+        ).first()
+        if not agent:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid agent ID"
+            )
+        values["assigned_agent_id"] = bulk_in.agent_id
+    else:
+        if bulk_in.status is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="status is required for the status operation"
+            )
+        # Statuses from which the requested status can be reached
+        source_statuses = [
+            current for current, targets in VALID_STATUS_TRANSITIONS.items()
+            if bulk_in.status in targets
+        ]
+        values["status"] = bulk_in.status
+        values["sla_due_at"] = sla.due_expression(bulk_in.status, values["updated_at"])
+        if bulk_in.status in CLOSED_STATUSES:
+            # Resolved tickets being closed keep their resolution time
+            values["resolved_at"] = func.coalesce(models.Ticket.resolved_at, values["updated_at"])
+
+    # Drop duplicate IDs but keep the caller's order for the results
+    ticket_ids = list(dict.fromkeys(bulk_in.ticket_ids))
+
+    current_status = {}
+    for start in range(0, len(ticket_ids), BULK_CHUNK_SIZE):
+        chunk = ticket_ids[start:start + BULK_CHUNK_SIZE]
+        rows = db.query(models.Ticket.id, models.Ticket.status).filter(
+            models.Ticket.id.in_(chunk)
+        ).all()
+        current_status.update({row.id: row.status for row in rows})
+
+    results = {}
+    eligible = []
+    for ticket_id in ticket_ids:
+        if ticket_id not in current_status:
+            results[ticket_id] = schemas.TicketBulkResult(
+                ticket_id=ticket_id, success=False, detail="Ticket not found"
+            )
+        elif source_statuses is not None and current_status[ticket_id] not in source_statuses:
+            results[ticket_id] = schemas.TicketBulkResult(
+                ticket_id=ticket_id,
+                success=False,
+                detail=f"Invalid status transition from {current_status[ticket_id]} to {bulk_in.status}"
+            )
+        else:
+            eligible.append(ticket_id)
+
+    # Set-based UPDATEs; the status guard is repeated in the WHERE clause so a
+    # concurrent change between the read above and the write is not overwritten
+    updated_ids = set()
+    summary_moves = []
+    for start in range(0, len(eligible), BULK_CHUNK_SIZE):
+        chunk = eligible[start:start + BULK_CHUNK_SIZE]
+        query = db.query(models.Ticket).filter(models.Ticket.id.in_(chunk))
+        if source_statuses is not None:
+            query = query.filter(models.Ticket.status.in_(source_statuses))
+        # Summary buckets of the rows about to change, grouped in the database
+        groups = query.with_entities(
+            models.Ticket.status,
+            models.Ticket.priority,
+            models.Ticket.assigned_agent_id,
+            func.count(models.Ticket.id)
+        ).group_by(
+            models.Ticket.status,
+            models.Ticket.priority,
+            models.Ticket.assigned_agent_id
+        ).all()
+        for group_status, group_priority, group_agent_id, count in groups:
+            summary_moves.append((
+                ticket_summary.summary_key(group_status, group_priority, group_agent_id),
+                ticket_summary.summary_key(
+                    values.get("status", group_status),
+                    group_priority,
+                    values.get("assigned_agent_id", group_agent_id)
+                ),
+                count
+            ))
+        matched = query.update(values, synchronize_session=False)
+        if matched == len(chunk):
+            updated_ids.update(chunk)
+        else:
+            changed = db.query(models.Ticket.id).filter(
+                models.Ticket.id.in_(chunk),
+                models.Ticket.updated_at == values["updated_at"]
+            ).all()
+            updated_ids.update(row.id for row in changed)
+    ticket_summary.record_moves(db, summary_moves)
+    db.commit()
+    if bulk_in.status in CLOSED_STATUSES:
+        ticket_dedup.discard_tickets(updated_ids)
+    if "sla_due_at" in values:
+        # The UPDATE computed each row's deadline; hand them to the SLA worker
+        if values["sla_due_at"] is None:
+            sla.unschedule(updated_ids)
+        else:
+            scheduled_ids = list(updated_ids)
+            for start in range(0, len(scheduled_ids), BULK_CHUNK_SIZE):
+                rows = db.query(models.Ticket.id, models.Ticket.sla_due_at).filter(
+                    models.Ticket.id.in_(scheduled_ids[start:start + BULK_CHUNK_SIZE])
+                ).all()
+                for row in rows:
+                    sla.schedule(row.id, row.sla_due_at)
+    settled = bulk_in.operation == schemas.TicketBulkOperation.ASSIGN or bulk_in.status in CLOSED_STATUSES
+    assignment.record_moves(summary_moves, updated_ids if settled else ())
+
+    for ticket_id in eligible:
+        if ticket_id in updated_ids:
+            results[ticket_id] = schemas.TicketBulkResult(ticket_id=ticket_id, success=True)
+        else:
+            results[ticket_id] = schemas.TicketBulkResult(
+                ticket_id=ticket_id,
+                success=False,
+                detail="Ticket status changed concurrently"
+            )
+
+    ordered = [results[ticket_id] for ticket_id in ticket_ids]
+    updated = sum(1 for result in ordered if result.success)
+    return schemas.TicketBulkResponse(
+        updated=updated,
+        failed=len(ordered) - updated,
+        results=ordered
+    )
+
 @router.get("/{ticket_id}", response_model=schemas.TicketResponse)
 def get_ticket(
     ticket_id: int,
@@ -130,6 +400,7 @@ def update_ticket(
 ) -> Any:
     """Update a ticket"""
     ticket = can_access_ticket(db, ticket_id, current_user)
+    summary_before = ticket_summary.ticket_key(ticket)
     
     # Only admins and agents can update certain fields
     if current_user.role in [models.UserRole.ADMIN, models.UserRole.AGENT]:
@@ -137,6 +408,11 @@ def update_ticket(
             ticket.status = ticket_in.status
         if ticket_in.priority is not None:
             ticket.priority = ticket_in.priority
+            ticket.reviewed_priority = ticket_in.priority
+            ticket.escalated_from = None
+        if ticket_in.topic is not None:
+            ticket.topic = ticket_in.topic
+            ticket.reviewed_topic = ticket_in.topic
         if ticket_in.assigned_agent_id is not None:
             # Check if the assigned agent exists and is an agent
             agent = db.query(models.User).filter(
@@ -158,8 +434,19 @@ def update_ticket(
         ticket.description = ticket_in.description
     
     ticket.updated_at = datetime.utcnow()
+    record_resolution(ticket, summary_before[0], ticket.updated_at)
+    summary_after = ticket_summary.ticket_key(ticket)
+    ticket_summary.record_change(db, summary_before, summary_after)
+    sla.refresh_deadline(ticket, summary_before[0], summary_before[1], ticket.updated_at)
     db.commit()
     db.refresh(ticket)
+    sla.schedule(ticket.id, ticket.sla_due_at)
+    assignment.record_moves(
+        [(summary_before, summary_after, 1)],
+        [ticket.id] if assignment.settled(summary_after) else ()
+    )
+    if ticket_in.status is not None or ticket_in.title is not None or ticket_in.description is not None:
+        ticket_dedup.refresh_ticket(ticket)
     
     return ticket
 
@@ -183,8 +470,13 @@ def delete_ticket(
             detail="Ticket not found"
         )
     
+    summary_before = ticket_summary.ticket_key(ticket)
+    ticket_summary.adjust(db, summary_before, -1)
     db.delete(ticket)
     db.commit()
+    ticket_dedup.discard_tickets([ticket_id])
+    sla.unschedule([ticket_id])
+    assignment.record_moves([(summary_before, None, 1)], [ticket_id])
     
     return {"msg": "Ticket deleted successfully"}
 
@@ -217,18 +509,22 @@ def assign_ticket(
             detail="Invalid agent ID"
         )
     
+    summary_before = ticket_summary.ticket_key(ticket)
     ticket.assigned_agent_id = agent_id
     ticket.updated_at = datetime.utcnow()
+    summary_after = ticket_summary.ticket_key(ticket)
+    ticket_summary.record_change(db, summary_before, summary_after)
     
     db.commit()
     db.refresh(ticket)
+    assignment.record_moves([(summary_before, summary_after, 1)], [ticket.id])
     
     return ticket
 
-@router.post("/{ticket_id}/status/{status}", response_model=schemas.TicketResponse)
+@router.post("/{ticket_id}/status/{new_status}", response_model=schemas.TicketResponse)
 def update_ticket_status(
     ticket_id: int,
-    status: schemas.TicketStatus,
+    new_status: schemas.TicketStatus,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ) -> Any:
@@ -242,32 +538,28 @@ def update_ticket_status(
     ticket = can_access_ticket(db, ticket_id, current_user)
     
     # Only allow valid status transitions
-    valid_transitions = {
-        schemas.TicketStatus.OPEN: [
-            schemas.TicketStatus.IN_PROGRESS, 
-            schemas.TicketStatus.RESOLVED,
-            schemas.TicketStatus.CLOSED
-        ],
-        schemas.TicketStatus.IN_PROGRESS: [
-            schemas.TicketStatus.RESOLVED,
-            schemas.TicketStatus.CLOSED
-        ],
-        schemas.TicketStatus.RESOLVED: [
-            schemas.TicketStatus.CLOSED
-        ],
-        schemas.TicketStatus.CLOSED: []
-    }
-    
-    if status not in valid_transitions.get(ticket.status, []):
+    if new_status not in VALID_STATUS_TRANSITIONS.get(ticket.status, []):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status transition from {ticket.status} to {status}"
+            detail=f"Invalid status transition from {ticket.status} to {new_status.value}"
         )
     
-    ticket.status = status
+    summary_before = ticket_summary.ticket_key(ticket)
+    ticket.status = new_status
     ticket.updated_at = datetime.utcnow()
+    record_resolution(ticket, summary_before[0], ticket.updated_at)
+    summary_after = ticket_summary.ticket_key(ticket)
+    ticket_summary.record_change(db, summary_before, summary_after)
+    sla.refresh_deadline(ticket, summary_before[0], summary_before[1], ticket.updated_at)
     
     db.commit()
     db.refresh(ticket)
+    sla.schedule(ticket.id, ticket.sla_due_at)
+    assignment.record_moves(
+        [(summary_before, summary_after, 1)],
+        [ticket.id] if assignment.settled(summary_after) else ()
+    )
+    if new_status in CLOSED_STATUSES:
+        ticket_dedup.discard_tickets([ticket.id])
     
     return ticket
@@ -2,15 +2,12 @@ from typing import List, Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from models import User, Ticket, Message
-from schemas import UserCreate, UserUpdate, UserInDB, User as UserSchema
-from database import get_db, SessionLocal
-from auth import get_current_user, get_password_hash
-from config import settings
+import models, schemas, auth
+from database import get_db
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserSchema])
+@router.get("/", response_model=List[schemas.UserResponse])
 def read_users(
     skip: int = 0,
     limit: int = 100,
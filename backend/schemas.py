@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from enum import Enum
 
@@ -98,13 +98,22 @@ class TicketUpdate(BaseModel):
     description: Optional[str] = None
     status: Optional[TicketStatus] = None
     priority: Optional[TicketPriority] = None
+    topic: Optional[str] = None
     assigned_agent_id: Optional[int] = None
 
 class TicketInDB(TicketBase):
     id: int
     customer_id: int
+    requested_priority: Optional[TicketPriority] = None
+    predicted_priority: Optional[TicketPriority] = None
+    reviewed_priority: Optional[TicketPriority] = None
+    escalated_from: Optional[TicketPriority] = None
+    topic: Optional[str] = None
+    reviewed_topic: Optional[str] = None
+    sla_due_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -112,6 +121,64 @@ class TicketInDB(TicketBase):
 class TicketResponse(TicketInDB):
     customer: UserResponse
     assigned_agent: Optional[UserResponse] = None
+    # Set by create_ticket when the new ticket looks like one the customer already has open
+    duplicate_of: Optional[int] = None
+    duplicate_similarity: Optional[float] = None
+    merged: bool = False
+    # Set by create_ticket when the classifier ran
+    priority_confidence: Optional[float] = None
+
+# Bulk ticket schemas
+class TicketBulkOperation(str, Enum):
+    ASSIGN = "assign"
+    STATUS = "status"
+
+class TicketBulkRequest(BaseModel):
+    ticket_ids: List[int]
+    operation: TicketBulkOperation
+    agent_id: Optional[int] = None
+    status: Optional[TicketStatus] = None
+
+    @validator('ticket_ids')
+    def ticket_ids_size(cls, v):
+        if not v:
+            raise ValueError('At least one ticket ID is required')
+        if len(v) > 1000:
+            raise ValueError('At most 1000 tickets can be updated at once')
+        return v
+
+class TicketBulkResult(BaseModel):
+    ticket_id: int
+    success: bool
+    detail: Optional[str] = None
+
+class TicketBulkResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[TicketBulkResult]
+
+class TicketSummaryResponse(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    by_agent: Dict[str, int]
+
+# Agent routing schemas
+class AgentProfileUpdate(BaseModel):
+    skills: List[str] = []
+    capacity: Optional[int] = None
+    
+    @validator('capacity')
+    def capacity_positive(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('capacity must be at least 1')
+        return v
+
+class AgentProfileResponse(BaseModel):
+    agent_id: int
+    skills: List[str]
+    capacity: Optional[int] = None
+    load: Optional[int] = None
 
 # Message schemas
 class MessageBase(BaseModel):
@@ -119,7 +186,7 @@ class MessageBase(BaseModel):
     is_ai_generated: bool = False
 
 class MessageCreate(MessageBase):
-    pass
+    ticket_id: int
 
 class MessageInDB(MessageBase):
     id: int
@@ -133,6 +200,72 @@ class MessageInDB(MessageBase):
 class MessageResponse(MessageInDB):
     user: UserResponse
 
+# Search schemas
+class SearchScope(str, Enum):
+    TICKETS = "tickets"
+    MESSAGES = "messages"
+    ALL = "all"
+
+class SearchHit(BaseModel):
+    kind: str
+    ticket_id: int
+    message_id: Optional[int] = None
+    snippet: str
+    score: float
+
+# Analytics schemas
+class AgentWeekStats(BaseModel):
+    week: str
+    agent_id: Optional[int] = None
+    tickets: int
+    responded: int
+    avg_first_response_seconds: Optional[float] = None
+    resolved: int
+    avg_resolution_seconds: Optional[float] = None
+    ai_replies: int
+    human_replies: int
+    ai_reply_share: Optional[float] = None
+
+class ResponseTimeAnalytics(BaseModel):
+    start: datetime
+    end: datetime
+    items: List[AgentWeekStats]
+
+# Import schemas
+class UserImport(UserBase):
+    id: Optional[int] = None
+    password: Optional[str] = None
+    hashed_password: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @validator('hashed_password', always=True)
+    def password_present(cls, v, values):
+        if v is None and not values.get('password'):
+            raise ValueError('Either password or hashed_password is required')
+        return v
+
+class TicketImport(TicketBase):
+    id: Optional[int] = None
+    customer_id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+class MessageImport(MessageBase):
+    id: Optional[int] = None
+    ticket_id: int
+    user_id: int
+    created_at: Optional[datetime] = None
+
+class ImportReport(BaseModel):
+    users: int
+    tickets: int
+    messages: int
+    rejected: int
+    errors: List[str]
+    seconds: float
+    rows_per_second: float
+
 # Auth schemas
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -154,3 +287,11 @@ class PaginatedResponse(BaseModel):
 
 class ErrorResponse(BaseModel):
     detail: str
+
+class Msg(BaseModel):
+    msg: str
+
+class KnowledgeBaseInfo(BaseModel):
+    tenant: str
+    version: str
+    faqs: int
@@ -0,0 +1,370 @@
+import html
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import User, UserRole
+
+# Markers wrapped around matched terms in returned snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# The database marks matches with these control characters; the snippet is
+# HTML-escaped before they become HIGHLIGHT_START / HIGHLIGHT_END, so
+# customer-written text can never inject markup
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+# SQLite: FTS5 external-content tables mirror `tickets` and `messages` and are
+# kept in sync by triggers, so every write path (ORM, bulk UPDATE, raw SQL)
+# updates the index inside the same transaction.
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+        title, description,
+        content='tickets', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, ticket_id UNINDEXED,
+        content='messages', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE OF title, description ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tickets_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content, ticket_id)
+        VALUES (new.id, new.content, new.ticket_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, ticket_id)
+        VALUES ('delete', old.id, old.content, old.ticket_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, ticket_id)
+        VALUES ('delete', old.id, old.content, old.ticket_id);
+        INSERT INTO messages_fts(rowid, content, ticket_id)
+        VALUES (new.id, new.content, new.ticket_id);
+    END
+    """,
+    # Weight title matches above description matches
+    "INSERT INTO tickets_fts(tickets_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+]
+
+# PostgreSQL: stored generated tsvector columns with GIN indexes
+POSTGRES_DDL = [
+    """
+    ALTER TABLE tickets ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tickets_search_vector ON tickets USING GIN (search_vector)",
+    """
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+]
+
+
+def install_search_index(engine: Engine) -> None:
+    """Create the full-text index structures for the engine's dialect.
+
+    Safe to call on every startup. When the SQLite index is created for a
+    database that already holds rows, it is rebuilt from the source tables.
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            existing = conn.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE name IN ('tickets_fts', 'messages_fts')"
+            )).scalar()
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if existing < 2:
+                _rebuild_sqlite(conn)
+        elif dialect == "postgresql":
+            for statement in POSTGRES_DDL:
+                conn.execute(text(statement))
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    """Rebuild the SQLite FTS5 tables from `tickets` and `messages`."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        _rebuild_sqlite(conn)
+
+
+def _rebuild_sqlite(conn) -> None:
+    conn.execute(text("INSERT INTO tickets_fts(tickets_fts) VALUES ('rebuild')"))
+    conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+
+
+def _fts5_query(query: str) -> str:
+    """Turn free text into a safe FTS5 expression: quoted terms, prefix on the last."""
+    terms = re.findall(r"\w+", query, flags=re.UNICODE)
+    if not terms:
+        return ""
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _access_filter(user: User, params: Dict) -> str:
+    """SQL predicate on alias `t` matching the visibility rules of list_tickets."""
+    if user.role == UserRole.CUSTOMER:
+        params["user_id"] = user.id
+        return "AND t.customer_id = :user_id"
+    if user.role == UserRole.AGENT:
+        params["user_id"] = user.id
+        return "AND (t.assigned_agent_id = :user_id OR t.assigned_agent_id IS NULL)"
+    return ""
+
+
+def search(
+    db: Session,
+    query: str,
+    user: User,
+    scope: str = "all",
+    limit: int = 20,
+    status: Optional[str] = None,
+) -> List[Dict]:
+    """Search ticket titles/descriptions and message content.
+
+    Args:
+        db: Database session
+        query: Free-text query from the user
+        user: The current user, used for role-based filtering
+        scope: "tickets", "messages" or "all"
+        limit: Maximum number of hits per scope
+        status: Optional ticket status filter
+
+    Returns:
+        Hits ordered by relevance, each with an HTML-escaped snippet in
+        which matches are wrapped in HIGHLIGHT_START / HIGHLIGHT_END
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        search_scope = _search_sqlite
+    elif dialect == "postgresql":
+        search_scope = _search_postgres
+    else:
+        # No full-text index on other databases; scan with LIKE instead
+        search_scope = _search_like
+
+    hits = []
+    if scope in ("tickets", "all"):
+        hits.extend(search_scope(db, "ticket", query, user, limit, status))
+    if scope in ("messages", "all"):
+        hits.extend(search_scope(db, "message", query, user, limit, status))
+
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits[:limit]
+
+
+def _escape_snippet(snippet: Optional[str]) -> str:
+    """HTML-escape a database snippet, then turn its match sentinels into markers."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+
+def _search_sqlite(db, kind, query, user, limit, status):
+    match = _fts5_query(query)
+    if not match:
+        return []
+
+    params = {"match": match, "limit": limit}
+    access = _access_filter(user, params)
+    if status:
+        params["status"] = status
+        access += " AND t.status = :status"
+
+    # ORDER BY the FTS5 rank column lets SQLite stop after `limit` hits
+    if kind == "ticket":
+        sql = f"""
+            SELECT t.id AS ticket_id, NULL AS message_id,
+                   snippet(tickets_fts, -1, :hl_start, :hl_end, '...', 16) AS snippet,
+                   tickets_fts.rank AS rank
+            FROM tickets_fts
+            JOIN tickets t ON t.id = tickets_fts.rowid
+            WHERE tickets_fts MATCH :match {access}
+            ORDER BY tickets_fts.rank
+            LIMIT :limit
+        """
+    else:
+        sql = f"""
+            SELECT t.id AS ticket_id, messages_fts.rowid AS message_id,
+                   snippet(messages_fts, 0, :hl_start, :hl_end, '...', 16) AS snippet,
+                   messages_fts.rank AS rank
+            FROM messages_fts
+            JOIN tickets t ON t.id = messages_fts.ticket_id
+            WHERE messages_fts MATCH :match {access}
+            ORDER BY messages_fts.rank
+            LIMIT :limit
+        """
+    params.update(hl_start=_MATCH_START, hl_end=_MATCH_END)
+    rows = db.execute(text(sql), params).mappings().all()
+    # bm25 is lower-is-better and negative; expose a higher-is-better score
+    return [
+        {
+            "kind": kind,
+            "ticket_id": row["ticket_id"],
+            "message_id": row["message_id"],
+            "snippet": _escape_snippet(row["snippet"]),
+            "score": -float(row["rank"]),
+        }
+        for row in rows
+    ]
+
+
+def _search_postgres(db, kind, query, user, limit, status):
+    params = {"query": query, "limit": limit}
+    access = _access_filter(user, params)
+    if status:
+        params["status"] = status
+        access += " AND t.status = :status"
+    headline_opts = f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxFragments=2"
+    params["opts"] = headline_opts
+
+    # Rank and limit first so ts_headline only runs on the returned rows
+    if kind == "ticket":
+        sql = f"""
+            SELECT hit.ticket_id, NULL AS message_id, hit.rank,
+                   ts_headline('english', coalesce(hit.title, '') || ' ' || coalesce(hit.description, ''),
+                               hit.q, :opts) AS snippet
+            FROM (
+                SELECT t.id AS ticket_id, t.title, t.description, q,
+                       ts_rank_cd(t.search_vector, q) AS rank
+                FROM tickets t, websearch_to_tsquery('english', :query) q
+                WHERE t.search_vector @@ q {access}
+                ORDER BY rank DESC
+                LIMIT :limit
+            ) hit
+        """
+    else:
+        sql = f"""
+            SELECT hit.ticket_id, hit.message_id, hit.rank,
+                   ts_headline('english', hit.content, hit.q, :opts) AS snippet
+            FROM (
+                SELECT t.id AS ticket_id, m.id AS message_id, m.content, q,
+                       ts_rank_cd(m.search_vector, q) AS rank
+                FROM messages m
+                JOIN tickets t ON t.id = m.ticket_id,
+                     websearch_to_tsquery('english', :query) q
+                WHERE m.search_vector @@ q {access}
+                ORDER BY rank DESC
+                LIMIT :limit
+            ) hit
+        """
+    rows = db.execute(text(sql), params).mappings().all()
+    return [
+        {
+            "kind": kind,
+            "ticket_id": row["ticket_id"],
+            "message_id": row["message_id"],
+            "snippet": _escape_snippet(row["snippet"]),
+            "score": float(row["rank"]),
+        }
+        for row in rows
+    ]
+
+
+def _highlight(content: str, terms: List[str], width: int = 80) -> str:
+    """A window of `content` around the first matched term, with terms marked."""
+    pattern = re.compile("|".join(re.escape(term) for term in terms), flags=re.IGNORECASE)
+    first = pattern.search(content)
+    start = max(0, first.start() - width // 2) if first else 0
+    window = content[start:start + width]
+    snippet = pattern.sub(lambda m: f"{_MATCH_START}{m.group(0)}{_MATCH_END}", window)
+    if start > 0:
+        snippet = "..." + snippet
+    if start + width < len(content):
+        snippet += "..."
+    return _escape_snippet(snippet)
+
+
+def _search_like(db, kind, query, user, limit, status):
+    """Unindexed fallback: newest rows containing any term, ranked by terms matched."""
+    # Underscores are LIKE wildcards, so terms are letters and digits only
+    terms = [term.lower() for term in re.findall(r"[^\W_]+", query, flags=re.UNICODE)]
+    if not terms:
+        return []
+
+    params = {"limit": limit}
+    access = _access_filter(user, params)
+    if status:
+        params["status"] = status
+        access += " AND t.status = :status"
+
+    columns = ["t.title", "t.description"] if kind == "ticket" else ["m.content"]
+    matches = []
+    for i, term in enumerate(terms):
+        params[f"term{i}"] = f"%{term}%"
+        matches.extend(f"lower(coalesce({column}, '')) LIKE :term{i}" for column in columns)
+    where = " OR ".join(matches)
+
+    if kind == "ticket":
+        sql = f"""
+            SELECT t.id AS ticket_id, NULL AS message_id, t.title, t.description
+            FROM tickets t
+            WHERE ({where}) {access}
+            ORDER BY t.id DESC
+            LIMIT :limit
+        """
+    else:
+        sql = f"""
+            SELECT t.id AS ticket_id, m.id AS message_id, m.content
+            FROM messages m
+            JOIN tickets t ON t.id = m.ticket_id
+            WHERE ({where}) {access}
+            ORDER BY m.id DESC
+            LIMIT :limit
+        """
+    rows = db.execute(text(sql), params).mappings().all()
+    hits = []
+    for row in rows:
+        if kind == "ticket":
+            content = f"{row['title'] or ''} {row['description'] or ''}"
+        else:
+            content = row["content"] or ""
+        lowered = content.lower()
+        hits.append({
+            "kind": kind,
+            "ticket_id": row["ticket_id"],
+            "message_id": row["message_id"],
+            "snippet": _highlight(content, terms),
+            "score": float(sum(1 for term in set(terms) if term in lowered)),
+        })
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits
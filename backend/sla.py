@@ -0,0 +1,400 @@
+import calendar
+import heapq
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case
+
+import assignment
+import leases
+import ticket_summary
+from config import settings
+from database import SessionLocal
+from metrics import SLA_BREACHES, SLA_ESCALATION_LAG, SLA_LEADER, SLA_PENDING
+from models import Ticket, User
+
+LEASE_NAME = "sla_escalation"
+
+# Each priority escalates one step when its deadline passes
+ESCALATION = {"low": "medium", "medium": "high", "high": "urgent"}
+
+
+def _value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def _epoch(moment: datetime) -> float:
+    # Deadlines are naive UTC, like datetime.utcnow()
+    return calendar.timegm(moment.utctimetuple())
+
+
+def parse_targets(spec: str) -> Dict[str, timedelta]:
+    """Parse minutes per priority, e.g. "urgent=60,high=240"."""
+    targets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            priority, minutes = item.split("=", 1)
+            targets[priority.strip()] = timedelta(minutes=float(minutes))
+    return targets
+
+
+# Open tickets must get a response, in-progress tickets a resolution, within these targets
+TARGETS = {
+    "open": parse_targets(settings.SLA_RESPONSE_MINUTES),
+    "in_progress": parse_targets(settings.SLA_RESOLUTION_MINUTES),
+}
+
+
+def due_at(status, priority, start: datetime) -> Optional[datetime]:
+    """Deadline of a ticket entering `status` at `start`; None if the status has no target."""
+    target = TARGETS.get(_value(status), {}).get(_value(priority))
+    return start + target if target is not None else None
+
+
+def due_expression(status, start: datetime):
+    """SQL value of due_at() for bulk UPDATEs, chosen by each row's priority."""
+    targets = TARGETS.get(_value(status))
+    if not targets:
+        return None
+    return case(
+        {priority: start + target for priority, target in targets.items()},
+        value=Ticket.priority,
+        else_=None
+    )
+
+
+def refresh_deadline(ticket, before_status, before_priority, now: Optional[datetime] = None) -> None:
+    """Update ticket.sla_due_at after an API change, before the commit.
+
+    A new status starts a new target from now. A priority change keeps the
+    original start and only swaps the target length.
+    """
+    now = now or datetime.utcnow()
+    status, priority = _value(ticket.status), _value(ticket.priority)
+    if status not in TARGETS:
+        ticket.sla_due_at = None
+    elif status != _value(before_status):
+        ticket.sla_due_at = due_at(status, priority, now)
+    elif priority != _value(before_priority):
+        old_target = TARGETS[status].get(_value(before_priority))
+        new_target = TARGETS[status].get(priority)
+        if ticket.sla_due_at is None or old_target is None or new_target is None:
+            ticket.sla_due_at = due_at(status, priority, now)
+        else:
+            ticket.sla_due_at = ticket.sla_due_at - old_target + new_target
+
+
+def send_breach_email(to: str, subject: str, body: str) -> None:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=10) as smtp:
+        smtp.starttls()
+        if settings.SMTP_USERNAME:
+            smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        smtp.send_message(message)
+
+
+class SLAWorker:
+    """Escalates open and in-progress tickets whose SLA deadline has passed.
+
+    Deadlines live in Ticket.sla_due_at. The worker keeps the ones due within
+    `horizon_seconds` in a min-heap and sleeps until the earliest, so it never
+    polls the tickets table; the heap is refilled from an indexed range query
+    every `refresh_seconds`, and API changes in this process are pushed in
+    through schedule(); deadlines set by other processes are picked up at the
+    next refresh. Stale heap entries are skipped lazily.
+
+    Every process may run a worker, but only the holder of a database lease
+    escalates. Each escalation is a compare-and-set on sla_due_at, so a stale
+    heap or a lease handover never escalates a ticket twice.
+    """
+
+    def __init__(self, action: str = "both", lease_seconds: float = 30.0,
+                 horizon_seconds: float = 86400.0, refresh_seconds: float = 30.0,
+                 batch_size: int = 200):
+        self.action = action
+        self.lease_seconds = lease_seconds
+        self.horizon_seconds = horizon_seconds
+        self.refresh_seconds = refresh_seconds
+        self.batch_size = batch_size
+        self.holder = leases.holder_id()
+        self.is_leader = False
+        self._heap: List[Tuple[float, int]] = []
+        # ticket id -> deadline the heap entry must match to be current
+        self._due: Dict[int, float] = {}
+        # Tickets scheduled while a refresh query runs; their in-memory deadline is newer
+        self._touched: Set[int] = set()
+        self._refreshing = False
+        self._loaded_until = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._due)
+
+    def schedule(self, ticket_id: int, due: Optional[datetime]) -> None:
+        """Track a ticket's new deadline (None stops tracking it)."""
+        with self._lock:
+            if self._refreshing:
+                self._touched.add(ticket_id)
+            epoch = _epoch(due) if due is not None else None
+            if epoch is None or epoch > self._loaded_until:
+                # Past the horizon the next refresh picks it up
+                self._due.pop(ticket_id, None)
+            else:
+                self._due[ticket_id] = epoch
+                heapq.heappush(self._heap, (epoch, ticket_id))
+                if self._heap[0] == (epoch, ticket_id):
+                    self._wake.set()
+            SLA_PENDING.set(len(self._due))
+
+    def refresh(self) -> None:
+        """Reload deadlines due within the horizon (an index range scan on sla_due_at)."""
+        until = time.time() + self.horizon_seconds
+        with self._lock:
+            self._refreshing = True
+        db = SessionLocal()
+        try:
+            rows = db.query(Ticket.id, Ticket.sla_due_at).filter(
+                Ticket.sla_due_at.isnot(None),
+                Ticket.sla_due_at <= datetime.utcfromtimestamp(until)
+            ).all()
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+                self._touched = set()
+            raise
+        finally:
+            db.close()
+
+        due = {row.id: _epoch(row.sla_due_at) for row in rows}
+        with self._lock:
+            # Changes scheduled while the query ran are newer than its result
+            for ticket_id in self._touched:
+                if ticket_id in self._due:
+                    due[ticket_id] = self._due[ticket_id]
+                else:
+                    due.pop(ticket_id, None)
+            self._touched = set()
+            self._refreshing = False
+            self._due = due
+            self._heap = [(epoch, ticket_id) for ticket_id, epoch in due.items()]
+            heapq.heapify(self._heap)
+            self._loaded_until = until
+            SLA_PENDING.set(len(self._due))
+
+    def _take_due(self, now: float) -> List[Tuple[int, float]]:
+        taken = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(taken) < self.batch_size:
+                epoch, ticket_id = heapq.heappop(self._heap)
+                if self._due.get(ticket_id) == epoch:
+                    del self._due[ticket_id]
+                    taken.append((ticket_id, epoch))
+            SLA_PENDING.set(len(self._due))
+        return taken
+
+    def escalate_due(self, now: Optional[float] = None) -> int:
+        """Handle one batch of passed deadlines; returns how many tickets breached."""
+        now = now if now is not None else time.time()
+        taken = self._take_due(now)
+        if not taken:
+            return 0
+
+        expected = dict(taken)
+        now_dt = datetime.utcfromtimestamp(now)
+        breaches = []
+        reschedule = []
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                Ticket.id, Ticket.title, Ticket.status, Ticket.priority,
+                Ticket.escalated_from, Ticket.assigned_agent_id, Ticket.sla_due_at
+            ).filter(
+                Ticket.id.in_(list(expected)),
+                Ticket.status.in_(list(TARGETS))
+            ).all()
+            agent_ids = set()
+            moves = []
+            for row in rows:
+                if row.sla_due_at is None:
+                    continue
+                if row.sla_due_at > now_dt:
+                    # Moved by another process since this heap entry was made
+                    reschedule.append((row.id, row.sla_due_at))
+                    continue
+                status, priority = _value(row.status), _value(row.priority)
+                escalated = ESCALATION.get(priority) if self.action in ("escalate", "both") else None
+                new_priority = escalated or priority
+                # Once nothing is left to escalate, stop tracking until the ticket changes
+                new_due = due_at(status, new_priority, now_dt) if escalated else None
+                values = {"priority": new_priority, "sla_due_at": new_due, "updated_at": now_dt}
+                if escalated:
+                    # Keep the priority the ticket had before any escalation
+                    values["escalated_from"] = row.escalated_from or priority
+                updated = db.query(Ticket).filter(
+                    Ticket.id == row.id,
+                    Ticket.sla_due_at == row.sla_due_at
+                ).update(values, synchronize_session=False)
+                if not updated:
+                    continue
+                if escalated:
+                    moves.append((
+                        ticket_summary.summary_key(status, priority, row.assigned_agent_id),
+                        ticket_summary.summary_key(status, new_priority, row.assigned_agent_id),
+                        1
+                    ))
+                if row.assigned_agent_id:
+                    agent_ids.add(row.assigned_agent_id)
+                breaches.append((row, status, escalated, new_due))
+            ticket_summary.record_moves(db, moves)
+            emails = {}
+            if agent_ids and self.action in ("notify", "both"):
+                emails = dict(db.query(User.id, User.email).filter(User.id.in_(agent_ids)).all())
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[-] SLA escalation failed, will retry: {e}")
+            retry_at = datetime.utcfromtimestamp(now + self.lease_seconds / 3)
+            for ticket_id, epoch in taken:
+                self.schedule(ticket_id, retry_at)
+            return 0
+        finally:
+            db.close()
+
+        for ticket_id, due in reschedule:
+            self.schedule(ticket_id, due)
+        assignment.record_moves(moves)
+        for row, status, escalated, new_due in breaches:
+            kind = "response" if status == "open" else "resolution"
+            SLA_BREACHES.labels(kind, "escalated" if escalated else "notified").inc()
+            SLA_ESCALATION_LAG.observe(max(0.0, now - expected[row.id]))
+            self.schedule(row.id, new_due)
+            if self.action in ("notify", "both"):
+                self._notify(row, kind, escalated, emails.get(row.assigned_agent_id))
+        return len(breaches)
+
+    def _notify(self, row, kind: str, escalated: Optional[str], email: Optional[str]) -> None:
+        change = f"; priority raised to {escalated}" if escalated else ""
+        print(f"[-] SLA {kind} target missed on ticket #{row.id} '{row.title}'{change}")
+        if not (email and settings.SMTP_SERVER and settings.EMAIL_FROM):
+            return
+        try:
+            send_breach_email(
+                email,
+                f"SLA {kind} target missed: ticket #{row.id}",
+                f"Ticket #{row.id} '{row.title}' missed its {kind} target{change}.",
+            )
+        except Exception as e:
+            print(f"[-] SLA notification email failed: {e}")
+
+    def _renew_lease(self) -> bool:
+        db = SessionLocal()
+        try:
+            leader = leases.acquire(db, LEASE_NAME, self.holder, self.lease_seconds)
+        except Exception as e:
+            print(f"[-] SLA lease check failed: {e}")
+            leader = False
+        finally:
+            db.close()
+        if leader != self.is_leader:
+            print(f"[*] SLA worker {self.holder} {'took' if leader else 'lost'} the escalation lease")
+        self.is_leader = leader
+        SLA_LEADER.set(1 if leader else 0)
+        return leader
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="sla-escalation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.is_leader:
+            db = SessionLocal()
+            try:
+                leases.release(db, LEASE_NAME, self.holder)
+            finally:
+                db.close()
+            self.is_leader = False
+            SLA_LEADER.set(0)
+
+    def _run(self) -> None:
+        next_lease = next_refresh = 0.0
+        while not self._stopped.is_set():
+            try:
+                now = time.time()
+                if now >= next_lease:
+                    was_leader = self.is_leader
+                    # Renew well before expiry so a live leader never lapses
+                    next_lease = now + self.lease_seconds / 3
+                    if self._renew_lease() and not was_leader:
+                        next_refresh = now
+                if self.is_leader:
+                    if now >= next_refresh:
+                        self.refresh()
+                        next_refresh = now + self.refresh_seconds
+                    while self.escalate_due() >= self.batch_size:
+                        pass
+            except Exception as e:
+                print(f"[-] SLA worker loop error: {e}")
+
+            wake_at = min(next_lease, next_refresh) if self.is_leader else next_lease
+            with self._lock:
+                if self.is_leader and self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+            self._wake.wait(max(0.0, wake_at - time.time()))
+            self._wake.clear()
+
+
+_worker: Optional[SLAWorker] = None
+
+
+def start_worker() -> Optional[SLAWorker]:
+    """Start this process's SLA worker (it escalates only while holding the lease)."""
+    global _worker
+    if not settings.SLA_ENABLED:
+        return None
+    if _worker is None:
+        _worker = SLAWorker(
+            action=settings.SLA_BREACH_ACTION,
+            lease_seconds=settings.SLA_LEASE_SECONDS,
+            horizon_seconds=settings.SLA_HORIZON_HOURS * 3600,
+            refresh_seconds=settings.SLA_REFRESH_SECONDS,
+        )
+        _worker.start()
+    return _worker
+
+
+def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+def schedule(ticket_id: int, due: Optional[datetime]) -> None:
+    """Tell a running worker about a deadline set by the API."""
+    if _worker is not None:
+        _worker.schedule(ticket_id, due)
+
+
+def unschedule(ticket_ids: Iterable[int]) -> None:
+    if _worker is not None:
+        for ticket_id in ticket_ids:
+            _worker.schedule(ticket_id, None)
@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import settings
+from kb_store import get_knowledge_base
+from metrics import RAG_RESIDENT_BYTES, RAG_TENANT_EVICTIONS, record_cache
+
+
+class TenantIndexManager:
+    """Keeps per-tenant RAGEngines in memory under a byte budget.
+
+    Each tenant's flat index is persisted to `index_dir/<tenant>/<kb version>.faiss`
+    the first time it is built. A tenant that is not resident is loaded lazily
+    from that file (no re-embedding), and the least recently used tenants are
+    evicted once resident indexes exceed `memory_budget_bytes`. The embedding
+    model is loaded once and shared by all tenants.
+    """
+
+    def __init__(self, index_dir: str, memory_budget_bytes: int, model=None,
+                 model_name: str = "all-MiniLM-L6-v2", reranker=None,
+                 max_filtered_partitions: int = 32):
+        self.index_dir = index_dir
+        self.reranker = reranker
+        self.max_filtered_partitions = max_filtered_partitions
+        self.memory_budget_bytes = memory_budget_bytes
+        self.model_name = model_name
+        self._model = model
+        self._resident: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # One loader lock per tenant so a cold tenant is only loaded once
+        self._loading: Dict[str, threading.Lock] = {}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def resident_tenants(self) -> List[str]:
+        """Resident tenants, least recently used first."""
+        return list(self._resident)
+
+    def _index_path(self, tenant: str, version: str) -> str:
+        return os.path.join(self.index_dir, tenant, f"{version}.faiss")
+
+    def get(self, tenant: str):
+        """The tenant's RAGEngine, loading it if needed. Blocking; call from a worker thread.
+
+        Raises UnknownTenant if the tenant has no knowledge base.
+        """
+        kb = get_knowledge_base(tenant)
+        with self._lock:
+            engine = self._resident.get(tenant)
+            if engine is not None and engine.kb.version == kb.version:
+                self._resident.move_to_end(tenant)
+                record_cache("rag_tenant_index", True)
+                return engine
+            loader = self._loading.setdefault(tenant, threading.Lock())
+
+        with loader:
+            # Another thread may have finished the load while we waited
+            with self._lock:
+                engine = self._resident.get(tenant)
+                if engine is not None and engine.kb.version == kb.version:
+                    self._resident.move_to_end(tenant)
+                    return engine
+            record_cache("rag_tenant_index", False)
+            engine = self._load(tenant, kb)
+            with self._lock:
+                self._resident[tenant] = engine
+                self._resident.move_to_end(tenant)
+                self._sizes[tenant] = engine.memory_bytes()
+                self._evict(keep=tenant)
+            return engine
+
+    def _load(self, tenant: str, kb):
+        import faiss
+        from rag_engine import RAGEngine
+
+        path = self._index_path(tenant, kb.version)
+        if os.path.exists(path):
+            return RAGEngine(kb=kb, model=self.model, index=faiss.read_index(path), reranker=self.reranker,
+                             max_filtered_partitions=self.max_filtered_partitions)
+
+        engine = RAGEngine(kb=kb, model=self.model, reranker=self.reranker,
+                           max_filtered_partitions=self.max_filtered_partitions)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        engine.save_index(path)
+        # Indexes of older knowledge base versions are never read again
+        for name in os.listdir(os.path.dirname(path)):
+            if name.endswith(".faiss") and name != os.path.basename(path):
+                os.remove(os.path.join(os.path.dirname(path), name))
+        return engine
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used tenants until under budget (caller holds the lock)."""
+        while self.resident_bytes > self.memory_budget_bytes and len(self._resident) > 1:
+            tenant = next(iter(self._resident))
+            if tenant == keep:
+                break
+            del self._resident[tenant]
+            del self._sizes[tenant]
+            RAG_TENANT_EVICTIONS.inc()
+            print(f"[*] Evicted FAQ index of tenant '{tenant}' from memory")
+        RAG_RESIDENT_BYTES.set(self.resident_bytes)
+
+    def evict(self, tenant: str) -> bool:
+        """Drop a tenant's index from memory (it reloads from disk on next use)."""
+        with self._lock:
+            if tenant not in self._resident:
+                return False
+            del self._resident[tenant]
+            del self._sizes[tenant]
+            RAG_RESIDENT_BYTES.set(self.resident_bytes)
+            return True
+
+
+_manager: Optional[TenantIndexManager] = None
+
+
+def get_index_manager() -> TenantIndexManager:
+    """The process-wide manager configured from settings."""
+    global _manager
+    if _manager is None:
+        reranker = None
+        if settings.RAG_RERANK_ENABLED:
+            from reranker import CrossEncoderReranker
+            reranker = CrossEncoderReranker(
+                model_name=settings.RAG_RERANK_MODEL,
+                candidates=settings.RAG_RERANK_CANDIDATES,
+                budget_ms=settings.RAG_RERANK_BUDGET_MS,
+            )
+        _manager = TenantIndexManager(
+            index_dir=settings.RAG_INDEX_DIR,
+            memory_budget_bytes=settings.RAG_MEMORY_BUDGET_MB * 1024 * 1024,
+            reranker=reranker,
+            max_filtered_partitions=settings.RAG_MAX_FILTERED_PARTITIONS,
+        )
+    return _manager
@@ -0,0 +1,370 @@
+"""
+Priority and topic classifier for new tickets.
+
+Two softmax-regression heads over the SentenceTransformer embedding already
+used for FAQ retrieval and duplicate detection. Prediction is one small
+matrix-vector product per head, so it adds well under a millisecond on top
+of the embedding the ticket needs anyway.
+
+Training reads title, description and human-set labels from the tickets
+table. The priority label is the one an agent or admin last set by hand,
+else the customer's own pick; the effective `priority` column is never used,
+since classifier overrides and SLA escalation rewrite it. Likewise the topic
+label is only `reviewed_topic`, never `topic`, which this classifier and the
+knowledge-base topic match write; until agents have set at least two
+different topics there is no topic head. Tickets whose
+id hashes into the holdout share are kept out of training and used for the
+accuracy report.
+
+Usage (from backend/):
+    python ticket_classifier.py train [--output classifiers/ticket_classifier.npz] [--holdout 0.2] [--reviewed-only]
+    python ticket_classifier.py report [--model classifiers/ticket_classifier.npz] [--json report.json]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from config import settings
+from metrics import time_stage
+from models import Ticket
+from ticket_dedup import ticket_text
+
+def embed(encoder, texts: Sequence[str], batch_size: int = 256) -> np.ndarray:
+    """Unit-length float32 embeddings, the same features ticket_dedup uses."""
+    vectors = np.asarray(
+        encoder.encode(list(texts), batch_size=batch_size, convert_to_tensor=False), dtype='float32'
+    )
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SoftmaxHead:
+    """Multinomial logistic regression on fixed embeddings."""
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = tuple(labels)
+        self.weights = weights.astype('float32')
+        self.bias = bias.astype('float32')
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, targets: Sequence[str], epochs: int = 300,
+            learning_rate: float = 1.0, l2: float = 1e-4) -> "SoftmaxHead":
+        """Full-batch gradient descent with class-balanced sample weights."""
+        labels = sorted(set(targets))
+        index = {label: position for position, label in enumerate(labels)}
+        y = np.array([index[target] for target in targets])
+        n, dimension = vectors.shape
+        classes = len(labels)
+
+        onehot = np.zeros((n, classes), dtype='float32')
+        onehot[np.arange(n), y] = 1.0
+        # Rare priorities (urgent) matter most, so weight classes equally
+        counts = np.bincount(y, minlength=classes)
+        sample_weights = (n / (classes * counts))[y][:, None] / n
+
+        weights = np.zeros((dimension, classes), dtype='float32')
+        bias = np.zeros(classes, dtype='float32')
+        for _ in range(epochs):
+            logits = vectors @ weights + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            gradient = (probabilities - onehot) * sample_weights
+            weights -= learning_rate * (vectors.T @ gradient + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+        return cls(labels, weights, bias)
+
+    def probabilities(self, vectors: np.ndarray) -> np.ndarray:
+        logits = vectors @ self.weights + self.bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=-1, keepdims=True)
+
+    def predict(self, vector: np.ndarray) -> Tuple[str, float]:
+        probabilities = self.probabilities(vector)
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    def predict_many(self, vectors: np.ndarray) -> List[str]:
+        return [self.labels[i] for i in np.argmax(self.probabilities(vectors), axis=1)]
+
+
+class Prediction:
+    __slots__ = ("priority", "priority_confidence", "topic", "topic_confidence")
+
+    def __init__(self, priority: Optional[str], priority_confidence: float,
+                 topic: Optional[str], topic_confidence: float):
+        self.priority = priority
+        self.priority_confidence = priority_confidence
+        self.topic = topic
+        self.topic_confidence = topic_confidence
+
+
+class TicketClassifier:
+    """Priority and (optional) topic heads plus the metadata needed to reuse them safely."""
+
+    def __init__(self, model_name: str, priority_head: SoftmaxHead,
+                 topic_head: Optional[SoftmaxHead] = None, meta: Optional[Dict] = None,
+                 encoder=None):
+        self.model_name = model_name
+        self.priority_head = priority_head
+        self.topic_head = topic_head
+        self.meta = meta or {}
+        self.encoder = encoder
+
+    def embed(self, text: str) -> np.ndarray:
+        return embed(self.encoder, [text])[0]
+
+    def predict(self, vector: np.ndarray) -> Prediction:
+        """Classify a unit-length ticket embedding."""
+        with time_stage("tickets", "classify"):
+            priority, priority_confidence = self.priority_head.predict(vector)
+            topic, topic_confidence = None, 0.0
+            if self.topic_head is not None:
+                topic, topic_confidence = self.topic_head.predict(vector)
+        return Prediction(priority, priority_confidence, topic, topic_confidence)
+
+    def save(self, path: str) -> None:
+        arrays = {
+            "priority_weights": self.priority_head.weights,
+            "priority_bias": self.priority_head.bias,
+        }
+        header = {
+            "model_name": self.model_name,
+            "priority_labels": list(self.priority_head.labels),
+            "topic_labels": None,
+            "meta": self.meta,
+        }
+        if self.topic_head is not None:
+            arrays["topic_weights"] = self.topic_head.weights
+            arrays["topic_bias"] = self.topic_head.bias
+            header["topic_labels"] = list(self.topic_head.labels)
+        with open(path, "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)), **arrays)
+
+    @classmethod
+    def load(cls, path: str, encoder=None) -> "TicketClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            priority_head = SoftmaxHead(header["priority_labels"], data["priority_weights"], data["priority_bias"])
+            topic_head = None
+            if header["topic_labels"]:
+                topic_head = SoftmaxHead(header["topic_labels"], data["topic_weights"], data["topic_bias"])
+        return cls(header["model_name"], priority_head, topic_head, header["meta"], encoder)
+
+
+def in_holdout(ticket_id: int, holdout: float) -> bool:
+    """Deterministic split by ticket id, so train and report agree without storing it."""
+    return ((ticket_id * 2654435761) % 2 ** 32) / 2 ** 32 < holdout
+
+
+def load_tickets(db, reviewed_only: bool = False) -> List[Tuple[int, str, str, Optional[str]]]:
+    """(id, text, priority label, topic label) of tickets with a human-set priority, read in id order."""
+    label = Ticket.reviewed_priority
+    if not reviewed_only:
+        label = func.coalesce(Ticket.reviewed_priority, Ticket.requested_priority)
+    query = db.query(
+        Ticket.id, Ticket.title, Ticket.description, label.label("label"), Ticket.reviewed_topic
+    ).filter(label.isnot(None))
+    return [
+        (row.id, ticket_text(row.title, row.description), row.label, row.reviewed_topic)
+        for row in query.order_by(Ticket.id).yield_per(5000)
+    ]
+
+
+def train(vectors: np.ndarray, priorities: Sequence[str], topics: Sequence[Optional[str]],
+          model_name: str, epochs: int = 300) -> TicketClassifier:
+    if len(set(priorities)) < 2:
+        raise ValueError("Need tickets with at least two different priorities to train")
+    priority_head = SoftmaxHead.fit(vectors, priorities, epochs=epochs)
+
+    topic_head = None
+    labelled = [position for position, topic in enumerate(topics) if topic]
+    if len({topics[position] for position in labelled}) >= 2:
+        topic_head = SoftmaxHead.fit(vectors[labelled], [topics[position] for position in labelled], epochs=epochs)
+
+    return TicketClassifier(model_name, priority_head, topic_head, meta={
+        "trained_at": datetime.utcnow().isoformat(),
+        "priority_samples": len(priorities),
+        "topic_samples": len(labelled),
+    })
+
+
+def head_report(head: SoftmaxHead, vectors: np.ndarray, targets: Sequence[str]) -> Dict:
+    """Accuracy, majority-class baseline, macro F1, per-class precision/recall and confusion counts."""
+    predicted = head.predict_many(vectors)
+    labels = sorted(set(head.labels) | set(targets))
+    confusion = {actual: {label: 0 for label in labels} for actual in labels}
+    for actual, guess in zip(targets, predicted):
+        confusion[actual][guess] += 1
+
+    per_class = {}
+    for label in labels:
+        true_positive = confusion[label][label]
+        predicted_count = sum(confusion[actual][label] for actual in labels)
+        support = sum(confusion[label].values())
+        precision = true_positive / predicted_count if predicted_count else 0.0
+        recall = true_positive / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[label] = {
+            "precision": round(precision, 4), "recall": round(recall, 4),
+            "f1": round(f1, 4), "support": support,
+        }
+
+    correct = sum(1 for actual, guess in zip(targets, predicted) if actual == guess)
+    majority = max((sum(1 for target in targets if target == label) for label in labels), default=0)
+    supported = [stats for stats in per_class.values() if stats["support"]]
+    return {
+        "samples": len(targets),
+        "accuracy": round(correct / len(targets), 4) if targets else None,
+        "majority_baseline": round(majority / len(targets), 4) if targets else None,
+        "macro_f1": round(sum(stats["f1"] for stats in supported) / len(supported), 4) if supported else None,
+        "per_class": per_class,
+        "confusion": confusion,
+    }
+
+
+def latency_report(classifier: TicketClassifier, vectors: np.ndarray, limit: int = 1000) -> Dict:
+    """Single-ticket prediction latency (heads only; the embedding is shared with ticket_dedup)."""
+    timings = []
+    for vector in vectors[:limit]:
+        started = time.perf_counter()
+        classifier.predict(vector)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    if not timings:
+        return {"count": 0}
+    return {
+        "count": len(timings),
+        "p50_ms": round(timings[len(timings) // 2], 4),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 4),
+        "max_ms": round(timings[-1], 4),
+    }
+
+
+def evaluate(classifier: TicketClassifier, vectors: np.ndarray, priorities: Sequence[str],
+             topics: Sequence[Optional[str]]) -> Dict:
+    report = {
+        "model": classifier.meta,
+        "priority": head_report(classifier.priority_head, vectors, priorities),
+        "topic": None,
+        "latency": latency_report(classifier, vectors),
+    }
+    labelled = [position for position, topic in enumerate(topics) if topic]
+    if classifier.topic_head is not None and labelled:
+        report["topic"] = head_report(
+            classifier.topic_head, vectors[labelled], [topics[position] for position in labelled]
+        )
+    return report
+
+
+_classifier: Optional[TicketClassifier] = None
+_classifier_loaded = False
+
+
+def get_classifier() -> Optional[TicketClassifier]:
+    """The trained classifier, or None when disabled, not trained yet or built for another encoder."""
+    global _classifier, _classifier_loaded
+    if not settings.TICKET_CLASSIFIER_ENABLED:
+        return None
+    if not _classifier_loaded:
+        _classifier_loaded = True
+        try:
+            from tenant_indexes import get_index_manager
+            manager = get_index_manager()
+            classifier = TicketClassifier.load(settings.TICKET_CLASSIFIER_PATH)
+            if classifier.model_name != manager.model_name:
+                print(f"[-] Ticket classifier was trained on {classifier.model_name}, "
+                      f"not {manager.model_name}; retrain it")
+                return None
+            classifier.encoder = manager.model
+            _classifier = classifier
+            print(f"[+] Ticket classifier loaded from {settings.TICKET_CLASSIFIER_PATH}")
+        except FileNotFoundError:
+            print("[*] No ticket classifier trained yet; using customer-picked priorities")
+        except Exception as e:
+            print(f"[-] Ticket classifier unavailable: {e}")
+    return _classifier
+
+
+def _print_head(name: str, report: Optional[Dict]) -> None:
+    if not report:
+        print(f"{name}: no labelled tickets")
+        return
+    print(
+        f"{name}: accuracy {report['accuracy']} (majority baseline {report['majority_baseline']}), "
+        f"macro F1 {report['macro_f1']}, {report['samples']} tickets"
+    )
+    for label, stats in report["per_class"].items():
+        print(f"  {label:<24} precision {stats['precision']:.3f}  recall {stats['recall']:.3f}  support {stats['support']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the ticket priority/topic classifier")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--output", default=settings.TICKET_CLASSIFIER_PATH, help="Where train writes the model")
+    parser.add_argument("--model", default=settings.TICKET_CLASSIFIER_PATH, help="Model report evaluates")
+    parser.add_argument("--holdout", type=float, default=None,
+                        help="Share of tickets kept for the report (default 0.2, or the model's own for report)")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--reviewed-only", action="store_true",
+                        help="Only learn from priorities agents set, not customers' picks")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    from tenant_indexes import get_index_manager
+
+    manager = get_index_manager()
+    classifier = None
+    if args.command == "report":
+        classifier = TicketClassifier.load(args.model, encoder=manager.model)
+    holdout_share = args.holdout
+    if holdout_share is None:
+        holdout_share = classifier.meta.get("holdout", 0.2) if classifier else 0.2
+
+    db = SessionLocal()
+    try:
+        tickets = load_tickets(db, reviewed_only=args.reviewed_only)
+    finally:
+        db.close()
+    print(f"--- {len(tickets)} labelled tickets ---")
+
+    started = time.perf_counter()
+    vectors = embed(manager.model, [text for _, text, _, _ in tickets]) if tickets else np.zeros((0, 0), dtype='float32')
+    print(f"[*] Embedded in {time.perf_counter() - started:.1f}s")
+
+    holdout = np.array([in_holdout(ticket_id, holdout_share) for ticket_id, _, _, _ in tickets], dtype=bool)
+    priorities = [priority for _, _, priority, _ in tickets]
+    topics = [topic for _, _, _, topic in tickets]
+
+    def subset(mask):
+        positions = np.flatnonzero(mask)
+        return vectors[positions], [priorities[i] for i in positions], [topics[i] for i in positions]
+
+    if args.command == "train":
+        train_vectors, train_priorities, train_topics = subset(~holdout)
+        classifier = train(train_vectors, train_priorities, train_topics, manager.model_name, epochs=args.epochs)
+        classifier.meta["holdout"] = holdout_share
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        classifier.save(args.output)
+        print(f"[SUCCESS] Trained on {len(train_priorities)} tickets, saved to {args.output}")
+
+    report = evaluate(classifier, *subset(holdout))
+    _print_head("Priority", report["priority"])
+    _print_head("Topic", report["topic"])
+    print(f"Prediction latency: {report['latency']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
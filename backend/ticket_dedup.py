@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import settings
+from metrics import record_cache, time_stage
+from models import Ticket
+
+# Tickets in these statuses are candidates for duplicate matches
+OPEN_STATUSES = ("open", "in_progress")
+
+
+def ticket_text(title: str, description: Optional[str]) -> str:
+    return f"{title}\n{description or ''}".strip()
+
+
+class DuplicateMatch:
+    __slots__ = ("ticket_id", "similarity")
+
+    def __init__(self, ticket_id: int, similarity: float):
+        self.ticket_id = ticket_id
+        self.similarity = similarity
+
+
+class _CustomerIndex:
+    """Normalized embeddings of one customer's open tickets.
+
+    A customer has a handful of open tickets, so a dense dot product over
+    them beats any ANN structure.
+    """
+
+    __slots__ = ("ticket_ids", "vectors", "built_at")
+
+    def __init__(self, ticket_ids: List[int], vectors: np.ndarray):
+        self.ticket_ids = ticket_ids
+        self.vectors = vectors
+        self.built_at = time.monotonic()
+
+    def add(self, ticket_id: int, vector: np.ndarray) -> None:
+        if ticket_id in self.ticket_ids:
+            return
+        self.ticket_ids.append(ticket_id)
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+
+    def remove(self, ticket_id: int) -> None:
+        if ticket_id in self.ticket_ids:
+            position = self.ticket_ids.index(ticket_id)
+            del self.ticket_ids[position]
+            self.vectors = np.delete(self.vectors, position, axis=0)
+
+    def best_match(self, vector: np.ndarray) -> Optional[DuplicateMatch]:
+        if not self.ticket_ids:
+            return None
+        similarities = self.vectors @ vector
+        best = int(np.argmax(similarities))
+        return DuplicateMatch(self.ticket_ids[best], float(similarities[best]))
+
+
+class DuplicateDetector:
+    """Per-customer vector indexes of open tickets, kept in step with ticket writes.
+
+    A customer's index is built from their open tickets the first time they
+    create a ticket (one indexed query, one batched embedding) and then
+    updated incrementally, so checks never scan the tickets table. Only the
+    most recently active `max_customers` indexes stay in memory. Each worker
+    process keeps its own indexes and only sees its own writes, so an index
+    is rebuilt once it is older than `max_age_seconds`; callers still
+    confirm a match is open before acting on it.
+    """
+
+    def __init__(self, encoder, threshold: float = 0.85, max_customers: int = 10000,
+                 max_age_seconds: float = 300.0):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_customers = max_customers
+        self.max_age_seconds = max_age_seconds
+        self._indexes: "OrderedDict[int, _CustomerIndex]" = OrderedDict()
+        # ticket id -> customer id, so status changes can drop tickets by id
+        self._owners: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.encoder.encode(texts, convert_to_tensor=False), dtype='float32')
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _index_for(self, db: Session, customer_id: int) -> _CustomerIndex:
+        with self._lock:
+            index = self._indexes.get(customer_id)
+            if index is not None:
+                if time.monotonic() - index.built_at <= self.max_age_seconds:
+                    self._indexes.move_to_end(customer_id)
+                    record_cache("ticket_dedup_customer", True)
+                    return index
+                # Other processes may have closed or opened tickets since
+                self._drop(customer_id)
+
+        record_cache("ticket_dedup_customer", False)
+        rows = db.query(Ticket.id, Ticket.title, Ticket.description).filter(
+            Ticket.customer_id == customer_id,
+            Ticket.status.in_(OPEN_STATUSES)
+        ).all()
+        if rows:
+            vectors = self.embed([ticket_text(row.title, row.description) for row in rows])
+        else:
+            vectors = np.zeros((0, 0), dtype='float32')
+        index = _CustomerIndex([row.id for row in rows], vectors)
+
+        with self._lock:
+            self._drop(customer_id)
+            self._indexes[customer_id] = index
+            for row in rows:
+                self._owners[row.id] = customer_id
+            while len(self._indexes) > self.max_customers:
+                self._drop(next(iter(self._indexes)))
+        return index
+
+    def _drop(self, customer_id: int) -> None:
+        index = self._indexes.pop(customer_id, None)
+        if index is not None:
+            for ticket_id in index.ticket_ids:
+                self._owners.pop(ticket_id, None)
+
+    def check(self, db: Session, customer_id: int, vector: np.ndarray) -> Optional[DuplicateMatch]:
+        """The customer's most similar open ticket if it clears the threshold."""
+        with time_stage("tickets", "duplicate_check"):
+            index = self._index_for(db, customer_id)
+            with self._lock:
+                match = index.best_match(vector)
+        if match is not None and match.similarity >= self.threshold:
+            return match
+        return None
+
+    def add(self, customer_id: int, ticket_id: int, vector: np.ndarray) -> None:
+        """Record a newly opened ticket (only if the customer's index is resident)."""
+        with self._lock:
+            index = self._indexes.get(customer_id)
+            if index is None:
+                return
+            if not index.ticket_ids:
+                index.vectors = np.zeros((0, vector.shape[0]), dtype='float32')
+            index.add(ticket_id, vector)
+            self._owners[ticket_id] = customer_id
+
+    def is_resident(self, customer_id: int) -> bool:
+        return customer_id in self._indexes
+
+    def discard(self, ticket_ids) -> None:
+        """Forget tickets that were closed, resolved or deleted."""
+        with self._lock:
+            for ticket_id in ticket_ids:
+                customer_id = self._owners.pop(ticket_id, None)
+                if customer_id is not None and customer_id in self._indexes:
+                    self._indexes[customer_id].remove(ticket_id)
+
+
+_detector: Optional[DuplicateDetector] = None
+_detector_failed = False
+
+
+def get_detector() -> Optional[DuplicateDetector]:
+    """The process-wide detector, or None when disabled or no encoder is available."""
+    global _detector, _detector_failed
+    if settings.DUPLICATE_TICKET_ACTION == "off" or _detector_failed:
+        return None
+    if _detector is None:
+        try:
+            # Share the embedding model already loaded for FAQ retrieval
+            from tenant_indexes import get_index_manager
+            encoder = get_index_manager().model
+        except Exception as e:
+            print(f"[-] Duplicate ticket detection unavailable: {e}")
+            _detector_failed = True
+            return None
+        _detector = DuplicateDetector(
+            encoder,
+            threshold=settings.DUPLICATE_TICKET_THRESHOLD,
+            max_customers=settings.DUPLICATE_TICKET_MAX_CUSTOMERS,
+            max_age_seconds=settings.DUPLICATE_TICKET_INDEX_TTL_SECONDS,
+        )
+    return _detector
+
+
+def discard_tickets(ticket_ids) -> None:
+    """Drop tickets that left the open statuses from the duplicate indexes."""
+    if _detector is not None:
+        _detector.discard(ticket_ids)
+
+
+def refresh_ticket(ticket: Ticket) -> None:
+    """Re-index an edited ticket, or drop it once it is no longer open."""
+    if _detector is None:
+        return
+    _detector.discard([ticket.id])
+    if ticket.status in OPEN_STATUSES and _detector.is_resident(ticket.customer_id):
+        vector = _detector.embed([ticket_text(ticket.title, ticket.description)])[0]
+        _detector.add(ticket.customer_id, ticket.id, vector)
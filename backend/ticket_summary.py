@@ -0,0 +1,127 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Ticket, TicketSummary
+
+# Agent id stored for tickets without an assigned agent
+UNASSIGNED = 0
+
+SummaryKey = Tuple[str, str, int]
+
+
+def _value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def summary_key(status, priority, agent_id: Optional[int]) -> SummaryKey:
+    """Normalize ticket attributes into a summary table key."""
+    return (_value(status), _value(priority), agent_id or UNASSIGNED)
+
+
+def ticket_key(ticket) -> SummaryKey:
+    """Summary table key for a ticket (ORM object or row)."""
+    return summary_key(ticket.status, ticket.priority, ticket.assigned_agent_id)
+
+
+def adjust(db: Session, key: SummaryKey, delta: int) -> None:
+    """Add `delta` to the count for `key` in the caller's transaction."""
+    if not delta:
+        return
+    status, priority, agent_id = key
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(TicketSummary).values(
+            status=status, priority=priority, agent_id=agent_id, ticket_count=delta
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["status", "priority", "agent_id"],
+            set_={"ticket_count": TicketSummary.ticket_count + delta},
+        )
+        db.execute(stmt)
+        return
+
+    updated = db.query(TicketSummary).filter(
+        TicketSummary.status == status,
+        TicketSummary.priority == priority,
+        TicketSummary.agent_id == agent_id,
+    ).update(
+        {TicketSummary.ticket_count: TicketSummary.ticket_count + delta},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.add(TicketSummary(
+            status=status, priority=priority, agent_id=agent_id, ticket_count=delta
+        ))
+        db.flush()
+
+
+def record_change(db: Session, before: SummaryKey, after: SummaryKey, count: int = 1) -> None:
+    """Move `count` tickets from one summary bucket to another."""
+    if before == after:
+        return
+    adjust(db, before, -count)
+    adjust(db, after, count)
+
+
+def record_moves(db: Session, moves: Iterable[Tuple[SummaryKey, SummaryKey, int]]) -> None:
+    """Apply several (before, after, count) moves, netting them per bucket first."""
+    deltas: Dict[SummaryKey, int] = {}
+    for before, after, count in moves:
+        if before == after:
+            continue
+        deltas[before] = deltas.get(before, 0) - count
+        deltas[after] = deltas.get(after, 0) + count
+    for key, delta in deltas.items():
+        adjust(db, key, delta)
+
+
+def rebuild(db: Session) -> None:
+    """Recompute the summary table from `tickets` with one grouped scan."""
+    db.query(TicketSummary).delete(synchronize_session=False)
+    rows = db.query(
+        Ticket.status,
+        Ticket.priority,
+        Ticket.assigned_agent_id,
+        func.count(Ticket.id),
+    ).group_by(
+        Ticket.status, Ticket.priority, Ticket.assigned_agent_id
+    ).all()
+
+    counts: Dict[SummaryKey, int] = {}
+    for status, priority, agent_id, count in rows:
+        key = summary_key(status, priority, agent_id)
+        counts[key] = counts.get(key, 0) + count
+    db.bulk_insert_mappings(TicketSummary, [
+        {"status": s, "priority": p, "agent_id": a, "ticket_count": c}
+        for (s, p, a), c in counts.items()
+    ])
+    db.commit()
+
+
+def get_summary(db: Session) -> Dict:
+    """Read dashboard aggregates; touches one row per (status, priority, agent)."""
+    by_status: Dict[str, int] = {}
+    by_priority: Dict[str, int] = {}
+    by_agent: Dict[str, int] = {}
+    total = 0
+
+    for row in db.query(TicketSummary).filter(TicketSummary.ticket_count != 0):
+        total += row.ticket_count
+        by_status[row.status] = by_status.get(row.status, 0) + row.ticket_count
+        by_priority[row.priority] = by_priority.get(row.priority, 0) + row.ticket_count
+        agent = "unassigned" if row.agent_id == UNASSIGNED else str(row.agent_id)
+        by_agent[agent] = by_agent.get(agent, 0) + row.ticket_count
+
+    return {
+        "total": total,
+        "by_status": by_status,
+        "by_priority": by_priority,
+        "by_agent": by_agent,
+    }
@@ -0,0 +1,266 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+# Longest SQL statement text stored on a span
+MAX_STATEMENT_LENGTH = 500
+
+
+class Span:
+    """A timed operation within a trace, modelled on OpenTelemetry spans."""
+
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "OK"
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """All spans sharing one root, plus per-trace SQL statement counts."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.statement_counts: Dict[str, int] = {}
+
+
+# Marks a context whose root span was not sampled, so children are skipped too
+_NOT_SAMPLED = object()
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class ConsoleExporter:
+    """Print each finished trace as an indented span tree."""
+
+    def export(self, trace: Trace) -> None:
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in trace.spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = [f"--- TRACE {trace.trace_id} ---"]
+
+        def walk(parent_id: Optional[str], depth: int):
+            for span in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+                detail = ""
+                if "db.statement" in span.attributes:
+                    detail = " " + span.attributes["db.statement"][:80]
+                lines.append(f"{'  ' * depth}{span.name} {span.duration_ms:.2f}ms{detail}")
+                walk(span.span_id, depth + 1)
+
+        walk(None, 0)
+        print("\n".join(lines))
+
+
+class FileExporter:
+    """Append finished spans to a JSONL file, one span per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        payload = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in trace.spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate: float = 1.0, n_plus_one_threshold: int = 5):
+        """
+        Args:
+            exporter: Object with export(trace); None disables tracing
+            sample_rate: Share of root spans (0-1) that are recorded
+            n_plus_one_threshold: Repeats of one SQL statement in a trace
+                that flag a likely N+1 query pattern
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, **attributes):
+        """Start a span as a child of the current one; returns (span, token).
+
+        Returns (None, None) when tracing is disabled or the trace is not
+        sampled. Pair every call with end_span.
+        """
+        if not self.enabled:
+            return None, None
+        parent = _current_span.get()
+        if parent is _NOT_SAMPLED:
+            return None, None
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return None, _current_span.set(_NOT_SAMPLED)
+            span = Span(name, Trace(), None, attributes)
+        else:
+            span = Span(name, parent.trace, parent.span_id, attributes)
+        span.trace.spans.append(span)
+        return span, _current_span.set(span)
+
+    def end_span(self, span: Optional[Span], token, error: Optional[BaseException] = None) -> None:
+        if token is not None:
+            _current_span.reset(token)
+        if span is None:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = "ERROR"
+            span.attributes["error"] = f"{type(error).__name__}: {error}"
+        if span.parent_id is None:
+            self._finish_trace(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Context manager wrapping a block in a span; yields the span or None."""
+        span, token = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, token, error=e)
+            raise
+        self.end_span(span, token)
+
+    def record_statement(self, statement: str) -> None:
+        span = _current_span.get()
+        if span is None or span is _NOT_SAMPLED:
+            return
+        counts = span.trace.statement_counts
+        counts[statement] = counts.get(statement, 0) + 1
+
+    def _finish_trace(self, root: Span) -> None:
+        trace = root.trace
+        repeated = [
+            {"statement": statement, "count": count}
+            for statement, count in trace.statement_counts.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        root.attributes["db.statement_count"] = sum(trace.statement_counts.values())
+        if repeated:
+            root.attributes["db.n_plus_one_suspects"] = repeated
+        self.exporter.export(trace)
+
+
+def _create_exporter():
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleExporter()
+    if settings.TRACING_EXPORTER == "file":
+        return FileExporter(settings.TRACING_FILE)
+    return None
+
+
+tracer = Tracer(
+    exporter=_create_exporter(),
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    n_plus_one_threshold=settings.TRACING_N_PLUS_ONE_THRESHOLD,
+)
+
+
+def span(name: str, **attributes):
+    """Shortcut for tracer.span on the process-wide tracer."""
+    return tracer.span(name, **attributes)
+
+
+def _statement_shape(statement: str) -> str:
+    # Collapse whitespace so the same query from different call sites matches
+    return re.sub(r"\s+", " ", statement).strip()[:MAX_STATEMENT_LENGTH]
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Open a span around every SQL statement executed through `engine`."""
+    if not tracer.enabled:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        shape = _statement_shape(statement)
+        tracer.record_statement(shape)
+        conn.info.setdefault("tracing_spans", []).append(
+            tracer.start_span("db.query", **{"db.statement": shape, "db.executemany": executemany})
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span, token = conn.info["tracing_spans"].pop()
+        if span is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+        tracer.end_span(span, token)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("tracing_spans") if context.connection else None
+        if spans:
+            span, token = spans.pop()
+            tracer.end_span(span, token, error=context.original_exception)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and root is not None:
+                root.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with tracer.span(
+            f"HTTP {scope['method']}",
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as root:
+            await self.app(scope, receive, send_wrapper)
+            if root is not None:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"HTTP {scope['method']} {route.path}"
+                    root.set_attribute("http.route", route.path)